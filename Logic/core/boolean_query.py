@@ -0,0 +1,340 @@
+import re
+import numpy as np
+from .preprocess import Preprocessor
+
+
+class PostingList:
+    def __init__(self, documents, skip_documents=None, interval=None):
+        """
+        Initializes a posting list.
+
+        Parameters
+        ----------
+        documents : numpy.ndarray
+            The sorted ordinals of the documents.
+        skip_documents : numpy.ndarray, optional
+            The documents of every interval-th posting, as stored by Ordinal_index. They are taken
+            from the documents when not given.
+        interval : int, optional
+            The number of postings between two skip pointers, the ceiling of the square root of the
+            length by default.
+        """
+        self.documents = documents
+        if interval is None:
+            interval = max(1, int(np.ceil(np.sqrt(len(documents)))))
+        if skip_documents is None:
+            skip_documents = documents[::interval]
+        self.skip_documents = skip_documents
+        self.interval = interval
+
+    def __len__(self):
+        return len(self.documents)
+
+    def advance(self, position, target):
+        """
+        Finds the first posting from a position on whose document is not smaller than a target.
+        It gallops over the skip pointers from the block of the position, doubling the step until it
+        passes the target, and then only searches the one block the target can be in.
+
+        Parameters
+        ----------
+        position : int
+            The position to start from.
+        target : int
+            The document ordinal to look for.
+
+        Returns
+        -------
+        int
+            The position of the posting, or the length of the list if all the documents are smaller.
+        """
+        if position >= len(self.documents) or self.documents[position] >= target:
+            return position
+        block = position // self.interval
+        low, step = block, 1
+        while block + step < len(self.skip_documents) and self.skip_documents[block + step] <= target:
+            low = block + step
+            step *= 2
+        high = min(block + step, len(self.skip_documents))
+        block = low + int(self.skip_documents[low:high].searchsorted(target, side='right')) - 1
+
+        start = max(position, block * self.interval)
+        end = min(len(self.documents), (block + 1) * self.interval)
+        return start + int(self.documents[start:end].searchsorted(target))
+
+
+def intersect(first, second):
+    """
+    Intersects two posting lists.
+    Every document of the shorter list is looked up in the longer one with advance, so the cost
+    depends on the shorter list and the longer one is mostly skipped.
+
+    Parameters
+    ----------
+    first : PostingList
+        A posting list.
+    second : PostingList
+        Another posting list.
+
+    Returns
+    -------
+    PostingList
+        The documents that are in both lists.
+    """
+    if len(first) > len(second):
+        first, second = second, first
+    documents = []
+    position = 0
+    for document in first.documents:
+        position = second.advance(position, document)
+        if position == len(second):
+            break
+        if second.documents[position] == document:
+            documents.append(document)
+    return PostingList(np.array(documents, dtype=np.int32))
+
+
+def difference(first, second):
+    """
+    Removes the documents of a posting list from another.
+
+    Parameters
+    ----------
+    first : PostingList
+        The posting list to remove the documents from.
+    second : PostingList
+        The documents to remove.
+
+    Returns
+    -------
+    PostingList
+        The documents of the first list that are not in the second.
+    """
+    if len(second) == 0:
+        return first
+    documents = []
+    position = 0
+    for document in first.documents:
+        position = second.advance(position, document)
+        if position == len(second) or second.documents[position] != document:
+            documents.append(document)
+    return PostingList(np.array(documents, dtype=np.int32))
+
+
+class BooleanQuery:
+    def __init__(self, query, keyword=False):
+        """
+        Parses a boolean query.
+        The terms of a group are required if they start with '+', excluded if they start with '-'
+        or follow NOT, and optional otherwise: a document must have all the required terms, or one
+        of the optional ones if there are none, and none of the excluded terms. Groups are joined by
+        AND, which binds tighter than OR, and can be nested in parentheses, e.g.
+        "+batman -lego (joker OR bane)". A term in double quotes can have spaces, e.g.
+        '-"science fiction"'. The terms are preprocessed like the other queries, and the ones that
+        the preprocessor drops, like stopwords, are left out of the query.
+
+        Parameters
+        ----------
+        query : str
+            The query.
+        keyword : bool
+            If True, the terms are values of a keyword field, like the genres, so a quoted term of
+            more than one word is one term. Otherwise each of its words is required.
+        """
+        self.tokens = re.findall(r'[+-]?"[^"]*"|[+-]?\(|\)|[^\s()]+', query)
+        self.keyword = keyword
+        self.position = 0
+        raw_terms = []
+        tree = self.parse_or(raw_terms)
+        while self.position < len(self.tokens):
+            # unbalanced closing parentheses are ignored, like the rest of the query syntax is forgiving
+            self.position += 1
+            tree = self.join('required', [tree, self.parse_or(raw_terms)])
+
+        processed = Preprocessor(raw_terms).preprocess() if raw_terms else []
+        self.tree = self.simplify(tree, dict(zip(raw_terms, processed)))
+        self.terms = []
+        self.collect_terms(self.tree, self.terms)
+
+    def parse_or(self, raw_terms):
+        groups = [self.parse_and(raw_terms)]
+        while self.peek() == 'OR':
+            self.position += 1
+            groups.append(self.parse_and(raw_terms))
+        return groups[0] if len(groups) == 1 else self.join('optional', groups)
+
+    def parse_and(self, raw_terms):
+        groups = [self.parse_group(raw_terms)]
+        while self.peek() == 'AND':
+            self.position += 1
+            groups.append(self.parse_group(raw_terms))
+        return groups[0] if len(groups) == 1 else self.join('required', groups)
+
+    def parse_group(self, raw_terms):
+        clauses = {'required': [], 'optional': [], 'excluded': []}
+        while self.peek() not in (None, ')', 'AND', 'OR'):
+            token = self.tokens[self.position]
+            self.position += 1
+            occur = 'optional'
+            if token == 'NOT':
+                occur = 'excluded'
+                token = self.peek()
+                if token is None or token in (')', 'AND', 'OR'):
+                    break
+                self.position += 1
+            if token[0] in '+-' and len(token) > 1:
+                occur = 'excluded' if token[0] == '-' else ('required' if occur == 'optional' else occur)
+                token = token[1:]
+
+            if token == '(':
+                clause = self.parse_or(raw_terms)
+                if self.peek() == ')':
+                    self.position += 1
+            else:
+                if len(token) > 1 and token[0] == token[-1] == '"':
+                    token = token[1:-1]
+                raw_terms.append(token)
+                clause = ('term', token)
+            clauses[occur].append(clause)
+
+        if not clauses['required'] and not clauses['excluded'] and len(clauses['optional']) == 1:
+            return clauses['optional'][0]
+        return ('clauses', clauses['required'], clauses['optional'], clauses['excluded'])
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def join(self, occur, groups):
+        return ('clauses', groups if occur == 'required' else [], groups if occur == 'optional' else [], [])
+
+    def simplify(self, node, processed):
+        """
+        Replaces the raw terms of a parsed query with the preprocessed ones and drops the empty clauses.
+
+        Returns
+        -------
+        tuple
+            The simplified node, or None if nothing is left of it.
+        """
+        if node[0] == 'term':
+            terms = processed.get(node[1], '').split()
+            if not terms:
+                return None
+            if len(terms) == 1 or self.keyword:
+                return ('term', ' '.join(terms))
+            return ('clauses', [('term', term) for term in terms], [], [])
+
+        required, optional, excluded = [[c for c in (self.simplify(c, processed) for c in clauses) if c is not None] for clauses in node[1:]]
+        if not required and not optional and not excluded:
+            return None
+        if not required and not excluded and len(optional) == 1:
+            return optional[0]
+        if len(required) == 1 and not optional and not excluded:
+            return required[0]
+        return ('clauses', required, optional, excluded)
+
+    def collect_terms(self, node, terms):
+        """
+        Collects the terms that are not excluded, in query order, to score the matching documents with.
+        """
+        if node is None:
+            return
+        if node[0] == 'term':
+            terms.append(node[1])
+            return
+        for clause in node[1] + node[2]:
+            self.collect_terms(clause, terms)
+
+    def evaluate(self, get_posting_list, number_of_documents):
+        """
+        Finds the documents that match the query.
+        The required clauses are intersected from the shortest to the longest, so a conjunctive query
+        only visits the postings around the documents of its rarest term and never builds the union of
+        all the query terms' postings. Only the optional clauses of a group without required ones are
+        merged.
+
+        Parameters
+        ----------
+        get_posting_list : function
+            Returns the PostingList of a term.
+        number_of_documents : int
+            The number of documents, for the queries that only exclude terms.
+
+        Returns
+        -------
+        numpy.ndarray
+            The sorted ordinals of the matching documents.
+        """
+        if self.tree is None:
+            return np.zeros(0, dtype=np.int32)
+        return self.evaluate_node(self.tree, get_posting_list, number_of_documents).documents
+
+    def evaluate_node(self, node, get_posting_list, number_of_documents):
+        if node[0] == 'term':
+            return get_posting_list(node[1])
+
+        _, required, optional, excluded = node
+        if required:
+            posting_lists = sorted((self.evaluate_node(c, get_posting_list, number_of_documents) for c in required), key=len)
+            result = posting_lists[0]
+            for posting_list in posting_lists[1:]:
+                if len(result) == 0:
+                    break
+                result = intersect(result, posting_list)
+        elif optional:
+            documents = [self.evaluate_node(c, get_posting_list, number_of_documents).documents for c in optional]
+            result = PostingList(np.unique(np.concatenate(documents)).astype(np.int32))
+        else:
+            result = PostingList(np.arange(number_of_documents, dtype=np.int32))
+
+        for clause in excluded:
+            if len(result) == 0:
+                break
+            result = difference(result, self.evaluate_node(clause, get_posting_list, number_of_documents))
+        return result
+
+    def evaluate_bitmaps(self, get_bitmap, number_of_documents):
+        """
+        Finds the documents that match the query with bitmap algebra, for fields like the genres
+        that have a bitmap for each value: required clauses are ANDed, optional ones ORed and
+        excluded ones ANDed with NOT, on the packed bitmaps.
+
+        Parameters
+        ----------
+        get_bitmap : function
+            Returns the packed bitmap of a term, as built by Bitmap_index.
+        number_of_documents : int
+            The number of documents.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean mask of the matching documents, indexed by document ordinal.
+        """
+        if self.tree is None:
+            return np.ones(number_of_documents, dtype=bool)
+        bitmap = self.evaluate_bitmap_node(self.tree, get_bitmap, number_of_documents)
+        return np.unpackbits(bitmap, count=number_of_documents).astype(bool)
+
+    def evaluate_bitmap_node(self, node, get_bitmap, number_of_documents):
+        if node[0] == 'term':
+            return get_bitmap(node[1])
+
+        _, required, optional, excluded = node
+        if required:
+            bitmap = self.evaluate_bitmap_node(required[0], get_bitmap, number_of_documents)
+            for clause in required[1:]:
+                bitmap = bitmap & self.evaluate_bitmap_node(clause, get_bitmap, number_of_documents)
+        elif optional:
+            bitmap = self.evaluate_bitmap_node(optional[0], get_bitmap, number_of_documents)
+            for clause in optional[1:]:
+                bitmap = bitmap | self.evaluate_bitmap_node(clause, get_bitmap, number_of_documents)
+        else:
+            bitmap = np.packbits(np.ones(number_of_documents, dtype=bool))
+
+        for clause in excluded:
+            bitmap = bitmap & ~self.evaluate_bitmap_node(clause, get_bitmap, number_of_documents)
+        return bitmap
+
+    def __str__(self):
+        return str(self.tree)
@@ -1,56 +1,251 @@
-from preprocess import Preprocessor
+from preprocess import Preprocessor, preprocess_document
 import json
+import itertools
+import collections
+import multiprocessing
 from indexer.indexes_enum import Indexes
 from indexer.index import Index
-from indexer.tiered_index import Tiered_index
-from indexer.metadata_index import Metadata_index
-from indexer.document_lengths_index import DocumentLengthsIndex
+from indexer.fields import Field, DEFAULT_FIELDS
+from indexer.spimi_index import Spimi_index
+from indexer.document_store import Document_store
+from indexer.segment_index import store_indexes, build_stored_indexes, clear_segments
 
 
 class Builder():
-    def __init__(self, crawled_path = "../Logic/IMDB_crawled.json", data_amount = 100):
+    # the number of documents indexed by a process at a time, in a build with more than one process
+    shard_size = 256
+
+    def __init__(self, crawled_path = "../Logic/IMDB_crawled.json", data_amount = 100, binary = False, workers = 1,
+                 index_path = '../Logic/core/indexer/index/', text_fields = None, memory_limit = 256 * 2 ** 20, fields = None):
+        """
+        Builds all the indexes of the crawled documents.
+
+        Parameters
+        ----------
+        crawled_path : str
+            The path to the crawled documents, a JSON array or one JSON document per line. The
+            documents are read, preprocessed and indexed one at a time, and the crawled and the
+            preprocessed documents are kept in Document_store files in index_path until they are
+            stored, so only the postings and the lengths of the fields grow in memory with the crawl.
+        data_amount : int
+            The number of documents to index, -1 for all of them.
+        binary : bool
+            If True, the indexes of the text and keyword fields are written in the binary format.
+        workers : int
+            The number of processes. With more than one, the documents are read in shards that the
+            processes preprocess and index, the indexes of the shards are merged in order, and the
+            indexes built from the stored ones are built in the processes too. The files are the same
+            as the ones of a build with one process.
+        index_path : str
+            The path to write the indexes to.
+        text_fields : list
+            The long text fields to index too, like reviews and synopsis. They are indexed by
+            Spimi_index, which keeps at most about memory_limit bytes of their postings in memory.
+        memory_limit : int
+            The number of bytes the postings of the text fields may take in memory. It doesn't bound
+            the postings of the other fields, which are kept in memory until they are stored.
+        fields : list
+            The fields to index, each one a Field, DEFAULT_FIELDS by default. More fields, like
+            Field('directors', Field.KEYWORD), are indexed in the same pass over the documents. The
+            summaries, the stars, the genres and the other text fields are preprocessed.
+        """
         self.path = crawled_path
         self.data_amount = data_amount
-        objects = self.read_json()
-        
-        path = '../Logic/core/indexer/index/'
-        self.index = Index(objects)
-        self.index.store_index(path+'raw_'+Indexes.DOCUMENTS.value+'_index.json', Indexes.DOCUMENTS.value)
+        fields = DEFAULT_FIELDS if fields is None else fields
+        documents = self.read_documents()
 
-        self.preprocess_objects(objects, Indexes.SUMMARIES.value)
-        self.preprocess_objects(objects, Indexes.STARS.value)
-        self.preprocess_objects(objects, Indexes.GENRES.value)
-        
+        path = index_path
+        text_index = Spimi_index(path, text_fields, memory_limit) if text_fields else None
+        pool = None
+        try:
+            pool = multiprocessing.Pool(workers) if workers > 1 else None
+            with Document_store(path) as raw_documents, Document_store(path) as stored_documents:
+                if pool is None:
+                    index = index_documents(documents, raw_documents, text_index, fields, stored_documents)
+                else:
+                    index = self.build_indexes_in_parallel(documents, raw_documents, pool, workers, text_index, fields, stored_documents)
+                store_indexes(path, raw_documents, index, binary)
+                # the indexes built from the stored ones read them from the files, so the index is not
+                # kept in memory while they are built
+                del index
+            if text_index is not None:
+                text_index.store_indexes()
+            build_stored_indexes(path, pool=pool)
+        finally:
+            # the temporary files are removed when the build fails too
+            if text_index is not None:
+                text_index.close()
+            if pool is not None:
+                pool.terminate()
+        # the documents added and deleted since the last build are in the new indexes already
+        clear_segments(path)
 
-        self.index = Index(objects)
 
-        self.index.store_index(path+Indexes.SUMMARIES.value+'_index.json', Indexes.SUMMARIES.value)
-        self.index.store_index(path+Indexes.DOCUMENTS.value+'_index.json', Indexes.DOCUMENTS.value)
-        self.index.store_index(path+Indexes.GENRES.value+'_index.json', Indexes.GENRES.value)
-        self.index.store_index(path+Indexes.STARS.value+'_index.json', Indexes.STARS.value)
+    def read_documents(self):
+        """
+        Reads the crawled documents one at a time.
 
-        Tiered_index(path=path)
-        DocumentLengthsIndex(path)
-        Metadata_index(path).store_metadata_index(path)
+        Yields
+        ------
+        dict
+            The next crawled document, until data_amount documents are read, or all of them if it
+            is -1.
+        """
+        with open(self.path, "r") as f:
+            documents = self.read_json_documents(f)
+            yield from documents if self.data_amount == -1 else itertools.islice(documents, self.data_amount)
 
+    @staticmethod
+    def read_json_documents(f, chunk_size=1 << 20):
+        """
+        Reads the documents of a JSON array, or of a file with a JSON document per line, reading the
+        file a chunk at a time.
+        """
+        decoder = json.JSONDecoder()
+        buffer, position = '', 0
+        array = None
+        while True:
+            # the whitespace, and the commas between the elements of an array
+            while position < len(buffer) and (buffer[position].isspace() or (array and buffer[position] == ',')):
+                position += 1
+            if position < len(buffer):
+                if array is None:
+                    array = buffer[position] == '['
+                    position += array
+                    continue
+                if array and buffer[position] == ']':
+                    return
+                try:
+                    document, position = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # the document goes on in the next chunk
+                    document = None
+                if document is not None:
+                    yield document
+                    continue
 
-    def read_json(self):
-        with open(self.path, "r") as f:
-            all_objects = json.load(f)
-            if self.data_amount == -1:
-                objects = all_objects
-            else:
-                objects = all_objects[:self.data_amount]
+            chunk = f.read(chunk_size)
+            if not chunk:
+                if position < len(buffer) or array:
+                    raise json.JSONDecodeError('Unexpected end of the crawled documents', buffer, position)
+                return
+            buffer = buffer[position:] + chunk
+            position = 0
+
+    def build_indexes_in_parallel(self, documents, raw_documents: dict, pool, workers: int, text_index: Spimi_index = None, fields: list = None,
+                                  stored_documents: Document_store = None):
+        """
+        Builds the indexes of shards of the documents in the processes of the pool and merges them
+        in the order of the shards. Only a few shards per process are read ahead of the merges.
+
+        Parameters
+        ----------
+        documents : iterable
+            The crawled documents.
+        raw_documents : dict
+            The crawled documents are added to it by ID.
+        pool : multiprocessing.Pool
+            The pool to build the indexes in.
+        workers : int
+            The number of processes of the pool.
+        text_index : Spimi_index
+            If given, the texts of its fields are preprocessed in the processes too, and added to it.
+        fields : list
+            The fields to index, DEFAULT_FIELDS by default.
+        stored_documents : Document_store
+            If given, the documents index of the merged index is kept in it.
+
+        Returns
+        -------
+        Index
+            The positional index of the preprocessed documents.
+        """
+        index = Index([], positional=True, fields=fields, documents=stored_documents)
+        text_fields = text_index.fields if text_index is not None else []
+        pending = collections.deque()
+        for shard in iter(lambda: list(itertools.islice(documents, self.shard_size)), []):
+            raw_documents.update((document['id'], document) for document in shard)
+            pending.append(pool.apply_async(index_shard, (shard, text_fields, fields)))
+            if len(pending) > 2 * workers:
+                self.merge_shard(index, text_index, pending.popleft().get())
+        while pending:
+            self.merge_shard(index, text_index, pending.popleft().get())
+        return index
+
+    @staticmethod
+    def merge_shard(index: Index, text_index: Spimi_index, shard):
+        shard_index, texts = shard
+        index.merge_index(shard_index)
+        if text_index is not None:
+            for document_id, document_texts in texts:
+                text_index.add_document(document_id, document_texts)
+
+
+def index_documents(documents, raw_documents: dict = None, text_index: Spimi_index = None, fields: list = None, stored_documents: Document_store = None):
+    """
+    Preprocesses crawled documents and indexes them, one at a time.
+
+    Parameters
+    ----------
+    documents : iterable
+        The crawled documents. They are not changed.
+    raw_documents : dict
+        If given, the crawled documents are added to it by ID.
+    text_index : Spimi_index
+        If given, the preprocessed texts of its fields are added to it.
+    fields : list
+        The fields to index, DEFAULT_FIELDS by default.
+    stored_documents : Document_store
+        If given, the documents index of the index is kept in it.
+
+    Returns
+    -------
+    Index
+        The positional index of the preprocessed documents.
+    """
+    index = Index([], positional=True, fields=fields, documents=stored_documents)
+    preprocessed_fields = [Indexes.SUMMARIES.value, Indexes.STARS.value, Indexes.GENRES.value]
+    preprocessed_fields += [field.name for field in index.fields if field.type == Field.TEXT and field.name not in preprocessed_fields]
+    for document in documents:
+        if raw_documents is not None:
+            # a document crawled twice keeps its first place and its last version
+            raw_documents[document['id']] = document
+        index.index_document(preprocess_document(document, preprocessed_fields))
+        if text_index is not None:
+            text_index.add_document(document['id'], preprocess_texts(document, text_index.fields))
+    return index
+
+
+def index_shard(documents: list, text_fields: list, fields: list):
+    """
+    Indexes a shard of the documents in a process of the pool of a build with more than one process.
+
+    Returns
+    -------
+    tuple
+        The positional index of the preprocessed documents, and the ID and the preprocessed texts of
+        the text fields of each document, for the Spimi_index of the build.
+    """
+    return index_documents(documents, fields=fields), [(document['id'], preprocess_texts(document, text_fields)) for document in documents]
 
-        return objects
 
-    def preprocess_objects(self, objects: list, type: str):
-        for obj in objects:
-            obj[type] = Preprocessor(obj[type]).preprocess()
+def preprocess_texts(document: dict, fields: list):
+    """
+    Preprocesses the texts of the long text fields of a crawled document.
 
-    
+    Returns
+    -------
+    dict
+        The preprocessed texts of each field. Only the text of a review, crawled as [review, score],
+        is kept, and a field that wasn't crawled has no texts.
+    """
+    return {
+        field: Preprocessor([text if isinstance(text, str) else text[0] for text in document.get(field) or []]).preprocess()
+        for field in fields
+    }
 
 
-Builder(data_amount=-1)
+if __name__ == '__main__':
+    Builder(data_amount=-1)
 
 
@@ -0,0 +1,309 @@
+import os
+import json
+import shutil
+import threading
+import numpy as np
+from .preprocess import preprocess_document
+from .indexer.index import Index
+from .indexer.index_reader import Index_reader
+from .indexer.indexes_enum import Indexes, Index_types
+from .indexer.bitmap_codec import encode_bitmap, decode_bitmap
+from .indexer.segment_index import read_segments, write_segments, get_segment_path, write_indexes, clear_segments, BASE_SEGMENT, SEGMENTS_DIRECTORY
+
+
+class IndexWriter:
+    def __init__(self, path='../Logic/core/indexer/index/', merge_factor=10, background=True):
+        """
+        Adds documents to an index and deletes them without building the index again.
+        The added documents are written as a small segment, a directory with their own indexes that
+        is never changed afterwards, and the deleted documents are marked in the deletion bitmap of
+        the base index or of their segment. SearchEngine searches the base index and all the segments
+        as one index. Only one writer should change an index at a time.
+
+        Whenever merge_factor segments have about as many documents, within a power of merge_factor,
+        they are merged into one segment without their deleted documents, so there are only a few
+        segments for every power of merge_factor documents added. force_merge merges all the
+        segments into the base index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes, built by Builder.
+        merge_factor : int
+            The number of segments of about the same size that are merged together.
+        background : bool
+            If True, the segments are merged in background threads, so adding documents doesn't
+            wait for the merges. wait_for_merges waits for them.
+        """
+        self.path = path
+        self.merge_factor = merge_factor
+        self.background = background
+        self.lock = threading.Lock()
+        self.merging = set()
+        self.writing = set()
+        self.merge_threads = []
+
+        segments = read_segments(path)
+        self.generation = segments['generation']
+        self.next_segment = segments['next_segment']
+        self.segment_names = [segment['name'] for segment in segments['segments']]
+        self.document_ids = {BASE_SEGMENT: Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index}
+        for name in self.segment_names:
+            self.document_ids[name] = Index_reader(get_segment_path(path, name), Indexes.DOCUMENTS, Index_types.DOCID).index
+
+        self.deletions = {}
+        self.locations = {}
+        for name, document_ids in self.document_ids.items():
+            deleted = np.zeros(len(document_ids), dtype=bool)
+            if name in segments['deletions']:
+                deleted = np.unpackbits(decode_bitmap(segments['deletions'][name]), count=len(document_ids)).astype(bool)
+            self.deletions[name] = deleted
+            for ordinal, doc_id in enumerate(document_ids):
+                if not deleted[ordinal]:
+                    self.locations[doc_id] = (name, ordinal)
+
+    def add_documents(self, documents: list):
+        """
+        Adds crawled documents to the index as a new segment. A document whose ID is already in the
+        index replaces the old one.
+
+        Parameters
+        ----------
+        documents : list
+            The documents, as crawled. They are preprocessed like Builder does, and are not changed.
+
+        Returns
+        -------
+        str
+            The name of the new segment, None if there are no documents.
+        """
+        # the last version of a document added twice wins
+        raw_documents = {document['id']: document for document in documents}
+        if not raw_documents:
+            return None
+        index = Index([], positional=True)
+        for document in raw_documents.values():
+            index.index_document(preprocess_document(document, [Indexes.SUMMARIES.value, Indexes.STARS.value, Indexes.GENRES.value]))
+
+        with self.lock:
+            name = self.get_segment_name()
+        segment_path = get_segment_path(self.path, name)
+        os.makedirs(segment_path)
+        write_indexes(segment_path, raw_documents, index, statistics=False)
+
+        with self.lock:
+            for doc_id in raw_documents:
+                self.delete_document(doc_id)
+            self.add_segment(name, Index_reader(segment_path, Indexes.DOCUMENTS, Index_types.DOCID).index)
+            self.remove_deleted_segments()
+            self.commit()
+        self.remove_unused_segments()
+        self.merge_segments()
+        return name
+
+    def delete_documents(self, document_ids: list):
+        """
+        Deletes documents from the index.
+
+        Parameters
+        ----------
+        document_ids : list
+            The IDs of the documents. The ones that are not in the index are ignored.
+
+        Returns
+        -------
+        int
+            The number of deleted documents.
+        """
+        with self.lock:
+            deleted = sum(self.delete_document(doc_id) for doc_id in document_ids)
+            if deleted:
+                self.remove_deleted_segments()
+                self.commit()
+        if deleted:
+            self.remove_unused_segments()
+        return deleted
+
+    def delete_document(self, doc_id):
+        location = self.locations.pop(doc_id, None)
+        if location is None:
+            return False
+        name, ordinal = location
+        self.deletions[name][ordinal] = True
+        return True
+
+    def get_segment_name(self):
+        name = 'segment_' + str(self.next_segment)
+        self.next_segment += 1
+        self.writing.add(name)
+        return name
+
+    def add_segment(self, name, document_ids, deleted=None, position=None):
+        self.writing.discard(name)
+        self.segment_names.insert(len(self.segment_names) if position is None else position, name)
+        self.document_ids[name] = document_ids
+        self.deletions[name] = np.zeros(len(document_ids), dtype=bool) if deleted is None else deleted
+        for ordinal, doc_id in enumerate(document_ids):
+            if not self.deletions[name][ordinal]:
+                self.locations[doc_id] = (name, ordinal)
+
+    def remove_segment(self, name):
+        self.segment_names.remove(name)
+        del self.document_ids[name]
+        del self.deletions[name]
+
+    def remove_deleted_segments(self):
+        # the segments without documents left are dropped right away, unless they are being merged
+        for name in list(self.segment_names):
+            if self.deletions[name].all() and name not in self.merging:
+                self.remove_segment(name)
+
+    def remove_unused_segments(self):
+        """
+        Removes the directories of the segments that are not in the index anymore.
+        """
+        segments_path = self.path + SEGMENTS_DIRECTORY
+        if not os.path.exists(segments_path):
+            return
+        with self.lock:
+            unused = [name for name in os.listdir(segments_path) if name not in self.document_ids and name not in self.merging | self.writing]
+        for name in unused:
+            shutil.rmtree(get_segment_path(self.path, name), ignore_errors=True)
+
+    def commit(self):
+        """
+        Writes the segments file. It should be called with the lock held.
+        """
+        self.generation += 1
+        write_segments(self.path, {
+            'generation': self.generation,
+            'next_segment': self.next_segment,
+            'segments': [{'name': name, 'document_count': len(self.document_ids[name])} for name in self.segment_names],
+            'deletions': {
+                name: encode_bitmap(np.flatnonzero(deleted), len(deleted))
+                for name, deleted in self.deletions.items() if deleted.any()
+            },
+        })
+
+    def find_merges(self):
+        """
+        Finds the segments to merge: merge_factor segments whose numbers of live documents have the
+        same integer part of their logarithm in base merge_factor.
+
+        Returns
+        -------
+        list
+            The names of the segments of each merge, oldest first.
+        """
+        levels = {}
+        for name in self.segment_names:
+            if name in self.merging:
+                continue
+            live = max(1, int((~self.deletions[name]).sum()))
+            levels.setdefault(int(np.log(live) / np.log(self.merge_factor)), []).append(name)
+        return [names[:self.merge_factor] for names in levels.values() if len(names) >= self.merge_factor]
+
+    def merge_segments(self):
+        """
+        Starts the merges that the merge policy of find_merges asks for.
+        """
+        with self.lock:
+            merges = self.find_merges()
+            for names in merges:
+                self.merging.update(names)
+        for names in merges:
+            if self.background:
+                thread = threading.Thread(target=self.merge, args=(names,))
+                self.merge_threads.append(thread)
+                thread.start()
+            else:
+                self.merge(names)
+
+    def merge(self, names):
+        """
+        Merges segments into a new one that takes the place of the first of them. The documents
+        deleted while the new segment is written are deleted from it when it replaces the old ones.
+
+        Parameters
+        ----------
+        names : list
+            The names of the segments, in the order of their documents.
+        """
+        with self.lock:
+            name = self.get_segment_name()
+            live_documents = [
+                (segment_name, [doc_id for doc_id, deleted in zip(self.document_ids[segment_name], self.deletions[segment_name]) if not deleted])
+                for segment_name in names
+            ]
+
+        raw_documents, documents = {}, []
+        for segment_name, document_ids in live_documents:
+            segment_path = get_segment_path(self.path, segment_name)
+            with open(segment_path + 'raw_' + Indexes.DOCUMENTS.value + '_index.json', 'r') as file:
+                segment_raw_documents = json.load(file)
+            segment_documents = Index_reader(segment_path, Indexes.DOCUMENTS).index
+            raw_documents.update((doc_id, segment_raw_documents[doc_id]) for doc_id in document_ids)
+            documents.extend(segment_documents[doc_id] for doc_id in document_ids)
+
+        if documents:
+            segment_path = get_segment_path(self.path, name)
+            os.makedirs(segment_path)
+            write_indexes(segment_path, raw_documents, Index(documents, positional=True), statistics=False)
+
+        with self.lock:
+            still_live = {doc_id for doc_id, location in self.locations.items() if location[0] in names}
+            position = self.segment_names.index(names[0])
+            for segment_name in names:
+                self.remove_segment(segment_name)
+            if documents:
+                document_ids = Index_reader(segment_path, Indexes.DOCUMENTS, Index_types.DOCID).index
+                deleted = np.array([doc_id not in still_live for doc_id in document_ids], dtype=bool)
+                self.add_segment(name, document_ids, deleted, position)
+            self.writing.discard(name)
+            self.merging.difference_update(names)
+            self.commit()
+        self.remove_unused_segments()
+        self.merge_segments()
+
+    def wait_for_merges(self):
+        """
+        Waits for the background merges, and the merges they start, to finish.
+        """
+        while self.merge_threads:
+            self.merge_threads.pop().join()
+
+    def force_merge(self, binary=None):
+        """
+        Merges the segments into the base index, without the deleted documents, by building all the
+        indexes of the live documents again, so the statistics and the indexes that only the base
+        index has, like the impacts and the champion lists, cover them too.
+
+        Parameters
+        ----------
+        binary : bool
+            If True, the stars, genres and summaries indexes are written in the binary format. By
+            default the format of the base index is kept.
+        """
+        self.wait_for_merges()
+        with self.lock:
+            if binary is None:
+                binary = os.path.exists(self.path + Indexes.SUMMARIES.value + '_index.bin')
+            raw_documents, documents = {}, []
+            for name in [BASE_SEGMENT] + self.segment_names:
+                segment_path = self.path if name == BASE_SEGMENT else get_segment_path(self.path, name)
+                with open(segment_path + 'raw_' + Indexes.DOCUMENTS.value + '_index.json', 'r') as file:
+                    segment_raw_documents = json.load(file)
+                segment_documents = Index_reader(segment_path, Indexes.DOCUMENTS).index
+                for doc_id, deleted in zip(self.document_ids[name], self.deletions[name]):
+                    if not deleted:
+                        raw_documents[doc_id] = segment_raw_documents[doc_id]
+                        documents.append(segment_documents[doc_id])
+
+            write_indexes(self.path, raw_documents, Index(documents, positional=True), binary)
+            clear_segments(self.path)
+            self.generation += 1
+            self.segment_names = []
+            self.document_ids = {BASE_SEGMENT: Index_reader(self.path, Indexes.DOCUMENTS, Index_types.DOCID).index}
+            self.deletions = {BASE_SEGMENT: np.zeros(len(self.document_ids[BASE_SEGMENT]), dtype=bool)}
+            self.locations = {doc_id: (BASE_SEGMENT, ordinal) for ordinal, doc_id in enumerate(self.document_ids[BASE_SEGMENT])}
+            self.commit()
@@ -0,0 +1,251 @@
+import mmap
+import struct
+from collections.abc import Mapping
+import numpy as np
+
+MAGIC = b'IRBI'
+VERSION = 1
+# magic, version, number of documents, number of terms and the offsets of the sections: document
+# offsets, document IDs, term offsets, terms, sorted term order, posting offsets, document frequencies, postings
+HEADER = struct.Struct('<4sIII8Q')
+
+
+def encode_varints(values):
+    """
+    Encodes non-negative integers as varints: 7 bits per byte, with the high bit set on every byte
+    but the last, as in encode_positions.
+
+    Parameters
+    ----------
+    values : numpy.ndarray
+        The integers.
+
+    Returns
+    -------
+    bytes
+        The varints, back to back.
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    lengths = np.ones(len(values), dtype=np.int64)
+    rest = values >> np.uint64(7)
+    while rest.any():
+        lengths += rest > 0
+        rest >>= np.uint64(7)
+
+    encoded = np.zeros(int(lengths.sum()), dtype=np.uint8)
+    starts = np.cumsum(lengths) - lengths
+    rest = values.copy()
+    for k in range(int(lengths.max()) if len(values) else 0):
+        live = lengths > k
+        more = (lengths[live] > k + 1).astype(np.uint8) << 7
+        encoded[starts[live] + k] = (rest[live] & np.uint64(0x7f)).astype(np.uint8) | more
+        rest[live] >>= np.uint64(7)
+    return encoded.tobytes()
+
+
+def decode_varints(data):
+    """
+    Decodes the varints written by encode_varints, all at once.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        The bytes of the varints, as uint8.
+
+    Returns
+    -------
+    numpy.ndarray
+        The integers, as int64.
+    """
+    ends = np.flatnonzero(data < 0x80)
+    if len(ends) == 0:
+        return np.zeros(0, dtype=np.int64)
+    starts = np.concatenate([[0], ends[:-1] + 1])
+    # the shift of each byte is 7 times its position within its varint
+    shifts = 7 * (np.arange(len(data)) - np.repeat(starts, ends - starts + 1))
+    return np.add.reduceat((data & 0x7f).astype(np.int64) << shifts, starts)
+
+
+def write_binary_index(path, index):
+    """
+    Writes an index of {term: {document_id: tf}} in the binary format read by Binary_index.
+    The document IDs are stored once, sorted, and the postings of each term are (gap to the previous
+    document, tf) pairs of varints, where the documents are positions in the sorted document IDs.
+    The terms keep the order of the index, so iterating over the file gives the same order as the
+    JSON index, and the term dictionary is their order sorted by bytes, to binary search them.
+
+    Parameters
+    ----------
+    path : str
+        The path of the file.
+    index : dict
+        The index to write. Terms without postings are left out.
+    """
+    document_ids = sorted(set(doc_id for postings in index.values() for doc_id in postings))
+    positions = {doc_id: i for i, doc_id in enumerate(document_ids)}
+    terms = [term for term in index if index[term]]
+    encoded_terms = [term.encode('utf-8') for term in terms]
+    # sorted as bytes, so the term dictionary can be binary searched on the raw bytes
+    term_dictionary = np.array(sorted(range(len(terms)), key=lambda i: encoded_terms[i]), dtype=np.uint32)
+    encoded_documents = [doc_id.encode('utf-8') for doc_id in document_ids]
+    document_frequencies = np.array([len(index[term]) for term in terms], dtype=np.uint32)
+    postings = []
+    posting_offsets = [0]
+    for term in terms:
+        documents = np.array(sorted(positions[doc_id] for doc_id in index[term]), dtype=np.int64)
+        tfs = np.array([index[term][document_ids[document]] for document in documents], dtype=np.int64)
+        pairs = np.empty(2 * len(documents), dtype=np.int64)
+        pairs[0::2] = np.diff(documents, prepend=0)
+        pairs[1::2] = tfs
+        postings.append(encode_varints(pairs))
+        posting_offsets.append(posting_offsets[-1] + len(postings[-1]))
+
+    sections = [
+        np.concatenate([[0], np.cumsum([len(d) for d in encoded_documents])]).astype(np.uint64).tobytes(),
+        b''.join(encoded_documents),
+        np.concatenate([[0], np.cumsum([len(t) for t in encoded_terms])]).astype(np.uint64).tobytes(),
+        b''.join(encoded_terms),
+        term_dictionary.tobytes(),
+        np.array(posting_offsets, dtype=np.uint64).tobytes(),
+        document_frequencies.tobytes(),
+        b''.join(postings),
+    ]
+    offsets = []
+    position = HEADER.size
+    for section in sections:
+        offsets.append(position)
+        position += len(section)
+
+    with open(path, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, len(document_ids), len(terms), *offsets))
+        for section in sections:
+            file.write(section)
+
+
+class Binary_index(Mapping):
+    def __init__(self, path):
+        """
+        Opens an index written by write_binary_index.
+        The file is memory mapped and the tables are array views of it, so opening it doesn't read
+        the index, and the postings of a term are only read and decoded when they are asked for.
+        It can be used as the {term: {document_id: tf}} dict of a JSON index.
+
+        Parameters
+        ----------
+        path : str
+            The path of the file.
+        """
+        self.path = path
+        with open(path, 'rb') as file:
+            self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.document_count, self.term_count, *offsets = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a binary index")
+        (document_offsets, self.document_data, term_offsets, self.term_data, term_dictionary,
+         posting_offsets, document_frequencies, self.posting_data) = offsets
+
+        self.document_offsets = np.frombuffer(self.buffer, dtype=np.uint64, count=self.document_count + 1, offset=document_offsets)
+        self.term_offsets = np.frombuffer(self.buffer, dtype=np.uint64, count=self.term_count + 1, offset=term_offsets)
+        self.term_dictionary = np.frombuffer(self.buffer, dtype=np.uint32, count=self.term_count, offset=term_dictionary)
+        self.posting_offsets = np.frombuffer(self.buffer, dtype=np.uint64, count=self.term_count + 1, offset=posting_offsets)
+        self.document_frequencies = np.frombuffer(self.buffer, dtype=np.uint32, count=self.term_count, offset=document_frequencies)
+        self.document_ids = None
+
+    def get_term(self, i):
+        start = self.term_data + int(self.term_offsets[i])
+        return self.buffer[start:self.term_data + int(self.term_offsets[i + 1])].decode('utf-8')
+
+    def get_document_ids(self):
+        """
+        Returns the document IDs of the index, sorted. The positions in this list are the documents
+        of get_postings.
+        """
+        if self.document_ids is None:
+            data = self.buffer[self.document_data:self.document_data + int(self.document_offsets[-1])]
+            offsets = self.document_offsets.tolist()
+            self.document_ids = [data[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(self.document_count)]
+        return self.document_ids
+
+    def find_term(self, term):
+        """
+        Binary searches the sorted term dictionary.
+
+        Returns
+        -------
+        int
+            The position of the term, or -1 if it is not in the index.
+        """
+        key = term.encode('utf-8')
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            i = int(self.term_dictionary[middle])
+            current = self.buffer[self.term_data + int(self.term_offsets[i]):self.term_data + int(self.term_offsets[i + 1])]
+            if current < key:
+                low = middle + 1
+            elif current > key:
+                high = middle
+            else:
+                return i
+        return -1
+
+    def get_postings(self, term):
+        """
+        Decodes the postings of a term.
+
+        Parameters
+        ----------
+        term : str
+            The term.
+
+        Returns
+        -------
+        tuple
+            The positions of the documents in get_document_ids, in ascending order, and the tf of the
+            term in each of them. Both are empty if the term is not in the index.
+        """
+        i = self.find_term(term)
+        if i < 0:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        return self.decode_postings(i)
+
+    def decode_postings(self, i):
+        start, end = int(self.posting_offsets[i]), int(self.posting_offsets[i + 1])
+        values = decode_varints(np.frombuffer(self.buffer, dtype=np.uint8, count=end - start, offset=self.posting_data + start))
+        return np.cumsum(values[0::2]), values[1::2]
+
+    def get_all_postings(self):
+        """
+        Decodes the postings of all the terms at once.
+
+        Returns
+        -------
+        tuple
+            The terms, in the order of the postings, the offset of each term's postings and their end,
+            and the documents and tfs of all the postings, back to back, as in get_postings.
+        """
+        values = decode_varints(np.frombuffer(self.buffer, dtype=np.uint8, count=int(self.posting_offsets[-1]), offset=self.posting_data))
+        gaps, tfs = values[0::2], values[1::2]
+        offsets = np.concatenate([[0], np.cumsum(self.document_frequencies, dtype=np.int64)])
+        # the gaps restart at every term, so the running sum of the previous terms is taken off
+        totals = np.cumsum(gaps)
+        starts = totals[offsets[:-1]] - gaps[offsets[:-1]]
+        documents = totals - np.repeat(starts, self.document_frequencies.astype(np.int64))
+        return [self.get_term(i) for i in range(self.term_count)], offsets, documents, tfs
+
+    def __getitem__(self, term):
+        i = self.find_term(term)
+        if i < 0:
+            raise KeyError(term)
+        documents, tfs = self.decode_postings(i)
+        document_ids = self.get_document_ids()
+        return {document_ids[document]: int(tf) for document, tf in zip(documents, tfs)}
+
+    def __contains__(self, term):
+        return isinstance(term, str) and self.find_term(term) >= 0
+
+    def __iter__(self):
+        return (self.get_term(i) for i in range(self.term_count))
+
+    def __len__(self):
+        return self.term_count
@@ -0,0 +1,45 @@
+import base64
+import zlib
+import numpy as np
+
+
+def encode_bitmap(ordinals, number_of_documents):
+    """
+    Compresses a set of document ordinals as a bitmap.
+    The bitmap has one bit per document, packed 8 to a byte, and is deflated, so long runs of
+    documents that are all in or all out of the set take almost no space. The bytes are base64
+    encoded so they can be stored in JSON.
+
+    Parameters
+    ----------
+    ordinals : List[int]
+        The document ordinals in the set.
+    number_of_documents : int
+        The number of documents, the length of the bitmap.
+
+    Returns
+    -------
+    str
+        The compressed bitmap.
+    """
+    bits = np.zeros(number_of_documents, dtype=bool)
+    bits[np.asarray(ordinals, dtype=np.int64)] = True
+    return base64.b64encode(zlib.compress(np.packbits(bits).tobytes(), 9)).decode('ascii')
+
+
+def decode_bitmap(encoded):
+    """
+    Decompresses a bitmap compressed by encode_bitmap.
+
+    Parameters
+    ----------
+    encoded : str
+        The compressed bitmap.
+
+    Returns
+    -------
+    numpy.ndarray
+        The packed bitmap, as uint8 bytes of 8 documents each. numpy.bitwise_and, bitwise_or and
+        bitwise_not combine packed bitmaps, and numpy.unpackbits turns them into a boolean mask.
+    """
+    return np.frombuffer(zlib.decompress(base64.b64decode(encoded)), dtype=np.uint8)
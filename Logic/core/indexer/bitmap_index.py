@@ -0,0 +1,52 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .bitmap_codec import encode_bitmap
+import json
+
+
+class Bitmap_index:
+    def __init__(self, path="../Logic/core/indexer/index/", index_name=Indexes.GENRES):
+        """
+        Initializes the Bitmap_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The docid index should already be stored in it.
+        index_name : Indexes
+            The field whose values get a bitmap each, the genres by default.
+        """
+
+        self.index_name = index_name
+        self.index = Index_reader(path, index_name=index_name).index
+        self.document_ids = Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index
+        self.bitmap_index = self.convert_to_bitmap_index()
+        self.store_bitmap_index(path)
+
+    def convert_to_bitmap_index(self):
+        """
+        Builds a compressed bitmap over the document ordinals for each value of the field, which is
+        set for the documents that have the value.
+
+        Returns
+        -------
+        dict
+            The bitmap index with structure of
+            {
+                "document_count": int,
+                "bitmaps": {value: compressed bitmap},
+            }
+        """
+        ordinals = {doc_id: ordinal for ordinal, doc_id in enumerate(self.document_ids)}
+        bitmaps = {}
+        for term, postings in self.index.items():
+            bitmaps[term] = encode_bitmap([ordinals[doc_id] for doc_id in postings], len(self.document_ids))
+        return {'document_count': len(self.document_ids), 'bitmaps': bitmaps}
+
+    def store_bitmap_index(self, path):
+        """
+        Stores the bitmap index to a file.
+        """
+        path = path + self.index_name.value + "_" + Index_types.BITMAP.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.bitmap_index, file)
@@ -0,0 +1,99 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .bm25 import okapi_score_tf
+import json
+
+
+class Block_max_index:
+    def __init__(self, path="../Logic/core/indexer/index/", block_size=8):
+        """
+        Initializes the Block_max_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The document lengths, metadata and scoring indexes should already be stored in it.
+        block_size : int
+            The number of postings in each block.
+        """
+
+        self.block_size = block_size
+        self.index = {
+            Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
+            Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
+            Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+        }
+        self.document_lengths_index = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).index,
+        }
+        self.idf = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.SCORING).index['idf'],
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.SCORING).index['idf'],
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.SCORING).index['idf'],
+        }
+        self.average_document_length = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index['averge_document_length']
+        self.block_max_index = {
+            Indexes.STARS: self.convert_to_block_max_index(Indexes.STARS),
+            Indexes.GENRES: self.convert_to_block_max_index(Indexes.GENRES),
+            Indexes.SUMMARIES: self.convert_to_block_max_index(Indexes.SUMMARIES),
+        }
+        self.store_block_max_index(path, Indexes.STARS)
+        self.store_block_max_index(path, Indexes.GENRES)
+        self.store_block_max_index(path, Indexes.SUMMARIES)
+
+    def convert_to_block_max_index(self, index_name):
+        """
+        Splits the posting list of each term, sorted by document ID, into blocks of block_size postings.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index to read.
+
+        Returns
+        -------
+        dict
+            The block max index with structure of
+            {
+                "block_size": int,
+                "blocks": {term: [[last document ID, max tf, min document length, max okapi bm25 score], ...]}
+            }
+            The max tf and min document length of a block bound the score of its documents for any bm25
+            parameters, and the max score is the tighter bound for the parameters the index was built with.
+        """
+        if index_name not in self.index:
+            raise ValueError("Invalid index type")
+
+        current_index = self.index[index_name]
+        document_lengths = self.document_lengths_index[index_name]
+        average_document_length = self.average_document_length[index_name.value]
+        blocks = {}
+        for term in current_index:
+            doc_ids = sorted(current_index[term])
+            blocks[term] = []
+            for start in range(0, len(doc_ids), self.block_size):
+                block = doc_ids[start:start + self.block_size]
+                blocks[term].append([
+                    block[-1],
+                    max(current_index[term][doc_id] for doc_id in block),
+                    min(document_lengths[doc_id] for doc_id in block),
+                    max(
+                        okapi_score_tf(current_index[term][doc_id], document_lengths[doc_id] / average_document_length)
+                        * self.idf[index_name][term] for doc_id in block
+                    ),
+                ])
+
+        return {
+            "block_size": self.block_size,
+            "blocks": blocks,
+        }
+
+    def store_block_max_index(self, path, index_name):
+        """
+        Stores the block max index to a file.
+        """
+        path = path + index_name.value + "_" + Index_types.BLOCK_MAX.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.block_max_index[index_name], file)
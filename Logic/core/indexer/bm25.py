@@ -0,0 +1,23 @@
+# the parameters of okapi bm25. The scorer and the indexes that store bm25 scores or their upper bounds, the
+# scoring, block max, impact and champion indexes, all use them, since WAND, Block-Max WAND, the impacts and
+# the champion lists are only right when their scores are the ones of the scorer
+K1 = 1.5
+B = 0.75
+
+
+def okapi_score_tf(tf, dl_avgdl, b=B, k1=K1):
+    """
+    Returns the saturated and length normalized tf of okapi bm25, which the idf of the term multiplies.
+
+    Parameters
+    ----------
+    tf : int | numpy.ndarray
+        The frequency of the term in the document.
+    dl_avgdl : float | numpy.ndarray
+        The length of the document divided by the average length of the documents.
+    b : float
+        The length normalization parameter.
+    k1 : float
+        The tf saturation parameter.
+    """
+    return (k1 + 1)*tf / (tf + k1*(1-b+b*dl_avgdl))
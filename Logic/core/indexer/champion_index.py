@@ -0,0 +1,92 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .bm25 import okapi_score_tf
+import json
+
+
+class Champion_index:
+    def __init__(self, path="../Logic/core/indexer/index/", min_champions=10, impact_ratio=0.7):
+        """
+        Initializes the Champion_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The document lengths, metadata and scoring indexes should already be stored in it.
+        min_champions : int
+            The number of champions each term keeps at least, or all its documents if it has fewer.
+        impact_ratio : float
+            Besides the first min_champions, a document is a champion of a term if its okapi bm25 score
+            for the term is at least this ratio of the term's highest score.
+        """
+
+        self.min_champions = min_champions
+        self.impact_ratio = impact_ratio
+        self.index = {
+            Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
+            Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
+            Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+        }
+        self.document_lengths_index = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).index,
+        }
+        self.idf = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.SCORING).index['idf'],
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.SCORING).index['idf'],
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.SCORING).index['idf'],
+        }
+        self.average_document_length = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index['averge_document_length']
+        self.champion_index = {
+            Indexes.STARS: self.convert_to_champion_index(Indexes.STARS),
+            Indexes.GENRES: self.convert_to_champion_index(Indexes.GENRES),
+            Indexes.SUMMARIES: self.convert_to_champion_index(Indexes.SUMMARIES),
+        }
+        self.store_champion_index(path, Indexes.STARS)
+        self.store_champion_index(path, Indexes.GENRES)
+        self.store_champion_index(path, Indexes.SUMMARIES)
+
+    def convert_to_champion_index(self, index_name):
+        """
+        Keeps the documents with the highest okapi bm25 scores of each term.
+        The number of champions depends on how the scores of the term are spread, instead of a tf
+        threshold that is the same for every term.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index to read.
+
+        Returns
+        -------
+        dict
+            The champion index with the same structure as the index, {term: {document ID: tf}}, and only
+            the champions of each term.
+        """
+        if index_name not in self.index:
+            raise ValueError("Invalid index type")
+
+        current_index = self.index[index_name]
+        document_lengths = self.document_lengths_index[index_name]
+        average_document_length = self.average_document_length[index_name.value]
+        champion_index = {}
+        for term, postings in current_index.items():
+            scores = sorted(
+                ((okapi_score_tf(tf, document_lengths[doc_id] / average_document_length) * self.idf[index_name][term], doc_id)
+                 for doc_id, tf in postings.items()),
+                key=lambda x: (-x[0], x[1])
+            )
+            threshold = self.impact_ratio * scores[0][0]
+            r = max(self.min_champions, sum(1 for score, _ in scores if score >= threshold))
+            champion_index[term] = {doc_id: postings[doc_id] for _, doc_id in scores[:r]}
+
+        return champion_index
+
+    def store_champion_index(self, path, index_name):
+        """
+        Stores the champion index to a file.
+        """
+        path = path + index_name.value + "_" + Index_types.CHAMPION.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.champion_index[index_name], file)
@@ -0,0 +1,68 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+import json
+import re
+
+
+class Doc_values_index:
+    def __init__(self, path="../Logic/core/indexer/index/"):
+        """
+        Initializes the Doc_values_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The documents and docid indexes should already be stored in it.
+        """
+
+        self.documents_index = Index_reader(path, index_name=Indexes.DOCUMENTS).index
+        self.document_ids = Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index
+        self.parsers = {
+            'release_year': self.parse_year,
+            'rating': self.parse_rating,
+            'budget': self.parse_dollars,
+            'gross_worldwide': self.parse_dollars,
+        }
+        self.doc_values_index = self.convert_to_doc_values_index()
+        self.store_doc_values_index(path)
+
+    def convert_to_doc_values_index(self):
+        """
+        Parses the numeric fields of the documents and stores each field as a column.
+
+        Returns
+        -------
+        dict
+            The doc values index with structure of {field: [value of each document]}, where the
+            values are in document ordinal order and None if the document has no value.
+        """
+        return {
+            field: [parser(self.documents_index[doc_id].get(field)) for doc_id in self.document_ids]
+            for field, parser in self.parsers.items()
+        }
+
+    def parse_year(self, value):
+        match = re.search(r'\d{4}', str(value)) if value is not None else None
+        return int(match.group()) if match else None
+
+    def parse_rating(self, value):
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return None
+
+    def parse_dollars(self, value):
+        """
+        Parses an amount of money like "$160,000,000 (estimated)".
+        Amounts in other currencies are left out, as they can't be compared with the dollar ones.
+        """
+        match = re.match(r'\s*\$\s*(\d[\d,]*)', value) if isinstance(value, str) else None
+        return int(match.group(1).replace(',', '')) if match else None
+
+    def store_doc_values_index(self, path):
+        """
+        Stores the doc values index to a file.
+        """
+        path = path + Indexes.DOCUMENTS.value + "_" + Index_types.DOC_VALUES.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.doc_values_index, file)
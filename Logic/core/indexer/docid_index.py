@@ -0,0 +1,39 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+import json
+
+
+class Docid_index:
+    def __init__(self, path="../Logic/core/indexer/index/"):
+        """
+        Initializes the Docid_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The documents index should already be stored in it.
+        """
+
+        self.documents_index = Index_reader(path, index_name=Indexes.DOCUMENTS).index
+        self.docid_index = self.create_docid_index()
+        self.store_docid_index(path)
+
+    def create_docid_index(self):
+        """
+        Gives each document a dense integer ID (ordinal).
+
+        Returns
+        -------
+        list
+            The document IDs, where the position of each ID is its ordinal. The IDs are sorted, so
+            sorting postings by ordinal is the same as sorting them by document ID.
+        """
+        return sorted(self.documents_index)
+
+    def store_docid_index(self, path):
+        """
+        Stores the docid index to a file.
+        """
+        path = path + Indexes.DOCUMENTS.value + "_" + Index_types.DOCID.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.docid_index, file)
@@ -0,0 +1,62 @@
+import os
+import json
+import tempfile
+from collections.abc import MutableMapping
+
+
+class Document_store(MutableMapping):
+    def __init__(self, path="../Logic/core/indexer/index/"):
+        """
+        A {document_id: document} dict whose documents are kept in a temporary file instead of in
+        memory, so a build only keeps the place of each document in the file. A document is written
+        as a line of JSON when it is set and read back when it is got. A document that is set again
+        keeps its first place, like in a dict, and its old line is left unused.
+
+        Parameters
+        ----------
+        path : str
+            The directory of the temporary file. The file is removed when the store is closed.
+        """
+        self.file = tempfile.TemporaryFile(prefix='documents_', dir=path)
+        self.offsets = {}
+
+    def __getitem__(self, document_id):
+        offset, length = self.offsets[document_id]
+        self.file.seek(offset)
+        return json.loads(self.file.read(length))
+
+    def __setitem__(self, document_id, document):
+        line = json.dumps(document).encode()
+        self.file.seek(0, os.SEEK_END)
+        self.offsets[document_id] = (self.file.tell(), len(line))
+        self.file.write(line + b'\n')
+
+    def __delitem__(self, document_id):
+        del self.offsets[document_id]
+
+    def __iter__(self):
+        return iter(self.offsets)
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def dump(self, file):
+        """
+        Writes the documents to a text file in the format of json.dump, a document at a time.
+        """
+        file.write('{')
+        separator = ''
+        for document_id, (offset, length) in self.offsets.items():
+            self.file.seek(offset)
+            file.write(separator + json.dumps(document_id) + ': ' + self.file.read(length).decode())
+            separator = ', '
+        file.write('}')
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
@@ -0,0 +1,72 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+import json
+import re
+
+
+class Facet_index:
+    def __init__(self, path="../Logic/core/indexer/index/"):
+        """
+        Initializes the Facet_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The raw documents and docid indexes should already be stored in it.
+        """
+
+        with open(path + "raw_" + Indexes.DOCUMENTS.value + "_index.json", "r") as file:
+            self.raw_documents_index = json.load(file)
+        self.document_ids = Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index
+        self.facets = {
+            'genres': lambda document: document.get('genres'),
+            'directors': lambda document: document.get('directors'),
+            'languages': lambda document: document.get('languages'),
+            'decade': self.get_decade,
+        }
+        self.facet_index = self.convert_to_facet_index()
+        self.store_facet_index(path)
+
+    def convert_to_facet_index(self):
+        """
+        Builds a column of the values of each facet for the documents. The values are stored once and
+        the documents refer to them by their position, as a document can have many of them.
+
+        Returns
+        -------
+        dict
+            The facet index with structure of
+            {
+                facet: {
+                    "values": [value],
+                    "documents": [[position of each value of the document in values]],
+                },
+            }
+            where the documents are in document ordinal order.
+        """
+        facet_index = {}
+        for facet, get_values in self.facets.items():
+            document_values = []
+            for doc_id in self.document_ids:
+                values = get_values(self.raw_documents_index.get(doc_id, {})) or []
+                document_values.append(sorted(set(value for value in values if value and value != 'N/A')))
+
+            facet_values = sorted(set(value for values in document_values for value in values))
+            positions = {value: i for i, value in enumerate(facet_values)}
+            facet_index[facet] = {
+                'values': facet_values,
+                'documents': [[positions[value] for value in values] for values in document_values],
+            }
+        return facet_index
+
+    def get_decade(self, document):
+        match = re.search(r'\d{4}', str(document.get('release_year')))
+        return [f'{int(match.group()) // 10 * 10}s'] if match else []
+
+    def store_facet_index(self, path):
+        """
+        Stores the facet index to a file.
+        """
+        path = path + Indexes.DOCUMENTS.value + "_" + Index_types.FACET.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.facet_index, file)
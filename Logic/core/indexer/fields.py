@@ -0,0 +1,101 @@
+def get_values(document: dict, name: str):
+    """
+    Returns the values of a text or keyword field of a document as a list. A value crawled as one
+    string, like a title, is one value, and a missing value is no value.
+    """
+    values = document.get(name) or []
+    return [values] if isinstance(values, str) else values
+
+
+def analyze_text(values):
+    """
+    The analyzer of the text fields: the words of each text, already preprocessed.
+    """
+    return [term for value in values for term in value.split()]
+
+
+def analyze_keyword(values):
+    """
+    The analyzer of the keyword fields: each value is a term as it is, e.g. a genre or a director.
+    """
+    return list(values)
+
+
+def analyze_number(value):
+    """
+    The analyzer of the numeric fields: the value as an int or a float, None if it isn't a number.
+    """
+    for parse in (int, float):
+        try:
+            return parse(value)
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+class Field:
+    TEXT = 'text'
+    KEYWORD = 'keyword'
+    NUMERIC = 'numeric'
+
+    def __init__(self, name: str, type: str, analyzer=None, positional: bool = False, tiers: tuple = None):
+        """
+        A field of the documents that Index indexes, with how it is analyzed.
+
+        A text or keyword field gets an index of {term: {document_id: tf}} and a length for each
+        document, the number of words of its values, like DocumentLengthsIndex counts them. A numeric
+        field gets an index of {document_id: value}, without the documents that have no value.
+
+        Parameters
+        ----------
+        name : str
+            The name of the field in the documents, which is also the name of its index.
+        type : str
+            Field.TEXT, Field.KEYWORD or Field.NUMERIC.
+        analyzer : function
+            Returns the terms of the list of values of a text or keyword field, or the number of the
+            value of a numeric field. By default, the one of the type. A build with more than one
+            process pickles it, so it should be defined at the top level of a module.
+        positional : bool
+            If True, the positions of the terms of a text field are indexed too, when the index is
+            positional.
+        tiers : tuple
+            The thresholds of the first and the second tier of the tiered index of a text or keyword
+            field: a posting whose tf is at least the first one is in the first tier, else at least
+            the second one in the second tier, else in the third tier. None if the field has no
+            tiered index.
+        """
+        if type not in (Field.TEXT, Field.KEYWORD, Field.NUMERIC):
+            raise ValueError('Invalid field type')
+        if positional and type != Field.TEXT:
+            raise ValueError('Only text fields can be positional')
+        if tiers is not None and type == Field.NUMERIC:
+            raise ValueError('Numeric fields have no tiered index')
+        self.name = name
+        self.type = type
+        self.analyzer = analyzer or {Field.TEXT: analyze_text, Field.KEYWORD: analyze_keyword, Field.NUMERIC: analyze_number}[type]
+        self.positional = positional
+        self.tiers = tiers
+
+    def get_tier(self, tf: int):
+        """
+        Returns the tier of a posting of the tiered index of the field.
+        """
+        first_tier_threshold, second_tier_threshold = self.tiers
+        if tf >= first_tier_threshold:
+            return 'first_tier'
+        if tf >= second_tier_threshold:
+            return 'second_tier'
+        return 'third_tier'
+
+    def __repr__(self):
+        return f'Field({self.name!r}, {self.type!r})'
+
+
+# the fields that Builder and IndexWriter index, and SearchEngine searches
+# feel free to change the thresholds of the tiers
+DEFAULT_FIELDS = [
+    Field('stars', Field.TEXT, positional=True, tiers=(3, 2)),
+    Field('genres', Field.KEYWORD, tiers=(1, 0)),
+    Field('summaries', Field.TEXT, positional=True, tiers=(10, 5)),
+]
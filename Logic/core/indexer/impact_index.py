@@ -0,0 +1,98 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .bm25 import okapi_score_tf
+import json
+
+
+class Impact_index:
+    def __init__(self, path="../Logic/core/indexer/index/", levels=256):
+        """
+        Initializes the Impact_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The document lengths, metadata and scoring indexes should already be stored in it.
+        levels : int
+            The number of quantized impact values, 256 so that an impact fits in a uint8.
+        """
+
+        self.levels = levels
+        self.index = {
+            Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
+            Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
+            Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+        }
+        self.document_lengths_index = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).index,
+        }
+        self.scoring_index = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.SCORING).index,
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.SCORING).index,
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.SCORING).index,
+        }
+        self.average_document_length = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index['averge_document_length']
+        self.impact_index = {
+            Indexes.STARS: self.convert_to_impact_index(Indexes.STARS),
+            Indexes.GENRES: self.convert_to_impact_index(Indexes.GENRES),
+            Indexes.SUMMARIES: self.convert_to_impact_index(Indexes.SUMMARIES),
+        }
+        self.store_impact_index(path, Indexes.STARS)
+        self.store_impact_index(path, Indexes.GENRES)
+        self.store_impact_index(path, Indexes.SUMMARIES)
+
+    def convert_to_impact_index(self, index_name):
+        """
+        Replaces the tf of each posting with its okapi bm25 score, quantized to an integer impact,
+        and groups the postings of each term into segments of equal impact.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index to read.
+
+        Returns
+        -------
+        dict
+            The impact index with structure of
+            {
+                "scale": float,
+                "impacts": {term: [[impact, [document IDs]], ...]}
+            }
+            The segments of a term are sorted by impact in descending order and the document IDs of a
+            segment in ascending order. An impact times the scale is the score it stands for.
+        """
+        if index_name not in self.index:
+            raise ValueError("Invalid index type")
+
+        current_index = self.index[index_name]
+        document_lengths = self.document_lengths_index[index_name]
+        average_document_length = self.average_document_length[index_name.value]
+        idf = self.scoring_index[index_name]['idf']
+        # one scale for the whole field, so the impacts of different terms can be added up
+        max_score = max(self.scoring_index[index_name]['bm25_upper_bound'].values(), default=0.0)
+        scale = max_score / (self.levels - 1) if max_score > 0 else 1.0
+
+        impacts = {}
+        for term in current_index:
+            segments = {}
+            for doc_id, tf in current_index[term].items():
+                score = okapi_score_tf(tf, document_lengths[doc_id] / average_document_length) * idf[term]
+                impact = min(self.levels - 1, max(0, int(round(score / scale))))
+                segments.setdefault(impact, []).append(doc_id)
+            impacts[term] = [[impact, sorted(segments[impact])] for impact in sorted(segments, reverse=True)]
+
+        return {
+            "scale": scale,
+            "impacts": impacts,
+        }
+
+    def store_impact_index(self, path, index_name):
+        """
+        Stores the impact index to a file.
+        """
+        path = path + index_name.value + "_" + Index_types.IMPACT.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.impact_index[index_name], file)
@@ -3,6 +3,11 @@ import os
 import json
 from enum import Enum
 import copy
+from .position_codec import encode_positions
+from .binary_index import write_binary_index
+from .fields import Field, DEFAULT_FIELDS, get_values
+from .indexes_enum import Index_types
+from .document_store import Document_store
 
 
 class Indexes(Enum):
@@ -13,90 +18,174 @@ class Indexes(Enum):
 
 
 class Index:
-    def __init__(self, preprocessed_documents: list):
-        """
-        Create a class for indexing.
-        """
-
-        self.preprocessed_documents = preprocessed_documents
+    # the gap left between two summaries or two stars, so a phrase can't span both
+    position_gap = 100
 
-        self.index = {
-            Indexes.DOCUMENTS.value: self.index_documents(),
-            Indexes.STARS.value: self.index_stars(),
-            Indexes.GENRES.value: self.index_genres(),
-            Indexes.SUMMARIES.value: self.index_summaries(),
-        }
-
-    def index_documents(self):
+    def __init__(self, preprocessed_documents: list, positional: bool = False, fields: list = None, documents: Document_store = None):
         """
-        Index the documents based on the document ID. In other words, create a dictionary
-        where the key is the document ID and the value is the document.
+        Create a class for indexing.
+        All the fields are indexed in a single pass over the documents, which also counts the length
+        of each document in each field, for the document lengths and metadata indexes, and places
+        each posting of a field with tiers in its tier, for the tiered index. Adding and removing a
+        document keeps all of them up to date in the time of the size of the document.
 
-        Returns
+        Parameters
         ----------
-        dict
-            The index of the documents based on the document ID.
+        preprocessed_documents : list
+            The documents to index. More can be indexed one at a time with index_document.
+        positional : bool
+            If True, the positions of the terms of the positional fields, the summaries and the stars
+            by default, are indexed too.
+        fields : list
+            The fields to index, each one a Field. By default DEFAULT_FIELDS, the stars, the genres
+            and the summaries.
+        documents : Document_store
+            If given, the documents index is kept in it, in a file, instead of in a dict in memory,
+            and preprocessed_documents reads the documents from it instead of keeping them in a list.
         """
 
-        current_index = {}
-        for document in self.preprocessed_documents:
-            current_index[document['id']] = copy.deepcopy(document)
+        self.fields = DEFAULT_FIELDS if fields is None else fields
+        self.document_store = documents
+        self.preprocessed_documents = list(preprocessed_documents)
+        documents_to_index = self.preprocessed_documents
+        if documents is not None:
+            self.preprocessed_documents = documents.values()
+        # counts the changes made to the index, so the caches of search results that watch it can tell they are stale
+        self.version = 0
+
+        self.index = {Indexes.DOCUMENTS.value: {} if documents is None else documents}
+        self.index.update((field.name, {}) for field in self.fields)
+        self.document_lengths = {field.name: {} for field in self.fields if field.type != Field.NUMERIC}
+        # the sum of the lengths in each field, for the averages of the metadata index
+        self.length_sums = {field_name: 0 for field_name in self.document_lengths}
+        self.tiered_index = {
+            field.name: {'first_tier': {}, 'second_tier': {}, 'third_tier': {}} for field in self.fields if field.tiers
+        }
+
+        self.positional_index = None
+        if positional:
+            self.positional_index = {field.name: {} for field in self.fields if field.positional}
 
-        return current_index
+        for document in documents_to_index:
+            self.add_document_fields(copy.deepcopy(document))
 
-    def index_stars(self):
+    def add_document_fields(self, document: dict):
         """
-        Index the documents based on the stars.
+        Adds a document to the documents index and its fields to their indexes. A document whose ID
+        is indexed already replaces it in the documents index, and its terms are counted again.
+        """
+        document_id = document['id']
+        self.index[Indexes.DOCUMENTS.value][document_id] = document
+        for field in self.fields:
+            if field.type == Field.NUMERIC:
+                values = document.get(field.name)
+                value = field.analyzer(values) if values is not None else None
+                if value is not None:
+                    self.index[field.name][document_id] = value
+                continue
 
-        Returns
-        ----------
-        dict
-            The index of the documents based on the stars. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
+            values = get_values(document, field.name)
+            current = self.index[field.name]
+            term_frequencies = {}
+            for term in field.analyzer(values):
+                term_frequencies[term] = term_frequencies.get(term, 0) + 1
+            for term, tf in term_frequencies.items():
+                postings = current.setdefault(term, {})
+                old_tf = postings.get(document_id, 0)
+                postings[document_id] = old_tf + tf
+                self.update_tier(field, term, document_id, old_tf, old_tf + tf)
+            self.set_document_length(field.name, document_id, sum(len(value.split()) for value in values))
+
+        if self.positional_index is not None:
+            for index_type, current in self.positional_index.items():
+                self.add_document_positions(document, current, index_type)
+
+    def set_document_length(self, field_name: str, document_id: str, length: int):
+        lengths = self.document_lengths[field_name]
+        self.length_sums[field_name] += length - lengths.get(document_id, 0)
+        lengths[document_id] = length
+
+    def update_tier(self, field: Field, term: str, document_id: str, old_tf: int, new_tf: int):
+        """
+        Moves a posting of a field to the tier of its new tf, in the tiered index of the field if it
+        has one. An old tf of 0 adds the posting, and a new tf of 0 removes it.
         """
-        current = {}
-        for doc in self.preprocessed_documents:
-            for star in doc[Indexes.STARS.value]:
-                for term in star.split():
-                    self.add_term_doc_to_index(term, doc, current, Indexes.STARS.value)
-        return current
-    
-    def index_genres(self):
+        tiers = self.tiered_index.get(field.name)
+        if tiers is None:
+            return
+        new_tier = field.get_tier(new_tf) if new_tf else None
+        if old_tf:
+            old_tier = field.get_tier(old_tf)
+            if old_tier != new_tier:
+                postings = tiers[old_tier][term]
+                del postings[document_id]
+                if not postings:
+                    del tiers[old_tier][term]
+        if new_tier is not None:
+            tiers[new_tier].setdefault(term, {})[document_id] = new_tf
+
+    def add_document_positions(self, document: dict, current: dict, index_type: str):
+        positions = {}
+        position = 0
+        for text in get_values(document, index_type):
+            for term in text.split():
+                positions.setdefault(term, []).append(position)
+                position += 1
+            position += self.position_gap
+        for term, term_positions in positions.items():
+            current.setdefault(term, {})[document['id']] = encode_positions(term_positions)
+
+    def index_document(self, document: dict):
         """
-        Index the documents based on the genres.
+        Indexes one more document, the same way the constructor indexes each of its documents, so
+        documents read one at a time end up in the same index. Unlike add_document_to_index, the
+        document is stored as it is, without a copy, and shouldn't be changed afterwards.
 
-        Returns
+        Parameters
         ----------
-        dict
-            The index of the documents based on the genres. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
+        document : dict
+            The preprocessed document.
         """
+        self.version += 1
+        if self.document_store is None:
+            self.preprocessed_documents.append(document)
+        self.add_document_fields(document)
 
-        current = {}
-        for doc in self.preprocessed_documents:
-            for term in doc[Indexes.GENRES.value]:
-                self.add_term_doc_to_index(term, doc, current, Indexes.GENRES.value)           
-
-        return current
-
-    def index_summaries(self):
+    def merge_index(self, index):
         """
-        Index the documents based on the summaries (not first_page_summary).
+        Adds the documents of another index to this one. If the other index was built from the
+        documents that follow the ones of this index, the terms, the postings and the documents end
+        up in the same order as in an index built from all of them at once, so the stored indexes are
+        the same too.
 
-        Returns
+        Parameters
         ----------
-        dict
-            The index of the documents based on the summaries. You should also store each terms' tf in each document.
-            So the index type is: {term: {document_id: tf}}
+        index : Index
+            The index to add, of the same fields, with positions if and only if this one has them.
         """
-
-        current = {}
-        for doc in self.preprocessed_documents:
-            for summary in doc[Indexes.SUMMARIES.value]:
-                for term in summary.split():
-                    self.add_term_doc_to_index(term, doc, current, Indexes.SUMMARIES.value)         
-
-        return current
+        self.version += 1
+        if self.document_store is None:
+            self.preprocessed_documents.extend(index.preprocessed_documents)
+        # a document ID crawled twice keeps its first place, like in the constructor
+        self.index[Indexes.DOCUMENTS.value].update(index.index[Indexes.DOCUMENTS.value])
+        for field in self.fields:
+            if field.type == Field.NUMERIC:
+                self.index[field.name].update(index.index[field.name])
+                continue
+            current = self.index[field.name]
+            for term, postings in index.index[field.name].items():
+                term_postings = current.setdefault(term, {})
+                for document_id, tf in postings.items():
+                    old_tf = term_postings.get(document_id, 0)
+                    term_postings[document_id] = old_tf + tf
+                    self.update_tier(field, term, document_id, old_tf, old_tf + tf)
+            for document_id, length in index.document_lengths[field.name].items():
+                self.set_document_length(field.name, document_id, length)
+
+        if self.positional_index is not None:
+            for index_type, current in self.positional_index.items():
+                for term, postings in index.positional_index[index_type].items():
+                    current.setdefault(term, {}).update(postings)
 
     def get_posting_list(self, word: str, index_type: str):
         """
@@ -137,17 +226,8 @@ class Index:
             Document to add to all the indexes
         """
         if document['id'] not in self.index[Indexes.DOCUMENTS.value]:
-            self.index[Indexes.DOCUMENTS.value][document['id']] = copy.deepcopy(document)
-            for summary in document[Indexes.SUMMARIES.value]:
-                for term in summary.split():
-                    self.add_term_doc_to_index(term, document, self.index[Indexes.SUMMARIES.value], Indexes.SUMMARIES.value)
-
-            for star in document[Indexes.STARS.value]:
-                for term in star.split():
-                    self.add_term_doc_to_index(term, document, self.index[Indexes.STARS.value], Indexes.STARS.value)
-
-            for genre in document[Indexes.GENRES.value]:
-                self.add_term_doc_to_index(genre, document, self.index[Indexes.GENRES.value], Indexes.GENRES)
+            self.version += 1
+            self.add_document_fields(copy.deepcopy(document))
 
     def remove_document_from_index(self, document_id: str):
         """
@@ -159,27 +239,27 @@ class Index:
             ID of the document to remove from all the indexes
         """
         if document_id in self.index[Indexes.DOCUMENTS.value]:
+            self.version += 1
 
-            # doc = copy.deepcopy(self.index[Indexes.DOCUMENTS.value][document_id])
             doc = self.index[Indexes.DOCUMENTS.value][document_id]
 
-            for summary in doc[Indexes.SUMMARIES.value]:
-                for term in summary.split():
-                    del self.index[Indexes.SUMMARIES.value][term][document_id]
-                    if not self.index[Indexes.SUMMARIES.value][term]:
-                        del self.index[Indexes.SUMMARIES.value][term]                
-
-            for star in doc[Indexes.STARS.value]:
-                for term in star.split():
-                    del self.index[Indexes.STARS.value][term][document_id]
-                    if not self.index[Indexes.STARS.value][term]:
-                        del self.index[Indexes.STARS.value][term]
-
-
-            for term in doc[Indexes.GENRES.value]:
-                del self.index[Indexes.GENRES.value][term][document_id]
-                if not self.index[Indexes.GENRES.value][term]:
-                    del self.index[Indexes.GENRES.value][term]
+            for field in self.fields:
+                if field.type == Field.NUMERIC:
+                    self.index[field.name].pop(document_id, None)
+                    continue
+                current = self.index[field.name]
+                for term in set(field.analyzer(get_values(doc, field.name))):
+                    self.update_tier(field, term, document_id, current[term].pop(document_id), 0)
+                    if not current[term]:
+                        del current[term]
+                self.length_sums[field.name] -= self.document_lengths[field.name].pop(document_id)
+
+            if self.positional_index is not None:
+                for index_type, current in self.positional_index.items():
+                    for term in {term for text in get_values(doc, index_type) for term in text.split()}:
+                        del current[term][document_id]
+                        if not current[term]:
+                            del current[term]
 
             del self.index[Indexes.DOCUMENTS.value][document_id]
 
@@ -237,7 +317,7 @@ class Index:
         else:
             print('Remove is incorrect')
 
-    def store_index(self, path: str, index_type: str):
+    def store_index(self, path: str, index_type: str, binary: bool = False):
         """
         Stores the index in a file (such as a JSON file)
 
@@ -246,24 +326,182 @@ class Index:
         path : str
             Path to store the file
         index_type: str
-            type of index we want to store (documents, stars, genres, summaries)
+            type of index we want to store (documents, or the name of a field like stars, genres, summaries)
+        binary: bool
+            If True, the index is stored in the binary format of Binary_index instead of JSON, which
+            Index_reader memory maps when the file ends with "_index.bin". Only the indexes of the text
+            and keyword fields can be stored in it.
         """
         
 
         if index_type not in self.index:
             raise ValueError('Invalid index type')
+        if binary and index_type not in self.document_lengths:
+            raise ValueError('Only the indexes of the text and keyword fields can be stored in the binary format')
 
         try:
             file_path = path
             # file_path = os.path.join(path, f"{index_type}.json")
-            with open(file_path, 'w') as file:
-                json.dump(self.index[index_type], file)
+            if binary:
+                write_binary_index(file_path, self.index[index_type])
+            else:
+                with open(file_path, 'w') as file:
+                    if isinstance(self.index[index_type], Document_store):
+                        self.index[index_type].dump(file)
+                    else:
+                        json.dump(self.index[index_type], file)
             
             print(f"Index '{index_type}' stored successfully in '{file_path}'")
         except Exception as e:
             print(f"Error storing index '{index_type}' to file: {e}")
 
 
+    def store_positional_index(self, path: str, index_type: str):
+        """
+        Stores the positional index in a file (such as a JSON file)
+
+        Parameters
+        ----------
+        path : str
+            Path to store the file
+        index_type: str
+            type of positional index we want to store (stars, summaries)
+        """
+        if self.positional_index is None or index_type not in self.positional_index:
+            raise ValueError('Invalid index type')
+
+        with open(path, 'w') as file:
+            json.dump(self.positional_index[index_type], file)
+
+    def store_document_lengths_index(self, path: str, index_type: str):
+        """
+        Stores the lengths of the documents in a text or keyword field, in the file and the format
+        of DocumentLengthsIndex.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        index_type : str
+            The name of the field.
+        """
+        if index_type not in self.document_lengths:
+            raise ValueError('Invalid index type')
+
+        with open(path + index_type + '_' + Index_types.DOCUMENT_LENGTH.value + '_index.json', 'w') as file:
+            json.dump(self.document_lengths[index_type], file, indent=4)
+
+    def get_metadata_index(self):
+        """
+        Returns the metadata index, as Metadata_index builds it.
+
+        Returns
+        ----------
+        dict
+            The average length of the documents in each text and keyword field and the number of
+            documents.
+        """
+        document_count = len(self.index[Indexes.DOCUMENTS.value])
+        return {
+            'averge_document_length': {
+                field: length_sum / max(document_count, 1) for field, length_sum in self.length_sums.items()
+            },
+            'document_count': document_count,
+        }
+
+    def store_metadata_index(self, path: str):
+        """
+        Stores the metadata index, in the file and the format of Metadata_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        """
+        with open(path + Indexes.DOCUMENTS.value + '_' + Index_types.METADATA.value + '_index.json', 'w') as file:
+            json.dump(self.get_metadata_index(), file, indent=4)
+
+    def get_tiered_index(self, index_type: str):
+        """
+        Returns the tiered index of a field, with the terms and the documents of each tier in the
+        order of the index of the field, as Tiered_index builds it.
+
+        Parameters
+        ----------
+        index_type : str
+            The name of a field with tiers.
+
+        Returns
+        ----------
+        dict
+            {tier: {term: {document_id: tf}}} for the first, the second and the third tier.
+        """
+        if index_type not in self.tiered_index:
+            raise ValueError('Invalid index type')
+
+        tiered_index = {}
+        for tier, tier_index in self.tiered_index[index_type].items():
+            tiered_index[tier] = {
+                term: {document_id: tier_index[term][document_id] for document_id in postings if document_id in tier_index[term]}
+                for term, postings in self.index[index_type].items() if term in tier_index
+            }
+        return tiered_index
+
+    def store_tiered_index(self, path: str, index_type: str):
+        """
+        Stores the tiered index of a field, in the file and the format of Tiered_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the directory where the indexes are stored.
+        index_type : str
+            The name of a field with tiers.
+        """
+        with open(path + index_type + '_' + Index_types.TIERED.value + '_index.json', 'w') as file:
+            json.dump(self.get_tiered_index(index_type), file, indent=4)
+
+    def check_auxiliary_indexes_are_consistent(self):
+        """
+        Checks that the document lengths, the metadata and the tiered indexes, which are kept up to
+        date as documents are added and removed, are the ones a full rebuild from the documents gives.
+
+        Returns
+        ----------
+        bool
+            True if all of them are consistent, False otherwise
+        """
+        consistent = True
+        document_count = len(self.index[Indexes.DOCUMENTS.value])
+        average_lengths = self.get_metadata_index()['averge_document_length']
+        for field in self.fields:
+            if field.type == Field.NUMERIC:
+                continue
+            lengths = {
+                document_id: sum(len(value.split()) for value in get_values(document, field.name))
+                for document_id, document in self.index[Indexes.DOCUMENTS.value].items()
+            }
+            if lengths != self.document_lengths[field.name]:
+                print(f"Document lengths of '{field.name}' are inconsistent")
+                consistent = False
+            average = sum(lengths.values()) / max(document_count, 1)
+            if average != average_lengths[field.name]:
+                print(f"Average document length of '{field.name}' is inconsistent")
+                consistent = False
+            if not field.tiers:
+                continue
+            tiers = {'first_tier': {}, 'second_tier': {}, 'third_tier': {}}
+            for term, postings in self.index[field.name].items():
+                for document_id, tf in postings.items():
+                    tiers[field.get_tier(tf)].setdefault(term, {})[document_id] = tf
+            if tiers != self.tiered_index[field.name]:
+                print(f"Tiered index of '{field.name}' is inconsistent")
+                consistent = False
+
+        if consistent:
+            print('Auxiliary indexes are consistent')
+        return consistent
+
     def load_index(self, path: str):
         """
         Loads the index from a file (such as a JSON file)
@@ -1,7 +1,10 @@
 from .indexes_enum import Indexes,Index_types
+from .binary_index import Binary_index
+from .lazy_index import Lazy_index
 import json
+import os
 class Index_reader:
-    def __init__(self,path: str, index_name: Indexes, index_type: Index_types = None):
+    def __init__(self,path: str, index_name: Indexes, index_type: Index_types = None, lazy: bool = False, cache_size: int = 1024):
         """
         Initializes the Index_reader.
 
@@ -13,10 +16,17 @@ class Index_reader:
             The name of the index to read.
         index_type : Index_types
             The type of the index to read.  
+        lazy : bool
+            If True, only the term dictionary is read and the postings are read on first access, see
+            Lazy_index. Only the indexes of {term: {document_id: tf}} can be read lazily.
+        cache_size : int
+            The number of posting lists a lazy index keeps after reading them.
         """
         self.path = path
         self.index_name = index_name
         self.index_type = index_type
+        self.lazy = lazy
+        self.cache_size = cache_size
         self.index = self.get_index()
 
     def get_index(self):
@@ -26,14 +36,22 @@ class Index_reader:
         Returns
         -------
         dict
-            The index.
+            The index. If the index is also stored in the binary format, in a file ending with
+            "_index.bin" instead of "_index.json", that file is memory mapped instead and the
+            Binary_index is returned, which reads like the dict. A lazy reader returns a Lazy_index.
         """
         absolute_path = self.path + self.index_name.value
         
         if self.index_type != None:
             absolute_path = absolute_path + "_" + self.index_type.value
 
+        if os.path.exists(absolute_path + "_index.bin"):
+            if self.lazy:
+                return Lazy_index(absolute_path + "_index.bin", self.cache_size)
+            return Binary_index(absolute_path + "_index.bin")
         absolute_path = absolute_path + "_index.json"
+        if self.lazy:
+            return Lazy_index(absolute_path, self.cache_size)
         
         with open(absolute_path, 'r') as file:
             return json.load(file)
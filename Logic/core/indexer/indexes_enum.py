@@ -6,8 +6,20 @@ class Indexes(Enum):
     STARS = 'stars'
     GENRES = 'genres'
     SUMMARIES = 'summaries'
+    # the long text fields, indexed by Spimi_index
+    REVIEWS = 'reviews'
+    SYNOPSIS = 'synopsis'
 
 class Index_types(Enum):
     TIERED = 'tiered'
     DOCUMENT_LENGTH = 'document_length'
-    METADATA = 'metadata'
\ No newline at end of file
+    METADATA = 'metadata'
+    SCORING = 'scoring'
+    BLOCK_MAX = 'block_max'
+    DOCID = 'docid'
+    IMPACT = 'impact'
+    CHAMPION = 'champion'
+    POSITIONAL = 'positional'
+    BITMAP = 'bitmap'
+    DOC_VALUES = 'doc_values'
+    FACET = 'facet'
\ No newline at end of file
@@ -0,0 +1,92 @@
+import os
+import re
+import json
+import mmap
+from collections import OrderedDict
+from collections.abc import Mapping
+from .binary_index import Binary_index
+
+# a term of a JSON index and its postings, which are flat objects of {document_id: tf}
+JSON_POSTINGS = re.compile(rb'"((?:[^"\\]|\\.)*)"\s*:\s*(\{[^{}]*\})')
+
+
+class Lazy_index(Mapping):
+    def __init__(self, path, cache_size=1024):
+        """
+        Opens an index of {term: {document_id: tf}} without reading its postings.
+        Only the term dictionary is kept in memory: a binary index has one already, and a JSON index
+        is memory mapped and scanned once for the position of each term's postings. The postings of a
+        term are parsed the first time they are asked for.
+
+        Parameters
+        ----------
+        path : str
+            The path of the index file, ending with "_index.json" or "_index.bin".
+        cache_size : int
+            The number of parsed posting lists to keep, the least recently used are dropped first.
+            0 turns the cache off.
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.binary = None
+        self.terms = None
+        if path.endswith('.bin'):
+            self.binary = Binary_index(path)
+        else:
+            with open(path, 'rb') as file:
+                # an empty file can't be memory mapped
+                self.buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(file.fileno()).st_size else b''
+            self.terms = {}
+            for match in JSON_POSTINGS.finditer(self.buffer):
+                self.terms[json.loads(b'"' + match.group(1) + b'"')] = match.span(2)
+
+    def read(self, term):
+        """
+        Parses the postings of a term, without the cache.
+
+        Returns
+        -------
+        dict
+            The postings of the term, {document_id: tf}.
+        """
+        if self.binary is not None:
+            return self.binary[term]
+        start, end = self.terms[term]
+        return json.loads(self.buffer[start:end])
+
+    def get_document_frequency(self, term):
+        """
+        Returns the number of documents that contain a term, 0 if it is not in the index.
+        """
+        if self.binary is not None:
+            i = self.binary.find_term(term)
+            return int(self.binary.document_frequencies[i]) if i >= 0 else 0
+        if term not in self.terms:
+            return 0
+        # the document IDs have no colons, so each one is followed by the only colon of its posting
+        start, end = self.terms[term]
+        return self.buffer[start:end].count(b':')
+
+    def __getitem__(self, term):
+        postings = self.cache.get(term)
+        if postings is not None:
+            self.cache.move_to_end(term)
+            return postings
+        postings = self.read(term)
+        if self.cache_size > 0:
+            self.cache[term] = postings
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return postings
+
+    def __contains__(self, term):
+        if self.binary is not None:
+            return term in self.binary
+        return term in self.terms
+
+    def __iter__(self):
+        return iter(self.binary if self.binary is not None else self.terms)
+
+    def __len__(self):
+        return len(self.binary if self.binary is not None else self.terms)
@@ -0,0 +1,364 @@
+import numpy as np
+from collections import OrderedDict
+from collections.abc import Mapping
+from .binary_index import Binary_index
+from .lazy_index import Lazy_index
+
+
+class Ordinal_index:
+    def __init__(self, index: dict, ordinals: dict):
+        """
+        Converts an index of {term: {document_id: tf}} to posting arrays keyed by document ordinals.
+        The postings of all terms are stored back to back in two arrays, and each term only keeps the
+        offset of its postings, so the document ID strings are not repeated for every term.
+        Every sqrt(df)-th posting of a term is also kept as a skip pointer, so an intersection can
+        jump over the postings in between.
+
+        Parameters
+        ----------
+        index : dict | Binary_index
+            The index to convert. The postings of a Binary_index are decoded all at once instead of
+            being read as dicts.
+        ordinals : dict
+            The ordinal of each document ID, as given by the docid index.
+        """
+        self.terms = {}
+        if isinstance(index, Binary_index):
+            terms, offsets, documents, tfs = index.get_all_postings()
+            self.terms = {term: i for i, term in enumerate(terms)}
+            # the document IDs of both are sorted, so mapping the positions keeps the postings sorted
+            to_ordinals = np.array([ordinals[doc_id] for doc_id in index.get_document_ids()], dtype=np.int32)
+            self.offsets = offsets
+            self.documents = to_ordinals[documents] if len(documents) else np.zeros(0, dtype=np.int32)
+            self.tfs = tfs.astype(np.int32)
+        else:
+            offsets = [0]
+            documents = []
+            tfs = []
+            for term, postings in index.items():
+                self.terms[term] = len(self.terms)
+                for ordinal, tf in sorted((ordinals[doc_id], tf) for doc_id, tf in postings.items()):
+                    documents.append(ordinal)
+                    tfs.append(tf)
+                offsets.append(len(documents))
+
+            self.offsets = np.array(offsets, dtype=np.int64)
+            self.documents = np.array(documents, dtype=np.int32)
+            self.tfs = np.array(tfs, dtype=np.int32)
+
+        skip_offsets = [0]
+        skip_documents = []
+        for i in range(len(self.terms)):
+            term_documents = self.documents[self.offsets[i]:self.offsets[i + 1]]
+            skip_documents.append(term_documents[::self.get_skip_interval(len(term_documents))])
+            skip_offsets.append(skip_offsets[-1] + len(skip_documents[-1]))
+        self.skip_offsets = np.array(skip_offsets, dtype=np.int64)
+        self.skip_documents = np.concatenate(skip_documents) if skip_documents else np.zeros(0, dtype=np.int32)
+
+    def __contains__(self, term):
+        return term in self.terms
+
+    def __len__(self):
+        return len(self.terms)
+
+    def __iter__(self):
+        return iter(self.terms)
+
+    def get_postings(self, term):
+        """
+        Returns the postings of a term.
+
+        Parameters
+        ----------
+        term : str
+            The term to get the postings of.
+
+        Returns
+        -------
+        tuple
+            The document ordinals, sorted in ascending order, and the tf of the term in each of them.
+            Both are empty if the term is not in the index.
+        """
+        i = self.terms.get(term)
+        if i is None:
+            return self.documents[:0], self.tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.documents[start:end], self.tfs[start:end]
+
+    def get_skip_interval(self, document_frequency):
+        """
+        Returns the number of postings between two skip pointers of a posting list.
+
+        Parameters
+        ----------
+        document_frequency : int
+            The length of the posting list.
+
+        Returns
+        -------
+        int
+            The interval, the ceiling of the square root of the length.
+        """
+        return max(1, int(np.ceil(np.sqrt(document_frequency))))
+
+    def get_skip_pointers(self, term):
+        """
+        Returns the skip pointers of a term.
+
+        Parameters
+        ----------
+        term : str
+            The term to get the skip pointers of.
+
+        Returns
+        -------
+        tuple
+            The documents of every interval-th posting, and the interval.
+        """
+        i = self.terms.get(term)
+        if i is None:
+            return self.skip_documents[:0], 1
+        start, end = self.skip_offsets[i], self.skip_offsets[i + 1]
+        return self.skip_documents[start:end], self.get_skip_interval(int(self.offsets[i + 1] - self.offsets[i]))
+
+    def get_document_frequency(self, term):
+        """
+        Returns the number of documents that contain a term.
+
+        Parameters
+        ----------
+        term : str
+            The term to get the document frequency of.
+
+        Returns
+        -------
+        int
+            The document frequency of the term.
+        """
+        i = self.terms.get(term)
+        if i is None:
+            return 0
+        return int(self.offsets[i + 1] - self.offsets[i])
+
+    def get_tf(self, term, document):
+        """
+        Returns the tf of a term in a document.
+
+        Parameters
+        ----------
+        term : str
+            The term.
+        document : int
+            The ordinal of the document.
+
+        Returns
+        -------
+        int
+            The tf of the term in the document, 0 if the document doesn't contain the term.
+        """
+        documents, tfs = self.get_postings(term)
+        position = documents.searchsorted(document)
+        if position < len(documents) and documents[position] == document:
+            return int(tfs[position])
+        return 0
+
+
+class Lazy_ordinal_index(Ordinal_index):
+    def __init__(self, index: Lazy_index, ordinals: dict, cache_size=1024):
+        """
+        Gives the postings of a Lazy_index as arrays keyed by document ordinals, like Ordinal_index,
+        but only converts the postings of a term the first time they are asked for.
+
+        Parameters
+        ----------
+        index : Lazy_index
+            The index to convert.
+        ordinals : dict
+            The ordinal of each document ID, as given by the docid index.
+        cache_size : int
+            The number of converted posting lists to keep, the least recently used are dropped first.
+            0 turns the cache off.
+        """
+        self.index = index
+        self.ordinals = ordinals
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.to_ordinals = None
+
+    def __contains__(self, term):
+        return term in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(self.index)
+
+    def get_postings(self, term):
+        """
+        Returns the postings of a term, as Ordinal_index.get_postings does.
+        """
+        postings = self.cache.get(term)
+        if postings is not None:
+            self.cache.move_to_end(term)
+            return postings
+
+        if term not in self.index:
+            postings = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+        elif self.index.binary is not None:
+            if self.to_ordinals is None:
+                self.to_ordinals = np.array([self.ordinals[doc_id] for doc_id in self.index.binary.get_document_ids()], dtype=np.int32)
+            documents, tfs = self.index.binary.get_postings(term)
+            postings = self.to_ordinals[documents], tfs.astype(np.int32)
+        else:
+            pairs = sorted((self.ordinals[doc_id], tf) for doc_id, tf in self.index.read(term).items())
+            postings = np.array([ordinal for ordinal, _ in pairs], dtype=np.int32), np.array([tf for _, tf in pairs], dtype=np.int32)
+
+        if self.cache_size > 0:
+            self.cache[term] = postings
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return postings
+
+    def get_skip_pointers(self, term):
+        """
+        Returns the skip pointers of a term, as Ordinal_index.get_skip_pointers does.
+        """
+        documents = self.get_postings(term)[0]
+        interval = self.get_skip_interval(len(documents))
+        return documents[::interval], interval
+
+    def get_document_frequency(self, term):
+        """
+        Returns the number of documents that contain a term, without converting its postings.
+        """
+        return self.index.get_document_frequency(term)
+
+
+class Segmented_ordinal_index(Ordinal_index):
+    def __init__(self, indexes: list, offsets, live_documents, cache_size=1024):
+        """
+        Gives the postings of an index split in segments as one Ordinal_index. The documents of each
+        segment come after the documents of the segments before it, so the postings of a term are the
+        postings of the segments back to back, and the deleted documents are left out of them.
+
+        Parameters
+        ----------
+        indexes : list
+            The Ordinal_index of each segment, keyed by the ordinals of the segment.
+        offsets : numpy.ndarray
+            The ordinal of the first document of each segment.
+        live_documents : numpy.ndarray
+            Whether each document is not deleted, indexed by ordinal.
+        cache_size : int
+            The number of merged posting lists to keep, the least recently used are dropped first.
+            0 turns the cache off.
+        """
+        self.indexes = indexes
+        self.segment_offsets = offsets
+        self.live_documents = live_documents
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+
+    def __contains__(self, term):
+        # a term whose documents are all deleted is not in the index
+        return any(term in index for index in self.indexes) and len(self.get_postings(term)[0]) > 0
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __iter__(self):
+        terms = dict.fromkeys(term for index in self.indexes for term in index)
+        return (term for term in terms if term in self)
+
+    def get_postings(self, term):
+        """
+        Returns the postings of a term, as Ordinal_index.get_postings does.
+        """
+        postings = self.cache.get(term)
+        if postings is not None:
+            self.cache.move_to_end(term)
+            return postings
+
+        documents, tfs = [], []
+        for index, offset in zip(self.indexes, self.segment_offsets):
+            if term in index:
+                segment_documents, segment_tfs = index.get_postings(term)
+                documents.append(segment_documents + np.int32(offset))
+                tfs.append(segment_tfs)
+        if documents:
+            documents, tfs = np.concatenate(documents), np.concatenate(tfs)
+            live = self.live_documents[documents]
+            postings = documents[live], tfs[live]
+        else:
+            postings = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)
+
+        if self.cache_size > 0:
+            self.cache[term] = postings
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return postings
+
+    def get_skip_pointers(self, term):
+        """
+        Returns the skip pointers of a term, as Ordinal_index.get_skip_pointers does.
+        """
+        documents = self.get_postings(term)[0]
+        interval = self.get_skip_interval(len(documents))
+        return documents[::interval], interval
+
+    def get_document_frequency(self, term):
+        """
+        Returns the number of documents that contain a term and are not deleted.
+        """
+        return len(self.get_postings(term)[0])
+
+
+class Segmented_positional_index(Mapping):
+    def __init__(self, indexes: list, offsets, live_documents):
+        """
+        Gives the positional indexes of a field in the segments of an index as one, like
+        Segmented_ordinal_index gives their postings. Each index is {term: (document ordinals,
+        encoded positions of each document)}, and the ones of a term are combined the first time
+        they are asked for.
+
+        Parameters
+        ----------
+        indexes : list
+            The positional index of the field in each segment, keyed by the ordinals of the segment.
+        offsets : numpy.ndarray
+            The ordinal of the first document of each segment.
+        live_documents : numpy.ndarray
+            Whether each document is not deleted, indexed by ordinal.
+        """
+        self.indexes = indexes
+        self.segment_offsets = offsets
+        self.live_documents = live_documents
+        self.cache = {}
+
+    def __getitem__(self, term):
+        postings = self.cache.get(term)
+        if postings is not None:
+            return postings
+
+        documents, positions = [], []
+        for index, offset in zip(self.indexes, self.segment_offsets):
+            if term in index:
+                documents.append(index[term][0] + np.int32(offset))
+                positions.extend(index[term][1])
+        if not documents:
+            raise KeyError(term)
+        documents = np.concatenate(documents)
+        live = np.flatnonzero(self.live_documents[documents])
+        if len(live) == 0:
+            raise KeyError(term)
+        postings = documents[live], [positions[i] for i in live]
+        self.cache[term] = postings
+        return postings
+
+    def __iter__(self):
+        terms = dict.fromkeys(term for index in self.indexes for term in index)
+        return (term for term in terms if term in self)
+
+    def __len__(self):
+        return sum(1 for _ in self)
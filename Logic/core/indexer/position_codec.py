@@ -0,0 +1,60 @@
+import base64
+
+
+def encode_positions(positions):
+    """
+    Compresses the sorted positions of a term in a document.
+    Each position is stored as the gap to the previous one, and each gap as a varint: 7 bits per
+    byte, with the high bit set on every byte but the last. The bytes are base64 encoded so they
+    can be stored in JSON.
+
+    Parameters
+    ----------
+    positions : List[int]
+        The positions, in ascending order.
+
+    Returns
+    -------
+    str
+        The compressed positions.
+    """
+    encoded = bytearray()
+    previous = 0
+    for position in positions:
+        gap = position - previous
+        previous = position
+        while gap >= 0x80:
+            encoded.append((gap & 0x7f) | 0x80)
+            gap >>= 7
+        encoded.append(gap)
+    return base64.b64encode(bytes(encoded)).decode('ascii')
+
+
+def decode_positions(encoded):
+    """
+    Decompresses the positions compressed by encode_positions.
+
+    Parameters
+    ----------
+    encoded : str
+        The compressed positions.
+
+    Returns
+    -------
+    List[int]
+        The positions, in ascending order.
+    """
+    positions = []
+    position = 0
+    gap = 0
+    shift = 0
+    for byte in base64.b64decode(encoded):
+        gap |= (byte & 0x7f) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            position += gap
+            positions.append(position)
+            gap = 0
+            shift = 0
+    return positions
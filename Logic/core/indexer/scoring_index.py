@@ -0,0 +1,149 @@
+from .indexes_enum import Indexes, Index_types
+from .index_reader import Index_reader
+from .bm25 import okapi_score_tf
+import numpy as np
+import json
+
+
+class Scoring_index:
+    def __init__(self, path="../Logic/core/indexer/index/"):
+        """
+        Initializes the Scoring_index.
+
+        Parameters
+        ----------
+        path : str
+            The path to the indexes. The document lengths and metadata indexes should already be stored in it.
+        """
+
+        self.index = {
+            Indexes.STARS: Index_reader(path, index_name=Indexes.STARS).index,
+            Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
+            Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
+        }
+        self.document_lengths_index = {
+            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).index,
+            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).index,
+        }
+        metadata_index = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index
+        self.document_count = metadata_index['document_count']
+        self.average_document_length = metadata_index['averge_document_length']
+
+        self.scoring_index = {
+            Indexes.STARS: self.create_scoring_index(Indexes.STARS),
+            Indexes.GENRES: self.create_scoring_index(Indexes.GENRES),
+            Indexes.SUMMARIES: self.create_scoring_index(Indexes.SUMMARIES),
+        }
+        self.store_scoring_index(path, Indexes.STARS)
+        self.store_scoring_index(path, Indexes.GENRES)
+        self.store_scoring_index(path, Indexes.SUMMARIES)
+
+    def create_scoring_index(self, index_name):
+        """
+        Creates the scoring tables of a field.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index to read.
+
+        Returns
+        -------
+        dict
+            The scoring index with structure of
+            {
+                "document_frequency": {term: df},
+                "idf": {term: log(N / df)},
+                "document_norms": {"nn" | "nt" | "ln" | "lt": {document_id: norm}},
+                "bm25_upper_bound": {term: the highest okapi bm25 score of the term in any document}
+            }
+            where the keys of document_norms are the tf and idf part of the document method.
+        """
+        if index_name not in self.index:
+            raise ValueError("Invalid index type")
+
+        current_index = self.index[index_name]
+        document_frequency = {}
+        idf = {}
+        for term in current_index:
+            document_frequency[term] = len(current_index[term])
+            idf[term] = np.log(self.document_count / document_frequency[term])
+
+        document_norms = {}
+        for scheme in ['nn', 'nt', 'ln', 'lt']:
+            document_norms[scheme] = self.get_document_norms(current_index, idf, scheme)
+
+        return {
+            "document_frequency": document_frequency,
+            "idf": idf,
+            "document_norms": document_norms,
+            "bm25_upper_bound": self.get_bm25_upper_bounds(index_name, idf),
+        }
+
+    def get_document_norms(self, current_index, idf, scheme):
+        """
+        Computes the L2 norm of every document vector of a field.
+
+        Parameters
+        ----------
+        current_index : dict
+            The index of the field.
+        idf : dict
+            The idf of each term of the field.
+        scheme : str (n|l)(n|t)
+            The tf and idf part of the document method.
+
+        Returns
+        -------
+        dict
+            A dictionary of the document IDs and the norm of their vectors.
+        """
+        norms = {}
+        for term, postings in current_index.items():
+            for doc_id, tf in postings.items():
+                weight = np.log(tf) + 1 if scheme[0] == 'l' else tf
+                if scheme[1] == 't':
+                    weight = weight * idf[term]
+                norms[doc_id] = norms.get(doc_id, 0) + weight * weight
+        for doc_id in norms:
+            norms[doc_id] = float(np.sqrt(norms[doc_id]))
+        return norms
+
+    def get_bm25_upper_bounds(self, index_name, idf):
+        """
+        Computes the highest okapi bm25 score each term gives to a document of a field.
+        The search engine uses them to skip documents that can't make it to the top results.
+
+        Parameters
+        ----------
+        index_name : Indexes
+            The name of the index to read.
+        idf : dict
+            The idf of each term of the field.
+
+        Returns
+        -------
+        dict
+            A dictionary of the terms and their upper bounds.
+        """
+        current_index = self.index[index_name]
+        document_lengths = self.document_lengths_index[index_name]
+        average_document_length = self.average_document_length[index_name.value]
+
+        upper_bounds = {}
+        for term, postings in current_index.items():
+            upper_bound = 0.0
+            for doc_id, tf in postings.items():
+                score = okapi_score_tf(tf, document_lengths[doc_id] / average_document_length) * idf[term]
+                upper_bound = max(upper_bound, score)
+            upper_bounds[term] = float(upper_bound)
+        return upper_bounds
+
+    def store_scoring_index(self, path, index_name):
+        """
+        Stores the scoring index to a file.
+        """
+        path = path + index_name.value + "_" + Index_types.SCORING.value + "_index.json"
+        with open(path, "w") as file:
+            json.dump(self.scoring_index[index_name], file)
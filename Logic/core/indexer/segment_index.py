@@ -0,0 +1,164 @@
+import os
+import json
+import shutil
+from .indexes_enum import Indexes, Index_types
+from .fields import Field
+from .document_store import Document_store
+from .docid_index import Docid_index
+from .scoring_index import Scoring_index
+from .block_max_index import Block_max_index
+from .impact_index import Impact_index
+from .champion_index import Champion_index
+from .bitmap_index import Bitmap_index
+from .doc_values_index import Doc_values_index
+from .facet_index import Facet_index
+
+SEGMENTS_FILE = 'segments.json'
+SEGMENTS_DIRECTORY = 'segments/'
+# the name of the index built by Builder in the deletions of the segments file
+BASE_SEGMENT = 'base'
+
+
+def read_segments(path):
+    """
+    Reads the segments file of an index.
+
+    Parameters
+    ----------
+    path : str
+        The path to the indexes.
+
+    Returns
+    -------
+    dict
+        The segments, as written by write_segments. An index without a segments file has no
+        segments and no deleted documents.
+    """
+    if not os.path.exists(path + SEGMENTS_FILE):
+        return {'generation': 0, 'next_segment': 1, 'segments': [], 'deletions': {}}
+    with open(path + SEGMENTS_FILE, 'r') as file:
+        return json.load(file)
+
+
+def write_segments(path, segments):
+    """
+    Writes the segments file of an index.
+    It is written to a temporary file that then replaces the old one, so a search engine reading
+    it sees either the old segments or the new ones.
+
+    Parameters
+    ----------
+    path : str
+        The path to the indexes.
+    segments : dict
+        {"generation": int, "next_segment": int, "segments": [{"name": str, "document_count": int}],
+        "deletions": {name: bitmap}}. The generation changes on every write. The segments are in the
+        order their documents follow the documents of the base index, and the deletions are the
+        bitmaps of the deleted ordinals of the base index and of the segments, encoded with
+        encode_bitmap, for the ones that have deleted documents.
+    """
+    temporary_path = path + SEGMENTS_FILE + '.tmp'
+    with open(temporary_path, 'w') as file:
+        json.dump(segments, file, indent=4)
+    os.replace(temporary_path, path + SEGMENTS_FILE)
+
+
+def get_segment_path(path, name):
+    """
+    Returns the path of the indexes of a segment.
+    """
+    return path + SEGMENTS_DIRECTORY + name + '/'
+
+
+def clear_segments(path):
+    """
+    Removes the segments and the deletions of an index, e.g. after the index is built again. A
+    segments file without segments is written with the next generation, so search engines can tell
+    the index changed by checking the segments file only.
+    """
+    segments = read_segments(path)
+    write_segments(path, {'generation': segments['generation'] + 1, 'next_segment': segments['next_segment'], 'segments': [], 'deletions': {}})
+    shutil.rmtree(path + SEGMENTS_DIRECTORY, ignore_errors=True)
+
+
+def write_indexes(path, raw_documents, index, binary=False, statistics=True, pool=None):
+    """
+    Writes all the indexes of a set of documents.
+
+    Parameters
+    ----------
+    path : str
+        The path to write the indexes to.
+    raw_documents : dict
+        The documents as they were crawled, by ID, in a dict or in a Document_store.
+    index : Index
+        The positional index of the preprocessed documents.
+    binary : bool
+        If True, the indexes of the text and keyword fields, like the stars, genres and summaries,
+        are written in the binary format.
+    statistics : bool
+        If False, the indexes that only hold collection statistics or are built from them, the
+        scoring tables, block maxes, impacts and champion lists, are left out. A segment doesn't
+        need them, since it is searched with the statistics of the whole index.
+    pool : multiprocessing.Pool
+        If given, the indexes that are built from the stored ones are built in its processes, each
+        one as soon as the indexes it reads are stored.
+    """
+    store_indexes(path, raw_documents, index, binary)
+    build_stored_indexes(path, statistics, pool)
+
+
+def store_indexes(path, raw_documents, index, binary=False):
+    """
+    Stores the documents and their index, the first part of write_indexes.
+    """
+    with open(path + 'raw_' + Indexes.DOCUMENTS.value + '_index.json', 'w') as file:
+        if isinstance(raw_documents, Document_store):
+            raw_documents.dump(file)
+        else:
+            json.dump(raw_documents, file)
+
+    index.store_index(path + Indexes.DOCUMENTS.value + '_index.json', Indexes.DOCUMENTS.value)
+    for field in index.fields:
+        # the binary indexes are memory mapped by Index_reader instead of the JSON ones
+        field_binary = binary and field.type != Field.NUMERIC
+        index.store_index(path + field.name + ('_index.bin' if field_binary else '_index.json'), field.name, field_binary)
+        # Index_reader reads the binary index whenever there is one, so the index of an earlier
+        # build in the other format is removed
+        other_path = path + field.name + ('_index.json' if field_binary else '_index.bin')
+        if os.path.exists(other_path):
+            os.remove(other_path)
+        if field.type != Field.NUMERIC:
+            index.store_document_lengths_index(path, field.name)
+        if field.tiers:
+            index.store_tiered_index(path, field.name)
+    for field in index.positional_index or {}:
+        index.store_positional_index(path + field + '_' + Index_types.POSITIONAL.value + '_index.json', field)
+    # kept up to date while the documents were indexed, instead of built by DocumentLengthsIndex,
+    # Metadata_index and Tiered_index
+    index.store_metadata_index(path)
+
+
+def build_stored_indexes(path, statistics=True, pool=None):
+    """
+    Builds the indexes that are built from the ones stored by store_indexes, the second part of
+    write_indexes. They only read the files, so the documents don't have to be in memory anymore.
+    """
+    # every stage only reads the indexes stored by the ones before it
+    stages = [
+        [Docid_index],
+        [Scoring_index, Bitmap_index, Doc_values_index, Facet_index] if statistics else [Bitmap_index, Doc_values_index, Facet_index],
+        [Block_max_index, Impact_index, Champion_index] if statistics else [],
+    ]
+    for stage in stages:
+        if pool is None:
+            for build in stage:
+                build(path)
+        else:
+            pool.map(build_index, [(build, path) for build in stage], chunksize=1)
+
+
+def build_index(arguments):
+    # runs in a process of the pool of write_indexes, so it takes one picklable argument
+    build, path = arguments
+    build(path)
@@ -0,0 +1,169 @@
+import os
+import sys
+import json
+import heapq
+import shutil
+import tempfile
+
+
+class Spimi_index:
+    # rough sizes in bytes of a new posting and of a new term without its string, on the safe side,
+    # which the memory used by the postings in memory is estimated with
+    posting_size = 40
+    term_size = 200
+
+    def __init__(self, path="../Logic/core/indexer/index/", fields=None, memory_limit=256 * 2 ** 20, merge_factor=64):
+        """
+        Builds the {term: {document_id: tf}} indexes of text fields in a single pass, with a bounded
+        amount of memory. The postings of the documents are collected in memory until they take
+        about memory_limit bytes, and are then written to disk as a run, sorted by field and term.
+        store_indexes merges the runs into the indexes of the fields, merge_factor runs at a time.
+
+        The terms of the stored indexes are sorted, and the documents of each term are in the order
+        they were added in. A document added twice is indexed like Index does: its frequencies are
+        added up, in the place of its first occurrence.
+
+        Parameters
+        ----------
+        path : str
+            The path to write the indexes to. The runs are written to a temporary directory in it,
+            which store_indexes or close removes.
+        fields : list
+            The names of the fields.
+        memory_limit : int
+            The number of bytes the postings in memory may take before they are written as a run.
+        merge_factor : int
+            The number of runs that are merged at a time, each one needing an open file.
+        """
+        self.path = path
+        self.fields = fields or []
+        self.memory_limit = memory_limit
+        self.merge_factor = merge_factor
+        self.runs_path = tempfile.mkdtemp(prefix='spimi_runs_', dir=path)
+        self.runs = []
+        self.run_count = 0
+        self.postings = {field: {} for field in self.fields}
+        self.memory = 0
+
+    def add_document(self, document_id: str, texts: dict):
+        """
+        Adds the terms of a document.
+
+        Parameters
+        ----------
+        document_id : str
+            The ID of the document.
+        texts : dict
+            The preprocessed texts of each field of the document, {field: list of str}.
+        """
+        for field in self.fields:
+            postings = self.postings[field]
+            for text in texts.get(field, []):
+                for term in text.split():
+                    term_postings = postings.get(term)
+                    if term_postings is None:
+                        term_postings = postings[term] = {}
+                        self.memory += self.term_size + sys.getsizeof(term)
+                    if document_id not in term_postings:
+                        term_postings[document_id] = 0
+                        self.memory += self.posting_size
+                    term_postings[document_id] += 1
+        if self.memory >= self.memory_limit:
+            self.write_run()
+
+    def write_run(self):
+        """
+        Writes the postings in memory as a run, a line of [field, term, {document_id: tf}] for each
+        term, sorted by field and term.
+        """
+        if not any(self.postings.values()):
+            return
+        run_path = self.get_run_path()
+        with open(run_path, 'w') as file:
+            for field in sorted(self.fields):
+                postings = self.postings[field]
+                for term in sorted(postings):
+                    file.write(json.dumps([field, term, postings[term]]) + '\n')
+        self.runs.append(run_path)
+        self.postings = {field: {} for field in self.fields}
+        self.memory = 0
+
+    def get_run_path(self):
+        self.run_count += 1
+        return os.path.join(self.runs_path, 'run_' + str(self.run_count) + '.jsonl')
+
+    def read_run(self, run_path: str):
+        with open(run_path, 'r') as file:
+            for line in file:
+                field, term, postings = json.loads(line)
+                yield field, term, postings
+
+    def merge_runs(self, run_paths: list):
+        """
+        Merges runs, in the order of their documents.
+
+        Yields
+        ------
+        tuple
+            The field, the term and the postings of the next term, by field and term.
+        """
+        # the number of the run breaks the ties, so the postings of a term are added in the order of the runs
+        merged = heapq.merge(*[
+            (((field, term), number, postings) for field, term, postings in self.read_run(run_path))
+            for number, run_path in enumerate(run_paths)
+        ], key=lambda entry: entry[:2])
+        current_key, current_postings = None, None
+        for key, _, postings in merged:
+            if key != current_key:
+                if current_key is not None:
+                    yield current_key + (current_postings,)
+                current_key, current_postings = key, {}
+            for document_id, tf in postings.items():
+                current_postings[document_id] = current_postings.get(document_id, 0) + tf
+        if current_key is not None:
+            yield current_key + (current_postings,)
+
+    def store_indexes(self):
+        """
+        Writes the last run and merges all the runs into the indexes of the fields, stored like
+        Index.store_index stores them, one file for each field. The runs are removed.
+        """
+        self.write_run()
+        try:
+            # fewer runs, merged in order, until they can all be open at once
+            while len(self.runs) > self.merge_factor:
+                run_path = self.get_run_path()
+                with open(run_path, 'w') as file:
+                    for field, term, postings in self.merge_runs(self.runs[:self.merge_factor]):
+                        file.write(json.dumps([field, term, postings]) + '\n')
+                for merged_run_path in self.runs[:self.merge_factor]:
+                    os.remove(merged_run_path)
+                self.runs = [run_path] + self.runs[self.merge_factor:]
+
+            merged = self.merge_runs(self.runs)
+            entry = next(merged, None)
+            for field in sorted(self.fields):
+                file_path = self.path + field + '_index.json'
+                with open(file_path, 'w') as file:
+                    # written a term at a time, in the format of json.dump
+                    file.write('{')
+                    separator = ''
+                    while entry is not None and entry[0] == field:
+                        file.write(separator + json.dumps(entry[1]) + ': ' + json.dumps(entry[2]))
+                        separator = ', '
+                        entry = next(merged, None)
+                    file.write('}')
+                if os.path.exists(self.path + field + '_index.bin'):
+                    # it would be read instead of the new index
+                    os.remove(self.path + field + '_index.bin')
+                print(f"Index '{field}' stored successfully in '{file_path}'")
+        finally:
+            self.close()
+
+    def close(self):
+        """
+        Removes the runs and their temporary directory, also when the build stopped before
+        store_indexes.
+        """
+        shutil.rmtree(self.runs_path, ignore_errors=True)
+        self.runs = []
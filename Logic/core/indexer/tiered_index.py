@@ -1,5 +1,6 @@
 from .indexes_enum import Indexes, Index_types
 from .index_reader import Index_reader
+from .fields import DEFAULT_FIELDS
 import json
 
 
@@ -19,11 +20,12 @@ class Tiered_index:
             Indexes.GENRES: Index_reader(path, index_name=Indexes.GENRES).index,
             Indexes.SUMMARIES: Index_reader(path, index_name=Indexes.SUMMARIES).index,
         }
-        # feel free to change the thresholds
+        # the thresholds are the ones of the fields, which Index keeps its tiers up to date with
+        tiers = {field.name: field.tiers for field in DEFAULT_FIELDS}
         self.tiered_index = {
-            Indexes.STARS: self.convert_to_tiered_index(3, 2, Indexes.STARS),
-            Indexes.SUMMARIES: self.convert_to_tiered_index(10, 5, Indexes.SUMMARIES),
-            Indexes.GENRES: self.convert_to_tiered_index(1, 0, Indexes.GENRES)
+            Indexes.STARS: self.convert_to_tiered_index(*tiers[Indexes.STARS.value], Indexes.STARS),
+            Indexes.SUMMARIES: self.convert_to_tiered_index(*tiers[Indexes.SUMMARIES.value], Indexes.SUMMARIES),
+            Indexes.GENRES: self.convert_to_tiered_index(*tiers[Indexes.GENRES.value], Indexes.GENRES)
         }
         self.store_tiered_index(path, Indexes.STARS)
         self.store_tiered_index(path, Indexes.SUMMARIES)
@@ -0,0 +1,96 @@
+class PostingCache:
+    def __init__(self, budget=16 * 2 ** 20, min_frequency=2, max_tracked=100000):
+        """
+        Initializes the posting cache.
+        It keeps the weighted posting arrays of the most frequently queried terms, so the scorers don't
+        compute their bm25 or tf-idf weights again for every query.
+
+        Parameters
+        ----------
+        budget : int
+            The number of bytes the cached weights may take.
+        min_frequency : int
+            The number of times a posting list must be asked for before its weights are cached.
+        max_tracked : int
+            The number of posting lists whose frequency is tracked. When there are more, all the
+            frequencies are halved and the ones that drop to 0 are forgotten.
+        """
+        self.budget = budget
+        self.min_frequency = min_frequency
+        self.max_tracked = max_tracked
+        self.entries = {}
+        self.frequencies = {}
+        self.size = 0
+        self.statistics = {'hits': 0, 'misses': 0, 'admissions': 0, 'evictions': 0, 'rejections': 0}
+
+    def get(self, key):
+        """
+        Returns the cached weights of a posting list and counts the request.
+
+        Parameters
+        ----------
+        key : tuple
+            The index, the term and the weighting of the posting list.
+
+        Returns
+        -------
+        tuple
+            The document ordinals and their weights, or None if they are not cached.
+        """
+        self.frequencies[key] = self.frequencies.get(key, 0) + 1
+        if len(self.frequencies) > self.max_tracked:
+            self.frequencies = {k: f // 2 for k, f in self.frequencies.items() if f // 2 > 0 or k in self.entries}
+        value = self.entries.get(key)
+        if value is None:
+            self.statistics['misses'] += 1
+        else:
+            self.statistics['hits'] += 1
+        return value
+
+    def put(self, key, value):
+        """
+        Caches the weights of a posting list if it is asked for often enough.
+        Less frequent posting lists are evicted to make room for it within the budget.
+
+        Parameters
+        ----------
+        key : tuple
+            The index, the term and the weighting of the posting list.
+        value : tuple
+            The document ordinals and their weights. The ordinals are a view of the index, so only
+            the weights count towards the budget.
+        """
+        frequency = self.frequencies.get(key, 0)
+        size = value[1].nbytes
+        if frequency < self.min_frequency or size > self.budget:
+            return
+        while self.size + size > self.budget:
+            victim = min(self.entries, key=lambda k: self.frequencies.get(k, 0))
+            if self.frequencies.get(victim, 0) >= frequency:
+                self.statistics['rejections'] += 1
+                return
+            self.size -= self.entries.pop(victim)[1].nbytes
+            self.statistics['evictions'] += 1
+        self.entries[key] = value
+        self.size += size
+        self.statistics['admissions'] += 1
+
+    def clear(self):
+        """
+        Removes all the cached weights and the frequencies, e.g. when the indexes are loaded again.
+        """
+        self.entries.clear()
+        self.frequencies.clear()
+        self.size = 0
+
+    def get_statistics(self):
+        """
+        Returns the statistics of the cache.
+
+        Returns
+        -------
+        dict
+            The hits, misses, admissions, evictions and rejections so far, and the number of cached
+            posting lists and the bytes they take.
+        """
+        return dict(self.statistics, entries=len(self.entries), bytes=self.size, budget=self.budget)
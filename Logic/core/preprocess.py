@@ -147,3 +147,27 @@ class Preprocessor:
         words = self.tokenize(text) 
         return [word for word in words if word.lower() not in self.stopwords]
 
+
+def preprocess_document(document: dict, fields: list):
+    """
+    Preprocesses the fields of a crawled document.
+
+    Parameters
+    ----------
+    document : dict
+        The crawled document. It is not changed.
+    fields : list
+        The names of the fields to preprocess, each one a list of texts or one text. A field with one
+        text is preprocessed as a list of that text, and a missing field as an empty list.
+
+    Returns
+    ----------
+    dict
+        A copy of the document with the fields preprocessed. The other fields are shared with the
+        crawled document, not copied.
+    """
+    preprocessed = dict(document)
+    for field in fields:
+        texts = document.get(field) or []
+        preprocessed[field] = Preprocessor([texts] if isinstance(texts, str) else texts).preprocess()
+    return preprocessed
@@ -1,22 +1,40 @@
 import numpy as np
+from scipy import sparse
 from .indexer.index_reader import Index_reader
 from .indexer.indexes_enum import Indexes, Index_types
+from .indexer.bm25 import okapi_score_tf, K1, B
 class Scorer:    
-    def __init__(self, index, number_of_documents):
+    def __init__(self, index, number_of_documents, statistics=None, posting_cache=None, ordinal_count=None):
         """
         Initializes the Scorer.
 
         Parameters
         ----------
-        index : dict
+        index : Ordinal_index
             The index to score the documents with.
         number_of_documents : int
             The number of documents in the index.
+        statistics : dict, optional
+            The scoring tables of the index as stored by Scoring_index: "document_frequency",
+            "idf" and "document_norms" (keyed by the document weighting scheme ((n|l)(n|t)), each an
+            array of the norms indexed by document ordinal). Missing tables and entries are computed on
+            first use and stored in this dict, so passing the same dict to later Scorers of the same
+            index reuses them.
+        posting_cache : PostingCache, optional
+            The cache of the weighted posting lists of frequent terms, shared by the Scorers of all indexes.
+        ordinal_count : int, optional
+            The number of document ordinals, the size of the arrays indexed by ordinal. It is
+            number_of_documents by default, and more when some ordinals are deleted documents.
         """
 
         self.index = index
-        self.idf = {}
+        self.statistics = statistics if statistics is not None else {}
+        self.idf = self.statistics.setdefault('document_frequency', {})
+        self.idf_weights = self.statistics.setdefault('idf', {})
+        self.document_norms = self.statistics.setdefault('document_norms', {})
         self.N = number_of_documents
+        self.ordinal_count = number_of_documents if ordinal_count is None else ordinal_count
+        self.posting_cache = posting_cache
 
     def get_list_of_documents(self,query):
         """
@@ -29,22 +47,13 @@ class Scorer:
 
         Returns
         -------
-        list
-            A list of documents that contain at least one of the terms in the query.
-        
-        Note
-        ---------
-            The current approach is not optimal but we use it due to the indexing structure of the dict we're using.
-            If we had pairs of (document_id, tf) sorted by document_id, we could improve this.
-                We could initialize a list of pointers, each pointing to the first element of each list.
-                Then, we could iterate through the lists in parallel.
-            
+        numpy.ndarray
+            The sorted ordinals of the documents that contain at least one of the terms in the query.
         """
-        list_of_documents = []
-        for term in query:
-            if term in self.index.keys():
-                list_of_documents.extend(self.index[term].keys())
-        return list(set(list_of_documents))
+        postings = [self.index.get_postings(term)[0] for term in query if term in self.index]
+        if not postings:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
     
     def get_idf(self, term):
         """
@@ -62,16 +71,37 @@ class Scorer:
         
         Note
         -------
-            It was better to store dfs in a separate dict in preprocessing.
+            Despite its name, this returns the document frequency; get_idf_weight turns it into
+            log(N / df). Both are read from the scoring tables when the index was built with them.
         """
         idf = self.idf.get(term, None)
         if idf is None:
             if term in self.index:
-                self.idf[term] = len(self.index[term]) # TODO what if new term
+                self.idf[term] = self.index.get_document_frequency(term)
+                idf = self.idf[term]
             else: 
-                self.idf[term] = 0.1
+                idf = 0.1
+        return idf
+
+    def get_idf_weight(self, term):
+        """
+        Returns the idf weight, log(N / df), of a term.
 
-            idf = self.idf[term]
+        Parameters
+        ----------
+        term : str
+            The term to get the idf weight for.
+
+        Returns
+        -------
+        float
+            The idf weight of the term.
+        """
+        idf = self.idf_weights.get(term, None)
+        if idf is None:
+            idf = np.log(self.N / self.get_idf(term))
+            if term in self.index:
+                self.idf_weights[term] = idf
         return idf
     
     def get_query_tfs(self, query):
@@ -87,75 +117,158 @@ class Scorer:
         -------
         dict
             A dictionary of the term frequencies of the terms in the query.
+            Terms that are not in the index are left out since they can't match any document.
         """
         
         res = dict()
         for qw in query:
             if qw in self.index:
-                res[qw] = sum(self.index[qw].values())
-            else:
-                res[qw] = 0
+                res[qw] = res.get(qw, 0) + 1
+        return res
 
-    def compute_scores_with_vector_space_model(self, query, method):
+    def get_tf_weight(self, tf, method):
         """
-        compute scores with vector space model
+        Returns the weighted term frequency.
+
+        Parameters
+        ----------
+        tf : numpy.ndarray
+            The raw term frequencies.
+        method : str (n|l)
+            'n' for the raw tf and 'l' for the logarithmic tf.
+
+        Returns
+        -------
+        numpy.ndarray
+            The weighted term frequencies.
+        """
+        if method == 'l':
+            return np.log(tf) + 1
+        return tf.astype(float)
+
+    def get_document_norms(self, document_method):
+        """
+        Returns the L2 norms of the document vectors for a document weighting scheme.
+        They come from the scoring tables built with the index, or are computed with one pass over
+        the whole index the first time a scheme is used.
+
+        Parameters
+        ----------
+        document_method : str (n|l)(n|t)
+            The tf and idf part of the document method.
+
+        Returns
+        -------
+        numpy.ndarray
+            The norm of each document's vector, indexed by document ordinal.
+        """
+        scheme = document_method[:2]
+        norms = self.document_norms.get(scheme)
+        if norms is None:
+            squares = np.zeros(self.ordinal_count, dtype=float)
+            for term in self.index:
+                documents, tfs = self.index.get_postings(term)
+                weights = self.get_tf_weight(tfs, scheme[0])
+                if scheme[1] == 't':
+                    weights = weights * self.get_idf_weight(term)
+                squares[documents] += weights * weights
+            norms = np.sqrt(squares)
+            self.document_norms[scheme] = norms
+        return norms
+
+    def get_query_weights(self, query, query_method):
+        """
+        Returns the weights of the query vector.
 
         Parameters
         ----------
         query: List[str]
             The query to be scored
-        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c))
-            The method to use for searching.
+        query_method : str (n|l)(n|t)(n|c)
+            The method to use for the query.
 
         Returns
         -------
         dict
-            A dictionary of the document IDs and their scores.
+            The weight of each query term that is in the index.
         """
+        query_weights = {}
+        for term, tf in self.get_query_tfs(query).items():
+            weight = self.get_tf_weight(np.array(tf), query_method[0])
+            if query_method[1] == 't':
+                weight = weight * self.get_idf_weight(term)
+            query_weights[term] = weight
+
+        if query_method[2] == 'c' and sum(query_weights.values()) > 0:
+            query_norm = np.linalg.norm(list(query_weights.values()))
+            for term in query_weights:
+                query_weights[term] = query_weights[term] / query_norm
+        return query_weights
+
+    def get_document_weights(self, term, document_method):
+        """
+        Returns the weights of a term in the document vectors.
 
-        doc_id_list = self.get_list_of_documents(query)
-
-        if method[1] == 't' or method[5]=='t':
-            idf_multiplier = np.zeros(len(self.index), dtype = float)
-            for i, term in enumerate(self.index):
-                idf_multiplier[i] = np.log(self.N / self.get_idf(term))
+        Parameters
+        ----------
+        term : str
+            The term to get the weights of.
+        document_method : str (n|l)(n|t)(n|c)
+            The method to use for the documents.
 
-        X = np.zeros((len(self.index), len(doc_id_list)), dtype = float)
-        for i, term in enumerate(self.index):
-            for j, doc_id in enumerate(doc_id_list):
-                if doc_id in self.index[term]:
-                    if method[0] == 'n':
-                        X[i, j] = self.index[term][doc_id]
-                    elif method[0] == 'l':
-                        X[i, j] = np.log(self.index[term][doc_id]) + 1
-        
-        if method[1] == 't':
-            idf = idf_multiplier.reshape(-1, 1)
-            X = X * idf
+        Returns
+        -------
+        tuple
+            The ordinals of the documents that contain the term and the weight of the term in each of them.
+        """
+        key = (self.index, term, document_method)
+        if self.posting_cache is not None:
+            cached = self.posting_cache.get(key)
+            if cached is not None:
+                return cached
+
+        documents, tfs = self.index.get_postings(term)
+        weights = self.get_tf_weight(tfs, document_method[0])
+        if document_method[1] == 't':
+            weights = weights * self.get_idf_weight(term)
+        if document_method[2] == 'c':
+            weights = weights / self.get_document_norms(document_method)[documents]
+
+        if self.posting_cache is not None:
+            self.posting_cache.put(key, (documents, weights))
+        return documents, weights
 
-        if method[2] == 'c':
-            X = X / np.linalg.norm(X, axis = 0)
-        
+    def compute_scores_with_vector_space_model(self, query, method):
+        """
+        compute scores with vector space model
 
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c))
+            The method to use for searching.
 
-        q = np.zeros(len(self.index), dtype=float)
-        for i , term in enumerate(self.index):
-            if term in query:
-                if method[4] == 'n':
-                    q[i] = query.count(term)
-                elif method[4]=='l':
-                    q[i] = np.log(query.count(term)) + 1
+        Returns
+        -------
+        tuple
+            The ordinals of the documents that contain a query term and their scores, as two arrays.
 
-        if method[5] == 't':
-            q = q * idf_multiplier
-        
-        if method[6] == 'c':
-            if q.sum() > 0:
-                q = q / np.linalg.norm(q)
+        Note
+        ---------
+            Only the postings of the query terms are visited. The other terms of the vocabulary have
+            a zero weight in the query vector, so they only matter for the document norms, which come
+            from get_document_norms.
+        """
+        document_method, query_method = method[:3], method[4:7]
 
-        scores = (q @ X).tolist()
+        scores = np.zeros(self.ordinal_count, dtype=float)
+        for term, query_weight in self.get_query_weights(query, query_method).items():
+            documents, weights = self.get_document_weights(term, document_method)
+            scores[documents] += query_weight * weights
 
-        return dict(zip(doc_id_list, scores))
+        documents = self.get_list_of_documents(query)
+        return documents, scores[documents]
 
 
     def get_vector_space_model_score(self, query, query_tfs, document_id, document_method, query_method):
@@ -183,9 +296,40 @@ class Scorer:
         ## implemented in the above function
         pass
 
-    def okapi_score_tf(self, tf, dl_avgdl, b=0.75, k1 = 1.5):
-        return (k1 + 1)*tf / (tf + k1*(1-b+b*dl_avgdl))
+    def okapi_score_tf(self, tf, dl_avgdl, b=B, k1=K1):
+        return okapi_score_tf(tf, dl_avgdl, b, k1)
     
+    def get_okapi_bm25_weights(self, term, average_document_field_length, document_lengths):
+        """
+        Returns the okapi bm25 score of a single term in the documents that contain it.
+
+        Parameters
+        ----------
+        term : str
+            The term to get the scores of.
+        average_document_field_length : float
+            The average length of the documents in the index.
+        document_lengths : numpy.ndarray
+            The length of each document in that field, indexed by document ordinal.
+
+        Returns
+        -------
+        tuple
+            The ordinals of the documents that contain the term and the score of the term in each of them.
+        """
+        key = (self.index, term, 'OkapiBM25', average_document_field_length)
+        if self.posting_cache is not None:
+            cached = self.posting_cache.get(key)
+            if cached is not None:
+                return cached
+
+        documents, tfs = self.index.get_postings(term)
+        weights = self.okapi_score_tf(tfs, document_lengths[documents] / average_document_field_length) * self.get_idf_weight(term)
+
+        if self.posting_cache is not None:
+            self.posting_cache.put(key, (documents, weights))
+        return documents, weights
+
     def compute_scores_with_okapi_bm25(self, query, average_document_field_length, document_lengths):
         """
         compute scores with okapi bm25
@@ -196,35 +340,23 @@ class Scorer:
             The query to be scored
         average_document_field_length : float
             The average length of the documents in the index.
-        document_lengths : dict
-            A dictionary of the document lengths. The keys are the document IDs, and the values are
-            the document's length in that field.
+        document_lengths : numpy.ndarray
+            The length of each document in that field, indexed by document ordinal.
         
         Returns
         -------
-        dict
-            A dictionary of the document IDs and their scores.
+        tuple
+            The ordinals of the documents that contain a query term and their scores, as two arrays.
         """
-
-        doc_id_list = self.get_list_of_documents(query)
-    
-        idf_multiplier = np.zeros(len(query), dtype = float)
-        for i, term in enumerate(query):
-            idf_multiplier[i] = np.log(self.N / self.get_idf(term))
-
-        X = np.zeros((len(query), len(doc_id_list)), dtype = float)
-        for i, term in enumerate(query):
+        scores = np.zeros(self.ordinal_count, dtype=float)
+        for term in query:
             if term not in self.index:
                 continue
-            for j, doc_id in enumerate(doc_id_list):
-                if doc_id in self.index[term]:
-                    X[i, j] = self.okapi_score_tf(self.index[term][doc_id], document_lengths[doc_id] / average_document_field_length)
-        
-        idf = idf_multiplier.reshape(-1, 1)
-        X = X * idf
-        scores = X.sum(axis = 0)
+            documents, weights = self.get_okapi_bm25_weights(term, average_document_field_length, document_lengths)
+            scores[documents] += weights
 
-        return dict(zip(doc_id_list, scores))
+        documents = self.get_list_of_documents(query)
+        return documents, scores[documents]
         
     def get_okapi_bm25_score(self, query, document_id, average_document_field_length, document_lengths):
         """
@@ -234,21 +366,133 @@ class Scorer:
         ----------
         query: List[str]
             The query to be scored
-        document_id : str
-            The document to calculate the score for.
+        document_id : int
+            The ordinal of the document to calculate the score for.
         average_document_field_length : float
             The average length of the documents in the index.
-        document_lengths : dict
-            A dictionary of the document lengths. The keys are the document IDs, and the values are
-            the document's length in that field.
+        document_lengths : numpy.ndarray
+            The length of each document in that field, indexed by document ordinal.
 
         Returns
         -------
         float
             The Okapi BM25 score of the document for the query.
+            The terms are added in query order, so it is the same value compute_scores_with_okapi_bm25 gives.
         """
-        # IMPLEMENTED IN THE ABOVE FUNCTION
-        pass
+        score = 0.0
+        for term in query:
+            tf = self.index.get_tf(term, document_id) if term in self.index else 0
+            if tf > 0:
+                score += self.okapi_score_tf(tf, document_lengths[document_id] / average_document_field_length) * self.get_idf_weight(term)
+        return score
+
+    def compute_scores_for_documents(self, query, method, documents, average_document_field_length=None, document_lengths=None):
+        """
+        Computes the scores of given documents only, e.g. the ones that match a boolean query.
+        Each query term's postings are searched for the documents instead of scoring all the
+        documents that contain the term, and the weights are computed the same way as in
+        compute_scores_with_vector_space_model and compute_scores_with_okapi_bm25, so the scores are equal.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for scoring.
+        documents : numpy.ndarray
+            The sorted ordinals of the documents to score.
+        average_document_field_length : float
+            The average length of the documents in the index, for OkapiBM25.
+        document_lengths : numpy.ndarray
+            The length of each document in that field, indexed by document ordinal, for OkapiBM25.
+
+        Returns
+        -------
+        tuple
+            The documents and their scores, as two arrays. Documents without any query term score 0.
+        """
+        if method == 'OkapiBM25':
+            query_weights = [(term, 1) for term in query if term in self.index]
+        else:
+            document_method, query_method = method[:3], method[4:7]
+            query_weights = self.get_query_weights(query, query_method).items()
+
+        scores = np.zeros(len(documents), dtype=float)
+        for term, query_weight in query_weights:
+            postings, tfs = self.index.get_postings(term)
+            positions = postings.searchsorted(documents)
+            found = positions < len(postings)
+            found[found] = postings[positions[found]] == documents[found]
+            positions, matched = positions[found], documents[found]
+
+            if method == 'OkapiBM25':
+                scores[found] += self.okapi_score_tf(tfs[positions], document_lengths[matched] / average_document_field_length) * self.get_idf_weight(term)
+                continue
+            weights = self.get_tf_weight(tfs[positions], document_method[0])
+            if document_method[1] == 't':
+                weights = weights * self.get_idf_weight(term)
+            if document_method[2] == 'c':
+                weights = weights / self.get_document_norms(document_method)[matched]
+            scores[found] += query_weight * weights
+
+        return documents, scores
+
+    def compute_batch_scores(self, queries, method, average_document_field_length=None, document_lengths=None):
+        """
+        compute the scores of many queries at once.
+        The queries are turned into a sparse query-term matrix and the postings of their terms into a
+        sparse term-document matrix, so all the scores come from one sparse matrix product.
+
+        Parameters
+        ----------
+        queries: List[List[str]]
+            The queries to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for scoring.
+        average_document_field_length : float
+            The average length of the documents in the index. Only used by okapi bm25.
+        document_lengths : numpy.ndarray
+            The length of each document in that field, indexed by document ordinal. Only used by okapi bm25.
+
+        Returns
+        -------
+        tuple
+            Two sparse matrices with a row per query and a column per document ordinal: the scores,
+            and the number of query terms each document contains. A document matched a query when its
+            count is not zero, even if its score is.
+        """
+        terms = {}
+        rows, columns, values = [], [], []
+        for i, query in enumerate(queries):
+            if method == 'OkapiBM25':
+                # a repeated query term adds its score once per occurrence
+                query_weights = self.get_query_tfs(query)
+            else:
+                query_weights = self.get_query_weights(query, method[4:7])
+            for term, weight in query_weights.items():
+                rows.append(i)
+                columns.append(terms.setdefault(term, len(terms)))
+                values.append(float(weight))
+        query_matrix = sparse.csr_matrix((values, (rows, columns)), shape=(len(queries), len(terms)))
+
+        term_rows, documents, weights = [np.zeros(0, dtype=np.int64)], [np.zeros(0, dtype=np.int32)], [np.zeros(0)]
+        for term, row in terms.items():
+            if method == 'OkapiBM25':
+                term_documents, term_weights = self.get_okapi_bm25_weights(term, average_document_field_length, document_lengths)
+            else:
+                term_documents, term_weights = self.get_document_weights(term, method[:3])
+            term_rows.append(np.full(len(term_documents), row, dtype=np.int64))
+            documents.append(term_documents)
+            weights.append(term_weights)
+        term_rows, documents, weights = np.concatenate(term_rows), np.concatenate(documents), np.concatenate(weights)
+        document_matrix = sparse.csr_matrix((weights, (term_rows, documents)), shape=(len(terms), self.ordinal_count))
+
+        # the product drops the entries that add up to zero, so the matches are counted separately
+        scores = query_matrix @ document_matrix
+        query_terms, document_terms = query_matrix.copy(), document_matrix.copy()
+        query_terms.data[:] = 1
+        document_terms.data[:] = 1
+        return scores, query_terms @ document_terms
 
 # ================================ = = = = = = = = = = = = = = =====================================
 
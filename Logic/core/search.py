@@ -1,37 +1,443 @@
+import os
 import json
 import numpy as np
+from collections import OrderedDict
 from .preprocess import Preprocessor
 from .scorer import Scorer
+from .wand import Wand
+from .posting_cache import PostingCache
+from .boolean_query import BooleanQuery, PostingList
 from .indexer.indexes_enum import Indexes, Index_types
 from .indexer.index_reader import Index_reader
+from .indexer.ordinal_index import Ordinal_index, Lazy_ordinal_index, Segmented_ordinal_index, Segmented_positional_index
+from .indexer.position_codec import decode_positions
+from .indexer.bitmap_codec import decode_bitmap
+from .indexer.bm25 import K1, B
+from .indexer.segment_index import read_segments, get_segment_path, BASE_SEGMENT, SEGMENTS_FILE
 
 
 class SearchEngine:
-    def __init__(self):
+    def __init__(self, path='../Logic/core/indexer/index/', cache_size=1024, posting_cache_budget=16 * 2 ** 20, lazy=False, lazy_cache_size=1024):
         """
         Initializes the search engine.
+        Documents are referred to by their ordinal in the docid index everywhere inside the engine,
+        and search translates them back to document IDs.
+        The segments that IndexWriter added to the index are searched with it: their documents get
+        the ordinals after the ones of the base index, in the order of the segments, and the deleted
+        documents are left out of the postings and of the statistics, which are computed when the
+        index is loaded. The impacts, champion lists and block maxes only cover the base index, so
+        they aren't used until the segments are merged into it.
 
+        Parameters
+        ----------
+        path : str
+            The path to the indexes.
+        cache_size : int
+            The number of search results to keep in the result cache. 0 turns the cache off.
+        posting_cache_budget : int
+            The number of bytes the weighted posting lists of frequent terms may take in the posting cache.
+        lazy : bool
+            If True, only the metadata, the docid index and the term dictionaries of the stars, genres
+            and summaries indexes are loaded at first. The postings of a term are read the first time a
+            query has the term, and the other indexes, like the tiers or the scoring tables, the first
+            time they are used.
+        lazy_cache_size : int
+            The number of posting lists of each field that a lazy engine keeps after reading them.
+            0 turns the cache off.
+        """
+        self.path = path
+        self.lazy = lazy
+        self.lazy_cache_size = lazy_cache_size
+        self.posting_cache = PostingCache(posting_cache_budget)
+        self.load_indexes()
+
+        self.cache_size = cache_size
+        self.result_cache = OrderedDict()
+        self.cache_statistics = {'hits': 0, 'misses': 0, 'evictions': 0, 'invalidations': 0}
+        # the Index objects whose changes clear the result cache, see watch_index, and their versions
+        self.watched_indexes = []
+        self.index_versions = []
+
+    def __getattr__(self, name):
+        # only called for the attributes that are not set, which are the indexes a lazy engine hasn't loaded yet
+        loaders = self.__dict__.get('loaders', {})
+        if name not in loaders:
+            raise AttributeError(f"'{type(self).__name__}' object has no attribute '{name}'")
+        value = loaders[name]()
+        setattr(self, name, value)
+        return value
+
+    def load_indexes(self):
+        """
+        Loads the indexes from the index files and remembers the version of the files.
+        A lazy engine only loads the indexes that every query needs here, and the others on first use.
+        When only the segments changed, the indexes of the base index are not read again.
+        """
+        path = self.path
+        self.segments_version = self.get_segments_version()
+        files_version = self.get_files_version()
+        if files_version[:-1] != self.__dict__.get('files_version', (None,))[:-1]:
+            # the indexes read from the files of the base index, see read_base_index
+            self.base_indexes = {}
+        self.files_version = files_version
+        self.posting_cache.clear()
+        self.fields = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+        self.metadata_index = self.read_base_index('metadata_index', lambda: Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index)
+        self.document_ids = self.read_base_index('document_ids', lambda: Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index)
+        # the ordinals of the base index, which the indexes read from its files are keyed by
+        self.ordinals = self.read_base_index('ordinals', lambda: {doc_id: ordinal for ordinal, doc_id in enumerate(self.document_ids)})
+        self.document_indexes = self.read_base_index('document_indexes', self.read_document_indexes)
+        self.load_segments()
+
+        self.loaders = {
+            'tiered_index': self.load_tiered_index,
+            'tiered_scoring_index': self.load_tiered_scoring_index,
+            'document_lengths_index': self.load_document_lengths_index,
+            'scoring_index': self.load_scoring_index,
+            'block_max_index': self.load_block_max_index,
+            'champion_index': self.load_champion_index,
+            'positional_index': self.load_positional_index,
+            'genre_bitmaps': self.load_genre_bitmaps,
+            'facet_index': self.load_facet_index,
+            'doc_values': self.load_doc_values,
+            'impact_index': self.load_impact_index,
+        }
+        for name, loader in self.loaders.items():
+            # the indexes loaded from the previous files are dropped
+            self.__dict__.pop(name, None)
+            if not self.lazy:
+                setattr(self, name, loader())
+        self.unified_document_frequency = {}
+        self.pruning_statistics = {}
+
+        if self.live_documents is not None:
+            self.document_indexes = {
+                field: self.combine_segments(index, [segment.document_indexes[field] for segment in self.segments])
+                for field, index in self.document_indexes.items()
+            }
+            # the statistics are the ones a new index of the documents that are not deleted would have
+            self.metadata_index = {
+                'document_count': int(self.live_documents.sum()),
+                'averge_document_length': {
+                    field.value: float(self.document_lengths_index[field][self.live_documents].mean()) for field in self.fields
+                },
+            }
+
+    def read_base_index(self, name, read):
+        """
+        Returns an index of the base index. It is read the first time and kept while the files of
+        the base index don't change, so the engine only opens the new segments when documents are
+        added or deleted. The segments are combined with copies of it, never with it.
+
+        Parameters
+        ----------
+        name : str
+            The name of the index.
+        read : function
+            Reads the index from the files.
+        """
+        if name not in self.base_indexes:
+            self.base_indexes[name] = read()
+        return self.base_indexes[name]
+
+    def read_document_indexes(self):
+        if self.lazy:
+            return {
+                field: Lazy_ordinal_index(Index_reader(self.path, field, lazy=True, cache_size=0).index, self.ordinals, self.lazy_cache_size)
+                for field in self.fields
+            }
+        return {
+            field: Ordinal_index(Index_reader(self.path, field).index, self.ordinals) for field in self.fields
+        }
+
+    def load_segments(self):
+        """
+        Opens the segments of the index, lazily, and finds the documents that are not deleted.
+        The documents of the segments are added to the document IDs. The segments that were open
+        already are kept, since they never change.
+        """
+        segments = read_segments(self.path)
+        opened = {segment.path: segment for segment in self.__dict__.get('segments', [])}
+        self.segments = []
+        for segment in segments['segments']:
+            segment_path = get_segment_path(self.path, segment['name'])
+            if segment_path not in opened:
+                opened[segment_path] = SearchEngine(segment_path, cache_size=0, posting_cache_budget=0, lazy=True, lazy_cache_size=0)
+            self.segments.append(opened[segment_path])
+        self.live_documents = None
+        self.segment_offsets = np.cumsum([0, len(self.document_ids)] + [len(segment.document_ids) for segment in self.segments])
+        if not self.segments and not segments['deletions']:
+            return
+
+        names = [BASE_SEGMENT] + [segment['name'] for segment in segments['segments']]
+        self.document_ids = self.document_ids + [doc_id for segment in self.segments for doc_id in segment.document_ids]
+        self.live_documents = np.ones(len(self.document_ids), dtype=bool)
+        for name, start, end in zip(names, self.segment_offsets[:-1], self.segment_offsets[1:]):
+            if name in segments['deletions']:
+                self.live_documents[start:end] = ~np.unpackbits(decode_bitmap(segments['deletions'][name]), count=end - start).astype(bool)
+
+    def combine_segments(self, index, segment_indexes):
+        """
+        Combines an Ordinal_index of the base index and the ones of the segments into one, without
+        the deleted documents.
         """
-        path = '../Logic/core/indexer/index/'
-        self.document_indexes = {
-            Indexes.STARS: Index_reader(path, Indexes.STARS).index,
-            Indexes.GENRES: Index_reader(path, Indexes.GENRES).index,
-            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES).index
+        return Segmented_ordinal_index([index] + segment_indexes, self.segment_offsets[:-1], self.live_documents, self.lazy_cache_size)
+
+    def load_tiered_index(self):
+        tiered_index = self.read_base_index('tiered_index', self.read_tiered_index)
+        if self.live_documents is None:
+            return tiered_index
+        return {
+            field: {
+                tier: self.combine_segments(index, [segment.tiered_index[field][tier] for segment in self.segments])
+                for tier, index in tiers.items()
+            }
+            for field, tiers in tiered_index.items()
         }
-        self.tiered_index = {
-            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.TIERED).index,
-            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.TIERED).index,
-            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.TIERED).index
+
+    def read_tiered_index(self):
+        return {
+            field: {
+                tier: Ordinal_index(tier_index, self.ordinals)
+                for tier, tier_index in Index_reader(self.path, field, Index_types.TIERED).index.items()
+            }
+            for field in self.fields
         }
-        self.document_lengths_index = {
-            Indexes.STARS: Index_reader(path, Indexes.STARS, Index_types.DOCUMENT_LENGTH).index,
-            Indexes.GENRES: Index_reader(path, Indexes.GENRES, Index_types.DOCUMENT_LENGTH).index,
-            Indexes.SUMMARIES: Index_reader(path, Indexes.SUMMARIES, Index_types.DOCUMENT_LENGTH).index
+
+    def load_tiered_scoring_index(self):
+        # the tiers have no stored tables, so the scorers fill these on first use
+        return {
+            field: {tier: {} for tier in self.tiered_index[field]} for field in self.tiered_index
         }
-        self.metadata_index = Index_reader(path, Indexes.DOCUMENTS, Index_types.METADATA).index
-        
+
+    def load_document_lengths_index(self):
+        document_lengths_index = self.read_base_index('document_lengths_index', lambda: {
+            field: self.to_ordinal_array(Index_reader(self.path, field, Index_types.DOCUMENT_LENGTH).index, np.int32)
+            for field in self.fields
+        })
+        return {
+            field: np.concatenate([lengths] + [segment.document_lengths_index[field] for segment in self.segments])
+            for field, lengths in document_lengths_index.items()
+        } if self.segments else document_lengths_index
+
+    def load_scoring_index(self):
+        if self.live_documents is not None:
+            # the stored tables only cover the base index, so the scorers compute the ones of the whole index on first use
+            return {field: {} for field in self.fields}
+        return self.read_base_index('scoring_index', self.read_scoring_index)
+
+    def read_scoring_index(self):
+        scoring_index = {}
+        for field in self.fields:
+            scoring_index[field] = Index_reader(self.path, field, Index_types.SCORING).index
+            norms = scoring_index[field]['document_norms']
+            for scheme in norms:
+                norms[scheme] = self.to_ordinal_array(norms[scheme], float)
+        return scoring_index
+
+    def load_block_max_index(self):
+        return self.read_base_index('block_max_index', self.read_block_max_index)
+
+    def read_block_max_index(self):
+        block_max_index = {}
+        for field in self.fields:
+            block_max_index[field] = Index_reader(self.path, field, Index_types.BLOCK_MAX).index
+            for blocks in block_max_index[field]['blocks'].values():
+                for block in blocks:
+                    block[0] = self.ordinals[block[0]]
+        return block_max_index
+
+    def load_champion_index(self):
+        return self.read_base_index('champion_index', lambda: {
+            field: Ordinal_index(Index_reader(self.path, field, Index_types.CHAMPION).index, self.ordinals) for field in self.fields
+        })
+
+    def load_positional_index(self):
+        positional_index = self.read_base_index('positional_index', self.read_positional_index)
+        if self.live_documents is None:
+            return positional_index
+        return {
+            field: Segmented_positional_index([field_index] + [segment.positional_index.get(field, {}) for segment in self.segments],
+                                              self.segment_offsets[:-1], self.live_documents)
+            for field, field_index in positional_index.items()
+        }
+
+    def read_positional_index(self):
+        # the positional indexes are optional, the phrase queries need them
+        positional_index = {}
+        for field in [Indexes.STARS, Indexes.SUMMARIES]:
+            if not os.path.exists(self.path + field.value + "_" + Index_types.POSITIONAL.value + "_index.json"):
+                continue
+            positional_index[field] = {}
+            for term, postings in Index_reader(self.path, field, Index_types.POSITIONAL).index.items():
+                documents = sorted((self.ordinals[doc_id], positions) for doc_id, positions in postings.items())
+                positional_index[field][term] = (
+                    np.array([document for document, _ in documents], dtype=np.int32),
+                    [positions for _, positions in documents],
+                )
+        return positional_index
+
+    def load_genre_bitmaps(self):
+        genre_bitmaps = self.read_base_index('genre_bitmaps', lambda: {
+            genre: decode_bitmap(bitmap) for genre, bitmap in Index_reader(self.path, Indexes.GENRES, Index_types.BITMAP).index['bitmaps'].items()
+        })
+        if self.live_documents is None:
+            return genre_bitmaps
+
+        bitmaps = [genre_bitmaps] + [segment.genre_bitmaps for segment in self.segments]
+        combined = {}
+        for genre in dict.fromkeys(genre for segment_bitmaps in bitmaps for genre in segment_bitmaps):
+            documents = np.zeros(len(self.document_ids), dtype=bool)
+            for segment_bitmaps, start, end in zip(bitmaps, self.segment_offsets[:-1], self.segment_offsets[1:]):
+                if genre in segment_bitmaps:
+                    documents[start:end] = np.unpackbits(segment_bitmaps[genre], count=end - start)
+            combined[genre] = np.packbits(documents & self.live_documents)
+        return combined
+
+    def load_facet_index(self):
+        facet_index = dict(self.read_base_index('facet_index', self.read_facet_index))
+        for segment in self.segments:
+            for facet, (values, offsets, value_ids) in facet_index.items():
+                segment_values, segment_offsets, segment_value_ids = segment.facet_index[facet]
+                # the values stay sorted, so the values of both are numbered again
+                combined_values = sorted(set(values) | set(segment_values))
+                positions = {value: i for i, value in enumerate(combined_values)}
+                to_positions = np.array([positions[value] for value in values], dtype=np.int64)
+                segment_to_positions = np.array([positions[value] for value in segment_values], dtype=np.int64)
+                facet_index[facet] = (
+                    combined_values,
+                    np.concatenate([offsets, offsets[-1] + segment_offsets[1:]]),
+                    np.concatenate([to_positions[value_ids] if len(value_ids) else value_ids,
+                                    segment_to_positions[segment_value_ids] if len(segment_value_ids) else segment_value_ids]),
+                )
+        return facet_index
+
+    def read_facet_index(self):
+        facet_index = {}
+        for facet, values in Index_reader(self.path, Indexes.DOCUMENTS, Index_types.FACET).index.items():
+            lengths = [len(document_values) for document_values in values['documents']]
+            facet_index[facet] = (
+                values['values'],
+                np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+                np.array([value for document_values in values['documents'] for value in document_values], dtype=np.int64),
+            )
+        return facet_index
+
+    def load_doc_values(self):
+        doc_values = self.read_base_index('doc_values', lambda: {
+            field: np.array([np.nan if value is None else value for value in values], dtype=float)
+            for field, values in Index_reader(self.path, Indexes.DOCUMENTS, Index_types.DOC_VALUES).index.items()
+        })
+        for segment in self.segments:
+            doc_values = {field: np.concatenate([values, segment.doc_values[field]]) for field, values in doc_values.items()}
+        return doc_values
+
+    def load_impact_index(self):
+        return self.read_base_index('impact_index', self.read_impact_index)
+
+    def read_impact_index(self):
+        impact_index = {}
+        for field in self.fields:
+            field_index = Index_reader(self.path, field, Index_types.IMPACT).index
+            for term, segments in field_index['impacts'].items():
+                field_index['impacts'][term] = (
+                    np.array([impact for impact, _ in segments], dtype=np.uint8),
+                    [np.array([self.ordinals[doc_id] for doc_id in doc_ids], dtype=np.int32) for _, doc_ids in segments],
+                )
+            impact_index[field] = field_index
+        return impact_index
+
+    def get_files_version(self):
+        """
+        Returns the version of the index files.
+
+        Returns
+        -------
+        tuple
+            The name, modification time and size of each index file, and the generation of the
+            segments file. It changes whenever a file is written.
+        """
+        with os.scandir(self.path) as entries:
+            files_version = tuple(sorted(
+                (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+                for entry in entries if entry.name.endswith(('_index.json', '_index.bin'))
+            ))
+        # the segments file can be written twice within the resolution of the modification times
+        return files_version + (read_segments(self.path)['generation'],)
+
+    def get_segments_version(self):
+        """
+        Returns the version of the segments file. Builder and IndexWriter write it last, whenever
+        they change the index files, and it replaces the old one, so it is a new file every time.
+
+        Returns
+        -------
+        tuple
+            The inode, modification time and size of the segments file, or None if there is none.
+        """
+        try:
+            status = os.stat(self.path + SEGMENTS_FILE)
+        except FileNotFoundError:
+            return None
+        return status.st_ino, status.st_mtime_ns, status.st_size
+
+    def watch_index(self, index):
+        """
+        Clears the result cache whenever an Index is changed from now on, e.g. by
+        add_document_to_index or remove_document_from_index, before its files are written.
+
+        Parameters
+        ----------
+        index : Index
+            The index to watch.
+        """
+        self.watched_indexes.append(index)
+        self.index_versions.append(index.version)
+
+    def check_index_version(self):
+        """
+        Clears the result cache if the indexes changed since its results were computed. Only the
+        segments file is checked before every search, and the index files are listed and loaded
+        again when it changed. The watched indexes are checked by their versions.
+        """
+        changed = False
+        if self.get_segments_version() != self.segments_version:
+            if self.get_files_version() != self.files_version:
+                self.load_indexes()
+                changed = True
+            else:
+                self.segments_version = self.get_segments_version()
+        index_versions = [index.version for index in self.watched_indexes]
+        if index_versions != self.index_versions:
+            self.index_versions = index_versions
+            changed = True
+        if changed and self.result_cache:
+            self.result_cache.clear()
+            self.cache_statistics['invalidations'] += 1
+
+    def to_ordinal_array(self, values, dtype):
+        """
+        Converts a dictionary keyed by the document IDs of the base index to an array indexed by their ordinals.
+
+        Parameters
+        ----------
+        values : dict
+            The values of the documents.
+        dtype : type
+            The type of the array.
+
+        Returns
+        -------
+        numpy.ndarray
+            The values of the documents, 0 for the documents that are not in the dictionary.
+        """
+        array = np.zeros(len(self.ordinals), dtype=dtype)
+        for doc_id, value in values.items():
+            array[self.ordinals[doc_id]] = value
+        return array
         
-    def search(self, query, method, weights, safe_ranking = True, max_results=10):
+    def search(self, query, method, weights, safe_ranking = True, max_results=10, offset=0, phrase_slop=None, boolean=False, genre_filter=None, ranges=None, sort_by=None,
+               facets=None, facet_limit=10):
         """
         searches for the query in the indexes.
 
@@ -39,40 +445,430 @@ class SearchEngine:
         ----------
         query : str
             The query to search for.
-        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25 | BM25F
             The method to use for searching.
         weights: dict
             The weights of the fields.
-        safe_ranking : bool
+        safe_ranking : bool | str
             If True, the search engine will search in whole index and then rank the results. 
             If False, the search engine will search in tiered index.
+            If 'impact', the search engine will search in the impact ordered index, which only supports
+            OkapiBM25 and scores with the quantized impacts.
+            If 'champions', the search engine will search in the champion lists of the terms, and in the
+            whole index if they don't give enough results. BM25F always searches the whole index.
         max_results : int
-            The maximum number of results to return. If None, all results are returned.
+            The maximum number of results to return. If None or -1, all results are returned.
+        offset : int
+            The number of top results to skip, so that max_results results from offset on are one page
+            of the results. Only the top offset + max_results documents are sorted. It can't be negative.
+        phrase_slop : int
+            If None, the query is a bag of words. Otherwise only the documents whose summaries or stars
+            contain the query terms in order, with at most phrase_slop other terms between the first and
+            the last, are returned, so 0 searches for the exact phrase. It needs the positional indexes.
+        boolean : bool
+            If True, the query is a boolean query (see BooleanQuery): AND, OR, NOT, +required and
+            -excluded terms and parentheses. Only the documents that match it in one of the weighted
+            fields are returned, and they are ranked by the terms that are not excluded. The vector
+            space and OkapiBM25 methods only score the matching documents, so the tiers and
+            safe_ranking don't apply to them.
+        genre_filter : str
+            If not None, only the documents of these genres are searched. It is a genre, or a boolean
+            query over the genres, e.g. "Drama" or 'Drama AND NOT "Science Fiction"', evaluated on
+            the genre bitmaps, and the documents outside it are never scored with the vector space
+            and OkapiBM25 methods.
+        ranges : dict
+            If not None, only the documents whose doc values are in these ranges are searched, e.g.
+            {'release_year': (1990, 2000), 'rating': (8, None)}. The bounds are inclusive and None
+            leaves a side open. The fields are release_year, rating, budget and gross_worldwide, and
+            documents without a value are outside every range. The ranges are applied like genre_filter.
+        sort_by : str
+            If not None, the results are sorted by this doc values field instead of by score, from
+            the smallest value, or from the largest if it starts with '-', e.g. '-rating'. Documents
+            without a value come last, and equal values are sorted by score. All the matching
+            documents are scored, so the tiers and safe_ranking don't apply.
+        facets : List[str]
+            If not None, the values of these facets are counted over all the documents that match the
+            query and the filters, not only the returned ones. The facets are genres, directors,
+            languages and decade.
+        facet_limit : int
+            The number of most frequent values to return for each facet. If None, all are returned.
 
         Returns
         -------
-        list
+        list | tuple
             A list of tuples containing the document IDs and their scores sorted by their scores.
+            Documents with equal scores are sorted by document ID, so the pages of a query don't overlap.
+            If facets is not None, a tuple of that list and a dict of the facet counts, with a list of
+            (value, count) tuples for each facet, sorted by count.
+            Results of repeated searches come from the result cache.
+        """
+
+        max_results = self.check_page(max_results, offset)
+        boolean_query = None
+        if boolean:
+            boolean_query = BooleanQuery(query)
+            query = boolean_query.terms
+        else:
+            preprocessor = Preprocessor([query])
+            query = preprocessor.preprocess()[0].split()
+
+        self.check_index_version()
+        genre_query = None
+        if genre_filter is not None:
+            if Preprocessor([genre_filter]).preprocess()[0] in self.genre_bitmaps:
+                # a genre of more than one word, like Science Fiction, is matched as a whole
+                genre_filter = '"' + genre_filter + '"'
+            genre_query = BooleanQuery(genre_filter, keyword=True)
+        key = (tuple(query), method, tuple((field.value, weight) for field, weight in weights.items()), safe_ranking, max_results, offset, phrase_slop,
+               None if boolean_query is None else str(boolean_query), None if genre_query is None else str(genre_query),
+               None if ranges is None else tuple(sorted((field, tuple(bounds)) for field, bounds in ranges.items())), sort_by,
+               None if facets is None else (tuple(facets), facet_limit))
+        result = self.result_cache.get(key)
+        if result is not None:
+            self.result_cache.move_to_end(key)
+            self.cache_statistics['hits'] += 1
+            if facets is not None:
+                return list(result[0]), {facet: list(counts) for facet, counts in result[1].items()}
+            return list(result)
+        self.cache_statistics['misses'] += 1
+
+        result = self.rank(query, method, weights, safe_ranking, max_results, offset, phrase_slop, boolean_query, genre_query, ranges, sort_by,
+                           facets, facet_limit)
+        if self.cache_size > 0:
+            if facets is not None:
+                self.result_cache[key] = (tuple(result[0]), {facet: tuple(counts) for facet, counts in result[1].items()})
+            else:
+                self.result_cache[key] = tuple(result)
+            if len(self.result_cache) > self.cache_size:
+                self.result_cache.popitem(last=False)
+                self.cache_statistics['evictions'] += 1
+        return result
+
+    def rank(self, query, method, weights, safe_ranking, max_results, offset, phrase_slop=None, boolean_query=None, genre_query=None, ranges=None, sort_by=None,
+             facets=None, facet_limit=10):
+        """
+        Ranks the documents for a preprocessed query. The parameters are the same as in search, and
+        boolean_query and genre_query are the parsed BooleanQuery of a boolean search and of the genre filter.
+
+        Returns
+        -------
+        list | tuple
+            A list of tuples containing the document IDs and their scores sorted by their scores, and
+            the facet counts if facets is not None, as in search.
         """
+        depth = None if max_results is None else offset + max_results
+        if safe_ranking == 'impact' and method != 'OkapiBM25':
+            raise ValueError("Impact ordered ranking only supports OkapiBM25")
+        if self.live_documents is not None and safe_ranking in ('impact', 'champions'):
+            # the impacts and the champion lists only cover the base index, so the whole index is searched
+            safe_ranking = True
+        matches = None
+        if phrase_slop is not None:
+            matches = self.find_phrase_matches(query, weights, phrase_slop)
+        filter_matches = None
+        if genre_query is not None:
+            filter_matches = genre_query.evaluate_bitmaps(self.get_genre_bitmap, len(self.document_ids))
+        if ranges is not None:
+            range_matches = self.find_range_matches(ranges)
+            filter_matches = range_matches if filter_matches is None else filter_matches & range_matches
+
+        candidates = None
+        if boolean_query is not None:
+            candidates = boolean_query.evaluate(lambda term: self.get_posting_list(term, weights), len(self.document_ids))
+            if self.live_documents is not None:
+                # a query that only excludes terms starts from all the documents, the deleted ones too
+                candidates = candidates[self.live_documents[candidates]]
+            if filter_matches is not None:
+                candidates = candidates[filter_matches[candidates]]
+        elif filter_matches is not None or sort_by is not None:
+            candidates = self.find_candidates(query, weights, filter_matches)
+
+        facet_counts = None
+        if facets is not None:
+            # the counts are over all the matching documents, whichever of them the ranking scores
+            facet_documents = candidates if candidates is not None else self.find_candidates(query, weights, filter_matches)
+            if matches is not None:
+                facet_documents = facet_documents[matches[facet_documents]]
+            facet_counts = self.count_facets(facet_documents, facets, facet_limit)
 
-        preprocessor = Preprocessor([query])
-        query = preprocessor.preprocess()[0].split()
+        if candidates is not None and (safe_ranking == 'impact' or method == 'BM25F'):
+            # these rankings don't score given documents, so their results are filtered instead
+            candidate_matches = np.zeros(len(self.document_ids), dtype=bool)
+            candidate_matches[candidates] = True
+            matches = candidate_matches if matches is None else matches & candidate_matches
+        if matches is not None:
+            # the documents that don't match are dropped after scoring, so the unsafe rankings can't stop early
+            candidate_depth = None
+        else:
+            candidate_depth = depth
         
-        scores = {}
-        if safe_ranking:
-            self.find_scores_with_safe_ranking(query, method, weights, scores)
+        if safe_ranking == 'impact':
+            result = self.find_top_k_with_impacts(query, weights, candidate_depth)
+            if sort_by is not None:
+                documents = np.array([document for document, _ in result if matches[document]], dtype=np.int64)
+                document_scores = np.array([score for document, score in result if matches[document]], dtype=float)
+                documents, document_scores = self.select_top_k_by_value(documents, document_scores, depth, sort_by)
+                result = [(self.document_ids[document], float(score)) for document, score in zip(documents[offset:], document_scores[offset:])]
+            else:
+                if matches is not None:
+                    result = [(document, score) for document, score in result if matches[document]][:depth]
+                result = [(self.document_ids[document], score) for document, score in result[offset:]]
+
+        elif method == 'BM25F':
+            documents, document_scores = self.find_scores_with_bm25f(query, weights, safe_ranking, candidate_depth)
+            if matches is not None:
+                documents, document_scores = documents[matches[documents]], document_scores[matches[documents]]
+            documents, document_scores = self.select_results(documents, document_scores, depth, sort_by)
+            result = [(self.document_ids[document], float(score)) for document, score in zip(documents[offset:], document_scores[offset:])]
+
+        elif (safe_ranking is True and method == 'OkapiBM25' and depth is not None and min(weights.values(), default=0) >= 0 and matches is None and candidates is None
+              and self.live_documents is None):
+            result = self.find_top_k_with_wand(query, weights, depth)
+            result = [(self.document_ids[document], float(score)) for document, score in result[offset:]]
+
         else:
-            self.find_scores_with_unsafe_ranking(query, method, weights, max_results, scores)
+            scores = {}
+            if candidates is not None:
+                self.find_scores_for_documents(query, method, weights, candidates, scores)
+            elif safe_ranking == 'champions':
+                self.find_scores_with_champions(query, method, weights, candidate_depth, scores)
+            elif safe_ranking:
+                self.find_scores_with_safe_ranking(query, method, weights, scores)
+            else:
+                self.find_scores_with_unsafe_ranking(query, method, weights, candidate_depth, scores)
 
-        final_scores = {}
+            final_scores = (np.zeros(len(self.document_ids), dtype=float), np.zeros(len(self.document_ids), dtype=bool))
 
-        self.aggregate_scores(weights, scores, final_scores)
-        # print(len(final_scores))
-        result = sorted(final_scores.items(), key=lambda x: x[1], reverse=True)
-        if max_results is not None:
-            result = result[:max_results]
+            self.aggregate_scores(weights, scores, final_scores)
+            if matches is not None:
+                np.logical_and(final_scores[1], matches, out=final_scores[1])
+            documents = np.flatnonzero(final_scores[1])
+            documents, document_scores = self.select_results(documents, final_scores[0][documents], depth, sort_by)
+            result = [(self.document_ids[document], float(score)) for document, score in zip(documents[offset:], document_scores[offset:])]
 
-        return result
+        if facets is None:
+            return result
+        return result, facet_counts
+
+    def count_facets(self, documents, facets, facet_limit=10):
+        """
+        Counts the values of facets over a set of documents.
+        The values of each facet are stored as one array for all the documents, so the values of the
+        set are gathered with the document offsets and counted with a single bincount.
+
+        Parameters
+        ----------
+        documents : numpy.ndarray
+            The ordinals of the documents.
+        facets : List[str]
+            The facets to count: genres, directors, languages and decade.
+        facet_limit : int
+            The number of values to return for each facet. If None, all the values are returned.
+
+        Returns
+        -------
+        dict
+            For each facet, a list of tuples of the values in the documents and their counts, sorted
+            by count and then by value.
+        """
+        facet_counts = {}
+        for facet in facets:
+            if facet not in self.facet_index:
+                raise ValueError(f"Unknown facet {facet}, it should be one of {list(self.facet_index)}")
+            values, offsets, value_ids = self.facet_index[facet]
+            starts = offsets[documents]
+            lengths = offsets[documents + 1] - starts
+            # the positions of the values of each document, from its start offset on
+            positions = np.arange(lengths.sum()) + np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+            counts = np.bincount(value_ids[positions], minlength=len(values))
+            found = np.flatnonzero(counts)
+            found = found[np.lexsort((found, -counts[found]))][:facet_limit]
+            facet_counts[facet] = [(values[i], int(counts[i])) for i in found]
+        return facet_counts
+
+    def search_batch(self, queries, method, weights, max_results=10, offset=0):
+        """
+        searches for many queries at once in the whole indexes.
+        Each field scores all the queries with one sparse matrix product, which is much faster than
+        calling search for each query when many queries are run, e.g. to tune the weights.
+
+        Parameters
+        ----------
+        queries : List[str]
+            The queries to search for.
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for searching.
+        weights: dict
+            The weights of the fields.
+        max_results : int
+            The maximum number of results to return for each query. If None or -1, all results are returned.
+        offset : int
+            The number of top results to skip for each query, as in search.
+
+        Returns
+        -------
+        list
+            For each query, the list that search returns with safe ranking.
+        """
+        max_results = self.check_page(max_results, offset)
+        queries = [query.split() for query in Preprocessor(queries).preprocess()]
+        self.check_index_version()
+        depth = None if max_results is None else offset + max_results
+
+        if method == 'BM25F':
+            # bm25f already scores all the fields in one pass, so the queries are scored one by one
+            results = []
+            for query in queries:
+                documents, document_scores = self.select_top_k(*self.find_scores_with_bm25f(query, weights, True, depth), depth)
+                results.append([(self.document_ids[document], float(score)) for document, score in zip(documents[offset:], document_scores[offset:])])
+            return results
+
+        scores, matches = None, None
+        for field in weights:
+            sc = Scorer(self.document_indexes[field], self.metadata_index['document_count'], self.scoring_index[field], self.posting_cache, len(self.document_ids))
+            if method == 'OkapiBM25':
+                field_scores, field_matches = sc.compute_batch_scores(queries, method, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
+            else:
+                field_scores, field_matches = sc.compute_batch_scores(queries, method)
+            field_scores = field_scores * weights[field]
+            scores = field_scores if scores is None else scores + field_scores
+            matches = field_matches if matches is None else matches + field_matches
+
+        if scores is None:
+            return [[] for _ in queries]
+        results = []
+        scores, matches = scores.tocsr(), matches.tocsr()
+        scores.sort_indices()
+        matches.sort_indices()
+        for i in range(len(queries)):
+            documents = matches.indices[matches.indptr[i]:matches.indptr[i + 1]]
+            document_scores = np.zeros(len(documents), dtype=float)
+            start, end = scores.indptr[i], scores.indptr[i + 1]
+            document_scores[documents.searchsorted(scores.indices[start:end])] = scores.data[start:end]
+            documents, document_scores = self.select_top_k(documents, document_scores, depth)
+            results.append([(self.document_ids[document], float(score)) for document, score in zip(documents[offset:], document_scores[offset:])])
+        return results
+
+    def check_page(self, max_results, offset):
+        """
+        Checks the page of results a search asks for, so the rankings only get a depth of
+        offset + max_results or None.
+
+        Parameters
+        ----------
+        max_results : int
+            The maximum number of results to return. None or a negative number, like -1, returns all
+            the results.
+        offset : int
+            The number of top results to skip. It can't be negative.
+
+        Returns
+        -------
+        int
+            max_results, or None if all the results are returned.
+        """
+        if offset < 0:
+            raise ValueError("offset can't be negative")
+        if max_results is not None and max_results < 0:
+            # -1 returns all the results, like utils.search documents it
+            return None
+        return max_results
+
+    def select_top_k(self, documents, scores, max_results):
+        """
+        Selects the documents with the highest scores.
+
+        Parameters
+        ----------
+        documents : numpy.ndarray
+            The sorted document ordinals.
+        scores : numpy.ndarray
+            The scores of the documents.
+        max_results : int
+            The number of documents to select. If None, all documents are returned.
+
+        Returns
+        -------
+        tuple
+            The selected document ordinals and their scores, sorted by score. Documents with equal
+            scores are in ordinal order, as in search.
+        """
+        if max_results is not None and max_results < len(documents):
+            # argpartition picks the top ones in linear time, but ties at the kth score need the smallest ordinals
+            kth = scores[np.argpartition(-scores, max_results - 1)[max_results - 1]] if max_results > 0 else np.inf
+            selected = np.flatnonzero(scores > kth)
+            selected = np.concatenate([selected, np.flatnonzero(scores == kth)[:max_results - len(selected)]])
+            documents, scores = documents[selected], scores[selected]
+        order = np.lexsort((documents, -scores))
+        return documents[order], scores[order]
+
+    def select_results(self, documents, scores, max_results, sort_by=None):
+        """
+        Selects the top documents by score, or by a doc values field if sort_by is given, as in search.
+        """
+        if sort_by is None:
+            return self.select_top_k(documents, scores, max_results)
+        return self.select_top_k_by_value(documents, scores, max_results, sort_by)
+
+    def select_top_k_by_value(self, documents, scores, max_results, sort_by):
+        """
+        Selects the first documents in the order of a doc values field.
+
+        Parameters
+        ----------
+        documents : numpy.ndarray
+            The sorted document ordinals.
+        scores : numpy.ndarray
+            The scores of the documents.
+        max_results : int
+            The number of documents to select. If None, all documents are returned.
+        sort_by : str
+            The doc values field, with a leading '-' to sort from the largest value.
+
+        Returns
+        -------
+        tuple
+            The selected document ordinals and their scores. Documents without a value come last,
+            and documents with equal values are sorted by score and then by ordinal.
+        """
+        values = self.get_doc_values(sort_by.lstrip('-'))[documents]
+        missing = np.isnan(values)
+        values = np.where(missing, 0, -values if sort_by.startswith('-') else values)
+        order = np.lexsort((documents, -scores, values, missing))[:max_results]
+        return documents[order], scores[order]
+
+    def get_doc_values(self, field):
+        """
+        Returns the column of a doc values field, indexed by document ordinal, with NaN for the
+        documents without a value.
+        """
+        if field not in self.doc_values:
+            raise ValueError(f"Unknown doc values field {field}, it should be one of {list(self.doc_values)}")
+        return self.doc_values[field]
+
+    def find_range_matches(self, ranges):
+        """
+        Finds the documents whose doc values are in the given ranges.
+
+        Parameters
+        ----------
+        ranges : dict
+            The inclusive (low, high) bounds of each field, as in search.
+
+        Returns
+        -------
+        numpy.ndarray
+            A boolean mask of the matching documents, indexed by document ordinal.
+        """
+        matches = np.ones(len(self.document_ids), dtype=bool)
+        for field, (low, high) in ranges.items():
+            values = self.get_doc_values(field)
+            # comparisons with NaN are False, so the documents without a value never match
+            if low is not None:
+                matches &= values >= low
+            if high is not None:
+                matches &= values <= high
+        return matches
 
     def aggregate_scores(self, weights, scores, final_scores):
         """
@@ -83,9 +879,10 @@ class SearchEngine:
         weights : dict
             The weights of the fields.
         scores : dict
-            The scores of the fields.
-        final_scores : dict
-            The final scores of the documents.
+            The scores of the fields, as tuples of document ordinals and their scores.
+        final_scores : tuple
+            The final scores of the documents and whether each document matched, as two arrays
+            indexed by document ordinal.
         """
         for field in weights:
             self.merge_scores(final_scores, scores[field], weights[field])
@@ -108,26 +905,211 @@ class SearchEngine:
         scores : dict
             The scores of the documents.
         """
-        tmp = {}
+        number_of_documents = len(self.document_ids)
+        current = {
+            field: (np.zeros(number_of_documents, dtype=float), np.zeros(number_of_documents, dtype=bool))
+            for field in weights
+        }
         for tier in ["first_tier", "second_tier", "third_tier"]:
-            # print(tier)
-            key_set = set()
+            matched = np.zeros(number_of_documents, dtype=bool)
             for field in weights:
-                sc = Scorer(self.tiered_index[field][tier], self.metadata_index['document_count'])
+                sc = Scorer(self.tiered_index[field][tier], self.metadata_index['document_count'], self.tiered_scoring_index[field][tier], self.posting_cache, len(self.document_ids))
                 if method =='OkapiBM25':
-                    tmp[field] = sc.compute_scores_with_okapi_bm25(query, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
+                    tmp = sc.compute_scores_with_okapi_bm25(query, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
                 else:
-                    tmp[field] = sc.compute_scores_with_vector_space_model(query, method)
+                    tmp = sc.compute_scores_with_vector_space_model(query, method)
 
-                if field not in scores:
-                    scores[field] = {}
-                self.merge_scores(scores[field], tmp[field], weights[field])
-                key_set.update(list(scores[field].keys()))
+                self.merge_scores(current[field], tmp, weights[field])
+                matched |= current[field][1]
 
-            if len(key_set) >= max_results:
+            if max_results is not None and matched.sum() >= max_results:
                 break
-        
 
+        for field in weights:
+            documents = np.flatnonzero(current[field][1])
+            scores[field] = (documents, current[field][0][documents])
+
+
+    def find_phrase_matches(self, query, weights, slop):
+        """
+        Finds the documents that contain the query as a phrase in one of the weighted fields that have
+        a positional index. Only the documents that contain every query term are looked at, and only
+        the positions of the query terms in them are decompressed.
+
+        Parameters
+        ----------
+        query: List[str]
+            The phrase.
+        weights: dict
+            The weights of the fields.
+        slop : int
+            The number of other terms allowed between the first and the last term of the phrase.
+
+        Returns
+        -------
+        numpy.ndarray
+            Whether each document contains the phrase, indexed by document ordinal.
+        """
+        if not any(field in self.positional_index for field in weights):
+            raise ValueError("Phrase queries need the positional index of a weighted field")
+
+        matches = np.zeros(len(self.document_ids), dtype=bool)
+        for field in weights:
+            positional_index = self.positional_index.get(field)
+            if positional_index is None or not query or any(term not in positional_index for term in query):
+                continue
+            postings = [positional_index[term] for term in query]
+            candidates = postings[0][0]
+            for documents, _ in postings[1:]:
+                candidates = np.intersect1d(candidates, documents, assume_unique=True)
+            for document in candidates:
+                positions = [decode_positions(encoded[documents.searchsorted(document)]) for documents, encoded in postings]
+                if self.has_phrase(positions, slop):
+                    matches[document] = True
+        return matches
+
+    def has_phrase(self, positions, slop):
+        """
+        Checks if the terms of a phrase appear in order with at most slop other terms in between.
+
+        Parameters
+        ----------
+        positions : List[List[int]]
+            The sorted positions of each term of the phrase in a document.
+        slop : int
+            The number of other terms allowed between the first and the last term.
+
+        Returns
+        -------
+        bool
+            True if the document contains the phrase.
+        """
+        # from each position of the first term, the earliest following position of each next term gives the shortest span
+        starts = np.array(positions[0])
+        current = starts
+        for term_positions in positions[1:]:
+            term_positions = np.array(term_positions)
+            following = term_positions.searchsorted(current, side='right')
+            found = following < len(term_positions)
+            starts, current = starts[found], term_positions[following[found]]
+        return bool(np.any(current - starts - (len(positions) - 1) <= slop))
+
+    def find_scores_with_champions(self, query, method, weights, max_results, scores):
+        """
+        Finds the scores of the documents using only the champion lists of the query terms.
+        The champions are scored with the statistics of the whole index, so a document gets the same
+        score as in the safe ranking from the terms it is a champion of. If the champions give fewer
+        than max_results documents, the whole index is searched instead.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for searching.
+        weights: dict
+            The weights of the fields.
+        max_results : int
+            The maximum number of results to return.
+        scores : dict
+            The scores of the documents.
+        """
+        for field in weights:
+            sc = Scorer(self.champion_index[field], self.metadata_index['document_count'], self.scoring_index[field], self.posting_cache, len(self.document_ids))
+            if method == 'OkapiBM25':
+                scores[field] = sc.compute_scores_with_okapi_bm25(query, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
+            else:
+                scores[field] = sc.compute_scores_with_vector_space_model(query, method)
+
+        documents = [scores[field][0] for field in weights]
+        if max_results is None or len(np.unique(np.concatenate(documents or [[]]))) < max_results:
+            self.find_scores_with_safe_ranking(query, method, weights, scores)
+
+    def get_posting_list(self, term, weights):
+        """
+        Returns the documents that contain a term in any of the weighted fields.
+
+        Parameters
+        ----------
+        term : str
+            The preprocessed term.
+        weights: dict
+            The weights of the fields.
+
+        Returns
+        -------
+        PostingList
+            The posting list of the term, with the skip pointers of the index if only one field has it.
+        """
+        fields = [field for field in weights if term in self.document_indexes[field]]
+        if not fields:
+            return PostingList(np.zeros(0, dtype=np.int32))
+        if len(fields) == 1:
+            index = self.document_indexes[fields[0]]
+            return PostingList(index.get_postings(term)[0], *index.get_skip_pointers(term))
+        return PostingList(np.unique(np.concatenate([self.document_indexes[field].get_postings(term)[0] for field in fields])))
+
+    def get_genre_bitmap(self, genre):
+        """
+        Returns the packed bitmap of the documents of a preprocessed genre, empty for unknown genres.
+        """
+        bitmap = self.genre_bitmaps.get(genre)
+        if bitmap is None:
+            bitmap = np.zeros((len(self.document_ids) + 7) // 8, dtype=np.uint8)
+        return bitmap
+
+    def find_candidates(self, query, weights, filter_matches):
+        """
+        Finds the documents that contain at least one of the query terms and pass a filter.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        weights: dict
+            The weights of the fields.
+        filter_matches : numpy.ndarray
+            A boolean mask of the documents that pass the filter, indexed by document ordinal, or
+            None to keep all the documents.
+
+        Returns
+        -------
+        numpy.ndarray
+            The sorted ordinals of the candidates.
+        """
+        postings = []
+        for field in weights:
+            for term in query:
+                if term in self.document_indexes[field]:
+                    documents = self.document_indexes[field].get_postings(term)[0]
+                    postings.append(documents if filter_matches is None else documents[filter_matches[documents]])
+        if not postings:
+            return np.zeros(0, dtype=np.int32)
+        return np.unique(np.concatenate(postings))
+
+    def find_scores_for_documents(self, query, method, weights, documents, scores):
+        """
+        Finds the scores of given documents only, e.g. the ones that match a boolean query.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        method : str ((n|l)(n|t)(n|c).(n|l)(n|t)(n|c)) | OkapiBM25
+            The method to use for searching.
+        weights: dict
+            The weights of the fields.
+        documents : numpy.ndarray
+            The sorted ordinals of the documents to score.
+        scores : dict
+            The scores of the documents.
+        """
+        for field in weights:
+            sc = Scorer(self.document_indexes[field], self.metadata_index['document_count'], self.scoring_index[field], self.posting_cache, len(self.document_ids))
+            if method == 'OkapiBM25':
+                scores[field] = sc.compute_scores_for_documents(query, method, documents, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
+            else:
+                scores[field] = sc.compute_scores_for_documents(query, method, documents)
 
     def find_scores_with_safe_ranking(self, query, method, weights, scores):
         """
@@ -146,34 +1128,284 @@ class SearchEngine:
         """
         
         for field in weights:
-            sc = Scorer(self.document_indexes[field], self.metadata_index['document_count'])
+            sc = Scorer(self.document_indexes[field], self.metadata_index['document_count'], self.scoring_index[field], self.posting_cache, len(self.document_ids))
             if method == 'OkapiBM25':
                 scores[field] = sc.compute_scores_with_okapi_bm25(query, self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field])
             else:
                 scores[field] = sc.compute_scores_with_vector_space_model(query, method)
 
-            
-    def merge_scores(self, current, new, w):
+    def find_scores_with_bm25f(self, query, weights, safe_ranking, max_results, b=B, k1=K1):
         """
-        Merges two dictionaries of scores.
+        Finds the scores of the documents with bm25f.
+        The tf of a term in each field is length normalized with the field's average length and
+        weighted by the field weight, and the sum over the fields is saturated once per term, so all
+        the fields are scored in a single pass over the document ordinals.
 
         Parameters
         ----------
-        scores1 : dict
-            The first dictionary of scores.
-        scores2 : dict
-            The second dictionary of scores.
+        query: List[str]
+            The query to be scored
+        weights: dict
+            The weights of the fields. They should not be negative.
+        safe_ranking : bool
+            If True, the whole indexes are used. If False, the tiers are added one by one until
+            max_results documents are found.
+        max_results : int
+            The maximum number of results to return.
+        b : float
+            The length normalization parameter, the same for every field.
+        k1 : float
+            The tf saturation parameter.
 
         Returns
         -------
-        dict
-            The merged dictionary of scores.
+        tuple
+            The ordinals of the documents that contain a query term and their scores, as two arrays.
         """
-        
-        for key in new:
-            if key not in current:
-                current[key] = 0
-            current[key] += new[key] * w
+        if min(weights.values(), default=0) < 0:
+            raise ValueError("BM25F needs non-negative field weights")
+
+        number_of_documents = len(self.document_ids)
+        length_normalization = {
+            field: 1 - b + b * self.document_lengths_index[field] / self.metadata_index['averge_document_length'][field.value]
+            for field in weights
+        }
+        if safe_ranking:
+            tiers = [{field: self.document_indexes[field] for field in weights}]
+        else:
+            tiers = [
+                {field: self.tiered_index[field][tier] for field in weights}
+                for tier in ["first_tier", "second_tier", "third_tier"]
+            ]
+
+        pseudo_tfs = {term: np.zeros(number_of_documents, dtype=float) for term in dict.fromkeys(query)}
+        matched = np.zeros(number_of_documents, dtype=bool)
+        for tier in tiers:
+            for term, pseudo_tf in pseudo_tfs.items():
+                for field in weights:
+                    documents, tfs = tier[field].get_postings(term)
+                    pseudo_tf[documents] += weights[field] * tfs / length_normalization[field][documents]
+                    matched[documents] = True
+            if max_results is not None and matched.sum() >= max_results:
+                break
+
+        documents = np.flatnonzero(matched)
+        scores = np.zeros(len(documents), dtype=float)
+        for term, pseudo_tf in pseudo_tfs.items():
+            pseudo_tf = pseudo_tf[documents]
+            scores += query.count(term) * self.get_unified_idf(term) * (k1 + 1) * pseudo_tf / (k1 + pseudo_tf)
+        return documents, scores
+
+    def get_unified_idf(self, term):
+        """
+        Returns the idf weight, log(N / df), of a term where df counts the documents that contain the
+        term in any field.
+
+        Parameters
+        ----------
+        term : str
+            The term to get the idf weight for.
+
+        Returns
+        -------
+        float
+            The idf weight of the term, 0 if no document contains it.
+        """
+        document_frequency = self.unified_document_frequency.get(term)
+        if document_frequency is None:
+            postings = [index.get_postings(term)[0] for index in self.document_indexes.values()]
+            document_frequency = len(np.unique(np.concatenate(postings)))
+            if document_frequency == 0:
+                return 0.0
+            self.unified_document_frequency[term] = document_frequency
+        return np.log(self.metadata_index['document_count'] / document_frequency)
+
+    def find_top_k_with_wand(self, query, weights, max_results, block_max=True):
+        """
+        Finds the top documents with okapi bm25 without scoring every document of the posting lists.
+        Each (field, term) pair is a cursor of WAND whose upper bound is the field weight times the
+        stored bm25 upper bound of the term, so the result is the same as the safe ranking.
+        With block_max, the bound of each block of a posting list comes from its max tf and min
+        document length, and blocks that can't beat the current top results are skipped.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        weights: dict
+            The weights of the fields. They should not be negative.
+        max_results : int
+            The maximum number of results to return.
+        block_max : bool
+            If True, the search uses the block max index.
+
+        Returns
+        -------
+        list
+            A list of tuples containing the document ordinals and their scores sorted by their scores.
+        """
+        scorers = {}
+        posting_lists = []
+        upper_bounds = []
+        blocks = []
+        for field in weights:
+            scorers[field] = Scorer(self.document_indexes[field], self.metadata_index['document_count'], self.scoring_index[field], ordinal_count=len(self.document_ids))
+            average_document_length = self.metadata_index['averge_document_length'][field.value]
+            for term in dict.fromkeys(query):
+                if term in self.document_indexes[field]:
+                    posting_lists.append(self.document_indexes[field].get_postings(term)[0])
+                    weight = weights[field] * query.count(term)
+                    upper_bounds.append(weight * self.scoring_index[field]['bm25_upper_bound'][term])
+                    if block_max:
+                        idf = scorers[field].get_idf_weight(term)
+                        term_blocks = self.block_max_index[field]['blocks'][term]
+                        blocks.append((
+                            np.array([last_document for last_document, _, _, _ in term_blocks]),
+                            [weight * min(max_score, idf * scorers[field].okapi_score_tf(max_tf, min_length / average_document_length))
+                             for _, max_tf, min_length, max_score in term_blocks]
+                        ))
+
+        # fields without any query term add nothing to the score, so they are left out
+        field_scorers = [
+            (scorers[field], self.metadata_index['averge_document_length'][field.value], self.document_lengths_index[field], weights[field])
+            for field in weights if any(term in self.document_indexes[field] for term in query)
+        ]
+
+        def score_document(document):
+            score = 0
+            for scorer, average_document_length, document_lengths, weight in field_scorers:
+                score += scorer.get_okapi_bm25_score(query, document, average_document_length, document_lengths) * weight
+            return score
+
+        wand = Wand(posting_lists, upper_bounds, score_document, max_results, blocks if block_max else None)
+        result = wand.search()
+        self.pruning_statistics = {
+            'postings': sum(len(posting_list) for posting_list in posting_lists),
+            'postings_visited': wand.postings_visited,
+            'documents_scored': wand.documents_scored,
+            'blocks_skipped': wand.blocks_skipped,
+        }
+        return result
+
+    def find_top_k_with_impacts(self, query, weights, max_results):
+        """
+        Finds the top documents with the quantized okapi bm25 impacts, score at a time.
+        The segments of all the (field, term) pairs are processed from the highest weighted impact to
+        the lowest, and the search stops once no later segment can change which documents are the top
+        ones. The remaining segments are then only looked up for those documents, so their scores are
+        the same as if every segment had been processed.
+
+        Parameters
+        ----------
+        query: List[str]
+            The query to be scored
+        weights: dict
+            The weights of the fields. The search only stops early when none of them is negative.
+        max_results : int
+            The maximum number of results to return. If None, all results are returned.
+
+        Returns
+        -------
+        list
+            A list of tuples containing the document ordinals and their scores sorted by their scores.
+        """
+        segments = []
+        contributions = []
+        for field in weights:
+            impact_index = self.impact_index[field]
+            for term in dict.fromkeys(query):
+                if term not in impact_index['impacts']:
+                    continue
+                impacts, documents = impact_index['impacts'][term]
+                weight = weights[field] * query.count(term) * impact_index['scale']
+                contributions.append(impacts * weight)
+                for position in range(len(impacts)):
+                    segments.append((contributions[-1][position], len(contributions) - 1, position, documents[position]))
+        segments.sort(key=lambda segment: -segment[0])
+
+        number_of_documents = len(self.document_ids)
+        scores = np.zeros(number_of_documents, dtype=float)
+        matched = np.zeros(number_of_documents, dtype=bool)
+        # the next contribution of each (field, term) pair bounds what any document can still get from it
+        next_contributions = [float(contribution[0]) for contribution in contributions]
+        early_termination = max_results is not None and max_results > 0 and all(weight >= 0 for weight in weights.values())
+        processed = 0
+        postings_visited = 0
+        for contribution, cursor, position, documents in segments:
+            if early_termination and self.impacts_settled(scores, matched, max_results, sum(next_contributions)):
+                break
+            scores[documents] += contribution
+            matched[documents] = True
+            processed += 1
+            postings_visited += len(documents)
+            next_contributions[cursor] = float(contributions[cursor][position + 1]) if position + 1 < len(contributions[cursor]) else 0.0
+
+        if processed < len(segments):
+            top = np.flatnonzero(matched)
+            top = top[np.argpartition(-scores[top], max_results - 1)[:max_results]]
+            top.sort()
+            for contribution, _, _, documents in segments[processed:]:
+                positions = documents.searchsorted(top)
+                found = positions < len(documents)
+                found[found] = documents[positions[found]] == top[found]
+                scores[top[found]] += contribution
+        else:
+            top = np.flatnonzero(matched)
+
+        self.pruning_statistics = {
+            'postings': sum(len(documents) for _, _, _, documents in segments),
+            'postings_visited': postings_visited,
+            'segments': len(segments),
+            'segments_processed': processed,
+        }
+        documents, document_scores = self.select_top_k(top, scores[top], max_results)
+        return [(int(document), float(score)) for document, score in zip(documents, document_scores)]
+
+    def impacts_settled(self, scores, matched, max_results, remaining):
+        """
+        Checks whether the top documents of a score at a time search can still change.
+
+        Parameters
+        ----------
+        scores : numpy.ndarray
+            The accumulated scores, indexed by document ordinal.
+        matched : numpy.ndarray
+            Whether each document has been seen, indexed by document ordinal.
+        max_results : int
+            The number of top documents.
+        remaining : float
+            The most any document can still add to its score.
+
+        Returns
+        -------
+        bool
+            True if the max_results-th score is higher than any other document can reach.
+        """
+        candidates = scores[matched]
+        if len(candidates) < max_results:
+            return False
+        if len(candidates) == max_results:
+            return candidates.min() > remaining
+        candidates = -np.partition(-candidates, max_results)
+        return candidates[max_results - 1] > candidates[max_results] + remaining
+
+    def merge_scores(self, current, new, w):
+        """
+        Merges weighted scores into an accumulator.
+
+        Parameters
+        ----------
+        current : tuple
+            The accumulated scores and whether each document matched, as two arrays indexed by
+            document ordinal. It is updated in place.
+        new : tuple
+            The document ordinals and their scores to add.
+        w : float
+            The weight of the new scores.
+        """
+        documents, new_scores = new
+        current[0][documents] += new_scores * w
+        current[1][documents] = True
             
         
 
@@ -200,9 +1432,8 @@ if __name__ == '__main__':
     
     queries = ['spiderman', 'batman', 'master', 'man', 'shawshank', 'hero', 'father', 'future', 'pain', 'meal']
     res = {}
-    for query in queries:
+    for query, lst in zip(queries, search_engine.search_batch(queries, 'OkapiBM25', weights)):
         res[query] = []
-        lst = search_engine.search(query, 'OkapiBM25', weights)
         for el in lst:
             res[query].append(el[0])
 
@@ -210,6 +1441,3 @@ if __name__ == '__main__':
     file_path = '../Logic/core/utility/search_data.json'
     with open(file_path, "w") as json_file:
         json.dump(res, json_file)
-
-
-  
\ No newline at end of file
@@ -0,0 +1,50 @@
+import os
+import json
+import time
+import tempfile
+import tracemalloc
+from ..indexer.indexes_enum import Indexes
+from ..indexer.binary_index import write_binary_index, Binary_index
+
+# Compares opening the JSON indexes with memory mapping their binary version: the time, the memory
+# allocated by Python, the file size, and the time to read the postings of a term.
+# Run it from the Logic directory with: python -m core.utility.benchmark_binary_index
+
+
+def measure(load):
+    tracemalloc.start()
+    start = time.time()
+    index = load()
+    elapsed = time.time() - start
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return index, elapsed, memory
+
+
+def run(path, fields, lookups=200):
+    with tempfile.TemporaryDirectory() as directory:
+        for field in fields:
+            json_path = path + field.value + '_index.json'
+            binary_path = os.path.join(directory, field.value + '_index.bin')
+            with open(json_path, 'r') as file:
+                write_binary_index(binary_path, json.load(file))
+
+            def load_json():
+                with open(json_path, 'r') as file:
+                    return json.load(file)
+            json_index, json_time, json_memory = measure(load_json)
+            binary_index, binary_time, binary_memory = measure(lambda: Binary_index(binary_path))
+
+            terms = list(json_index)[:lookups]
+            start = time.time()
+            for term in terms:
+                binary_index.get_postings(term)
+            lookup_time = (time.time() - start) / max(len(terms), 1)
+
+            print(f'{field.value:>10}: json {os.path.getsize(json_path) / 2 ** 20:6.2f} MB opened in {1000 * json_time:8.2f} ms using {json_memory / 2 ** 20:6.2f} MB, '
+                  f'binary {os.path.getsize(binary_path) / 2 ** 20:6.2f} MB opened in {1000 * binary_time:6.2f} ms using {binary_memory / 2 ** 20:6.2f} MB, '
+                  f'{1e6 * lookup_time:6.1f} us per posting list')
+
+
+if __name__ == '__main__':
+    run('../Logic/core/indexer/index/', [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES])
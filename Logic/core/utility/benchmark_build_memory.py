@@ -0,0 +1,75 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import functools
+import resource
+import tempfile
+import contextlib
+import multiprocessing
+
+# Builder imports the other modules of core as top level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_builder import Builder
+from preprocess import Preprocessor
+from indexer.index import Index
+from indexer.indexes_enum import Indexes
+from indexer.segment_index import write_indexes
+
+# Compares the peak memory of Builder, which reads, preprocesses and indexes the crawled movies one at a
+# time, with the one of a build that loads all of them with json.load and builds the index of the crawled
+# documents and the one of the preprocessed documents from the whole list, like Builder used to.
+# Each build runs in a new process, whose peak resident set size is printed with the size of the crawl.
+# Run it from the Logic directory with: python -m core.utility.benchmark_build_memory
+
+
+def build_from_list(crawled_path, path):
+    with open(crawled_path, 'r') as file:
+        documents = json.load(file)
+    raw_index = Index(documents)
+    for field in [Indexes.SUMMARIES.value, Indexes.STARS.value, Indexes.GENRES.value]:
+        for document in documents:
+            document[field] = Preprocessor(document[field]).preprocess()
+    write_indexes(path, raw_index.index[Indexes.DOCUMENTS.value], Index(documents, positional=True))
+
+
+def build_streaming(crawled_path, path, workers=1):
+    Builder(crawled_path, -1, workers=workers, index_path=path)
+
+
+def measure(name, build, crawled_path, queue):
+    path = tempfile.mkdtemp() + '/'
+    start_memory = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start = time.time()
+    try:
+        # the indexes print a line for every file they store
+        with contextlib.redirect_stdout(io.StringIO()):
+            build(crawled_path, path)
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    queue.put((name, time.time() - start, start_memory, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+               resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss))
+
+
+def run(crawled_path, workers=2):
+    builds = {
+        'json.load and lists': build_from_list,
+        'streaming': build_streaming,
+        f'streaming, {workers} processes': functools.partial(build_streaming, workers=workers),
+    }
+    print(f'crawl: {os.path.getsize(crawled_path) / 2 ** 20:.1f} MB')
+    for name, build in builds.items():
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=measure, args=(name, build, crawled_path, queue))
+        process.start()
+        name, seconds, start_memory, peak_memory, children_peak_memory = queue.get()
+        process.join()
+        # ru_maxrss is in kilobytes
+        print(f'{name:>24}: {seconds:7.1f} s, peak RSS {peak_memory / 1024:7.1f} MB, {(peak_memory - start_memory) / 1024:7.1f} MB '
+              f'more than before the build' + (f', {children_peak_memory / 1024:7.1f} MB in the largest worker' if children_peak_memory else ''))
+
+
+if __name__ == '__main__':
+    run('../Logic/IMDB_crawled.json')
@@ -0,0 +1,48 @@
+import json
+import time
+from ..search import SearchEngine
+from ..indexer.indexes_enum import Indexes
+
+# Compares the tiered and the champion list search with the safe ranking, on the queries of search_data.json.
+# The quality is recall@k: the share of the safe top k results that each of them returns, over the queries with results.
+# Run it from the Logic directory with: python -m core.utility.benchmark_champions
+
+
+def run(search_engine, queries, method, weights, max_results=10, repeat=20):
+    report = {'safe': [0, 0.0], 'tiered': [0, 0.0], 'champions': [0, 0.0]}
+    # the queries without safe results say nothing about recall, so they are left out of it
+    recall_queries = 0
+    for query in queries:
+        expected = None
+        for name, safe_ranking in [('safe', True), ('tiered', False), ('champions', 'champions')]:
+            start = time.time()
+            for _ in range(repeat):
+                result = search_engine.search(query, method, weights, safe_ranking, max_results)
+            report[name][1] += (time.time() - start) / repeat
+
+            documents = [document for document, _ in result]
+            if expected is None:
+                expected = documents
+                recall_queries += bool(expected)
+            if expected:
+                report[name][0] += len(set(documents) & set(expected)) / len(expected)
+
+    print(f'{len(queries)} queries, {recall_queries} with results, {method}, top {max_results}, weights {[w for w in weights.values()]}')
+    for name, (recall, latency) in report.items():
+        print(f'{name:>10}: recall@{max_results} {recall / max(recall_queries, 1):.3f}, {1000 * latency / len(queries):7.3f} ms per query')
+
+
+def champion_postings(search_engine):
+    for field, champion_index in search_engine.champion_index.items():
+        print(f'{field.value:>10}: {len(champion_index.documents)} of {len(search_engine.document_indexes[field].documents)} postings are champions')
+
+
+if __name__ == '__main__':
+    search_engine = SearchEngine(cache_size=0)
+    with open('../Logic/core/utility/search_data.json', 'r') as json_file:
+        queries = list(json.load(json_file).keys())
+
+    champion_postings(search_engine)
+    for method in ['OkapiBM25', 'lnc.ltc']:
+        run(search_engine, queries, method, {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1})
+        run(search_engine, queries, method, {Indexes.SUMMARIES: 1})
@@ -0,0 +1,42 @@
+import json
+import time
+from ..search import SearchEngine
+from ..indexer.indexes_enum import Indexes
+
+# Compares the tiered and the impact ordered okapi bm25 search with the safe ranking, on the queries of search_data.json.
+# The quality is the share of the safe top results that each of them returns, over the queries with results.
+# Run it from the Logic directory with: python -m core.utility.benchmark_impact
+
+
+def run(search_engine, queries, weights, max_results=10, repeat=20):
+    report = {'safe': [0, 0.0], 'tiered': [0, 0.0], 'impact': [0, 0.0]}
+    # the queries without safe results say nothing about recall, so they are left out of it
+    recall_queries = 0
+    for query in queries:
+        expected = None
+        for name, safe_ranking in [('safe', True), ('tiered', False), ('impact', 'impact')]:
+            start = time.time()
+            for _ in range(repeat):
+                result = search_engine.search(query, 'OkapiBM25', weights, safe_ranking, max_results)
+            report[name][1] += (time.time() - start) / repeat
+
+            documents = [document for document, _ in result]
+            if expected is None:
+                expected = documents
+                recall_queries += bool(expected)
+            if expected:
+                report[name][0] += len(set(documents) & set(expected)) / len(expected)
+
+    print(f'{len(queries)} queries, {recall_queries} with results, top {max_results}, weights {[w for w in weights.values()]}')
+    for name, (recall, latency) in report.items():
+        print(f'{name:>8}: recall {recall / max(recall_queries, 1):.3f}, {1000 * latency / len(queries):7.3f} ms per query')
+
+
+if __name__ == '__main__':
+    # without the result cache, the repeated searches would only time cache hits
+    search_engine = SearchEngine(cache_size=0)
+    with open('../Logic/core/utility/search_data.json', 'r') as json_file:
+        queries = list(json.load(json_file).keys())
+
+    run(search_engine, queries, {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1})
+    run(search_engine, queries, {Indexes.SUMMARIES: 1})
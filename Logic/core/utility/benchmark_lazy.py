@@ -0,0 +1,34 @@
+import time
+import tracemalloc
+from ..search import SearchEngine
+from ..indexer.indexes_enum import Indexes
+
+# Compares the eager and the lazy search engine: the time to load it, the time of the first query,
+# which makes the lazy engine read what it needs, the time of the next queries, and the memory
+# allocated by Python once the queries are done.
+# Run it from the Logic directory with: python -m core.utility.benchmark_lazy
+
+
+def run(path, queries, method, weights, lazy, max_results=10):
+    tracemalloc.start()
+    start = time.time()
+    search_engine = SearchEngine(path, cache_size=0, lazy=lazy)
+    loaded = time.time()
+    search_engine.search(queries[0], method, weights, True, max_results)
+    first = time.time()
+    for query in queries[1:]:
+        search_engine.search(query, method, weights, True, max_results)
+    end = time.time()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    print(f'{"lazy" if lazy else "eager":>5}: loaded in {1000 * (loaded - start):8.1f} ms, first query {1000 * (first - loaded):7.1f} ms, '
+          f'next queries {1000 * (end - first) / max(len(queries) - 1, 1):6.2f} ms each, {memory / 2 ** 20:6.1f} MB allocated '
+          f'(tracemalloc slows everything down, compare the times with each other only)')
+
+
+if __name__ == '__main__':
+    queries = ['spider man', 'the dark knight', 'tom hanks', 'world war', 'young woman', 'serial killer', 'new york', 'robert de niro']
+    weights = {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1}
+    for lazy in [False, True]:
+        run('../Logic/core/indexer/index/', queries, 'OkapiBM25', weights, lazy)
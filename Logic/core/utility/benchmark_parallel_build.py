@@ -0,0 +1,47 @@
+import io
+import os
+import sys
+import time
+import filecmp
+import shutil
+import tempfile
+import contextlib
+import multiprocessing
+
+# Builder imports the other modules of core as top level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from index_builder import Builder
+
+# Builds the indexes of the crawled movies with 1 to all the cores, and prints the time of each build,
+# its speedup over the build with one process and whether its files are the same as the ones of that build.
+# Run it from the Logic directory with: python -m core.utility.benchmark_parallel_build
+
+
+def run(crawled_path, data_amount=-1, binary=False, workers=None):
+    workers = workers or range(1, multiprocessing.cpu_count() + 1)
+    paths = {}
+    times = {}
+    try:
+        for worker_count in workers:
+            paths[worker_count] = tempfile.mkdtemp() + '/'
+            start = time.time()
+            # the indexes print a line for every file they store
+            with contextlib.redirect_stdout(io.StringIO()):
+                Builder(crawled_path, data_amount, binary, worker_count, paths[worker_count])
+            times[worker_count] = time.time() - start
+
+        first = min(workers)
+        files = sorted(os.listdir(paths[first]))
+        for worker_count in workers:
+            same = sorted(os.listdir(paths[worker_count])) == files and all(
+                filecmp.cmp(paths[first] + name, paths[worker_count] + name, shallow=False) for name in files
+            )
+            print(f'{worker_count:3} processes: {times[worker_count]:8.1f} s, speedup {times[first] / times[worker_count]:5.2f}, '
+                  f'{"same files" if same else "DIFFERENT FILES"} as {first} process{"es" if first > 1 else ""}')
+    finally:
+        for path in paths.values():
+            shutil.rmtree(path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    run('../Logic/IMDB_crawled.json')
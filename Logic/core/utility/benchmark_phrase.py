@@ -0,0 +1,46 @@
+import os
+import json
+import time
+from ..search import SearchEngine
+from ..indexer.indexes_enum import Indexes, Index_types
+from ..indexer.position_codec import decode_positions
+
+# Reports the size of the positional indexes and compares the latency of phrase queries with bag of words queries.
+# Run it from the Logic directory with: python -m core.utility.benchmark_phrase
+
+
+def index_sizes(search_engine, path):
+    for field, positional_index in search_engine.positional_index.items():
+        index_size = os.path.getsize(path + field.value + '_index.json')
+        positional_size = os.path.getsize(path + field.value + '_' + Index_types.POSITIONAL.value + '_index.json')
+        uncompressed_size = len(json.dumps({
+            term: {search_engine.document_ids[document]: decode_positions(encoded) for document, encoded in zip(documents, positions)}
+            for term, (documents, positions) in positional_index.items()
+        }))
+        print(f'{field.value:>10}: index {index_size / 2 ** 20:6.2f} MB, positional index {positional_size / 2 ** 20:6.2f} MB '
+              f'({positional_size / index_size:.2f}x), positions as JSON lists {uncompressed_size / 2 ** 20:6.2f} MB')
+
+
+def run(search_engine, queries, method, weights, max_results=10, repeat=20):
+    report = {'bag of words': [0, 0.0], 'phrase': [0, 0.0], 'proximity 3': [0, 0.0]}
+    for query in queries:
+        for name, phrase_slop in [('bag of words', None), ('phrase', 0), ('proximity 3', 3)]:
+            start = time.time()
+            for _ in range(repeat):
+                result = search_engine.search(query, method, weights, True, max_results, phrase_slop=phrase_slop)
+            report[name][1] += (time.time() - start) / repeat
+            report[name][0] += len(result)
+
+    print(f'{len(queries)} queries, {method}, top {max_results}, weights {[w for w in weights.values()]}')
+    for name, (results, latency) in report.items():
+        print(f'{name:>13}: {results:4d} results, {1000 * latency / len(queries):7.3f} ms per query')
+
+
+if __name__ == '__main__':
+    path = '../Logic/core/indexer/index/'
+    search_engine = SearchEngine(path, cache_size=0)
+    queries = ['spider man', 'the dark knight', 'tom hanks', 'world war', 'young woman', 'serial killer', 'new york', 'robert de niro']
+
+    index_sizes(search_engine, path)
+    run(search_engine, queries, 'OkapiBM25', {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1})
+    run(search_engine, queries, 'lnc.ltc', {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1})
@@ -0,0 +1,53 @@
+import io
+import os
+import json
+import time
+import shutil
+import tempfile
+import contextlib
+from ..search import SearchEngine
+from ..index_writer import IndexWriter
+from ..indexer.indexes_enum import Indexes
+
+# Adds crawled movies to a copy of the index a few at a time, as new segments, and compares the time
+# of each add with the time to search the index with its segments and with a force merge, which
+# builds all the indexes again like Builder does, without preprocessing.
+# Run it from the Logic directory with: python -m core.utility.benchmark_segments
+
+
+def run(path, crawled_path, batches=20, batch_size=5, merge_factor=10):
+    with open(crawled_path, 'r') as file:
+        documents = json.load(file)[-batches * batch_size:]
+    weights = {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1}
+
+    copy_path = tempfile.mkdtemp() + '/'
+    for name in os.listdir(path):
+        if name.endswith(('_index.json', '_index.bin')):
+            shutil.copy(path + name, copy_path)
+    try:
+        writer = IndexWriter(copy_path, merge_factor)
+        search_engine = SearchEngine(copy_path, cache_size=0)
+        times = []
+        # the indexes print a line for every file they store
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(batches):
+                start = time.time()
+                writer.add_documents(documents[i * batch_size:(i + 1) * batch_size])
+                times.append(time.time() - start)
+            writer.wait_for_merges()
+        print(f'add {batch_size} movies: {1000 * sum(times) / len(times):7.1f} ms on average, {1000 * max(times):7.1f} ms at most, '
+              f'{len(writer.segment_names)} segments left after the merges')
+
+        start = time.time()
+        search_engine.search('spider man', 'OkapiBM25', weights)
+        print(f'first search after the adds, which loads the segments: {1000 * (time.time() - start):7.1f} ms')
+        start = time.time()
+        with contextlib.redirect_stdout(io.StringIO()):
+            writer.force_merge()
+        print(f'force merge, building all the indexes again: {1000 * (time.time() - start):9.1f} ms')
+    finally:
+        shutil.rmtree(copy_path, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    run('../Logic/core/indexer/index/', '../Logic/IMDB_crawled.json')
@@ -0,0 +1,28 @@
+import functools
+import multiprocessing
+from .benchmark_build_memory import measure, Builder
+
+# Builds the indexes of the crawled movies with the reviews and synopsis indexed by Spimi_index, with a few
+# memory limits for their postings, and prints the time and the peak resident set size of each build, which
+# runs in a new process. The first limit is large enough for all the postings to stay in memory.
+# Run it from the Logic directory with: python -m core.utility.benchmark_spimi
+
+
+def build_with_text_fields(crawled_path, path, memory_limit):
+    Builder(crawled_path, -1, index_path=path, text_fields=['reviews', 'synopsis'], memory_limit=memory_limit)
+
+
+def run(crawled_path, memory_limits=(2 ** 40, 64 * 2 ** 20, 16 * 2 ** 20, 4 * 2 ** 20)):
+    for memory_limit in memory_limits:
+        queue = multiprocessing.Queue()
+        name = f'limit {memory_limit / 2 ** 20:.0f} MB' if memory_limit < 2 ** 40 else 'no limit'
+        process = multiprocessing.Process(target=measure, args=(name, functools.partial(build_with_text_fields, memory_limit=memory_limit), crawled_path, queue))
+        process.start()
+        name, seconds, start_memory, peak_memory, _ = queue.get()
+        process.join()
+        # ru_maxrss is in kilobytes
+        print(f'{name:>15}: {seconds:7.1f} s, peak RSS {peak_memory / 1024:7.1f} MB, {(peak_memory - start_memory) / 1024:7.1f} MB more than before the build')
+
+
+if __name__ == '__main__':
+    run('../Logic/IMDB_crawled.json')
@@ -0,0 +1,58 @@
+import json
+import time
+import numpy as np
+from ..search import SearchEngine
+from ..preprocess import Preprocessor
+from ..indexer.indexes_enum import Indexes
+
+# Compares exhaustive okapi bm25 scoring with WAND and Block-Max WAND on the queries of search_data.json.
+# Run it from the Logic directory with: python -m core.utility.benchmark_top_k
+
+
+def exhaustive_top_k(search_engine, query, weights, max_results):
+    scores = {}
+    search_engine.find_scores_with_safe_ranking(query, 'OkapiBM25', weights, scores)
+    number_of_documents = len(search_engine.document_ids)
+    final_scores = (np.zeros(number_of_documents), np.zeros(number_of_documents, dtype=bool))
+    search_engine.aggregate_scores(weights, scores, final_scores)
+    postings = sum(
+        search_engine.document_indexes[field].get_document_frequency(term) for field in weights for term in query
+    )
+    documents = np.flatnonzero(final_scores[1])
+    documents = documents[np.argsort(-final_scores[0][documents], kind='stable')][:max_results]
+    return [(document, final_scores[0][document]) for document in documents], postings
+
+
+def run(search_engine, queries, weights, max_results=10, repeat=20):
+    report = {'exhaustive': [0, 0.0], 'wand': [0, 0.0], 'block_max_wand': [0, 0.0]}
+    for query in queries:
+        query = Preprocessor([query]).preprocess()[0].split()
+
+        start = time.time()
+        for _ in range(repeat):
+            expected, postings = exhaustive_top_k(search_engine, query, weights, max_results)
+        report['exhaustive'][0] += postings
+        report['exhaustive'][1] += (time.time() - start) / repeat
+
+        for name, block_max in [('wand', False), ('block_max_wand', True)]:
+            start = time.time()
+            for _ in range(repeat):
+                result = search_engine.find_top_k_with_wand(query, weights, max_results, block_max)
+            report[name][0] += search_engine.pruning_statistics['postings_visited']
+            report[name][1] += (time.time() - start) / repeat
+
+            if [score for _, score in result] != [score for _, score in expected]:
+                print(f'{name} returned different top {max_results} for {query}')
+
+    print(f'{len(queries)} queries, top {max_results}, weights {[w for w in weights.values()]}')
+    for name, (postings, latency) in report.items():
+        print(f'{name:>16}: {postings:6d} postings visited, {1000 * latency / len(queries):7.3f} ms per query')
+
+
+if __name__ == '__main__':
+    search_engine = SearchEngine()
+    with open('../Logic/core/utility/search_data.json', 'r') as json_file:
+        queries = list(json.load(json_file).keys())
+
+    run(search_engine, queries, {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1})
+    run(search_engine, queries, {Indexes.SUMMARIES: 1})
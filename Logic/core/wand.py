@@ -0,0 +1,158 @@
+import heapq
+
+
+class Wand:
+    def __init__(self, posting_lists, upper_bounds, score_document, k, blocks=None):
+        """
+        Initializes the document-at-a-time top-k retrieval with WAND.
+
+        Parameters
+        ----------
+        posting_lists : List[numpy.ndarray]
+            The posting list of each query term, as document ordinals sorted in ascending order.
+        upper_bounds : List[float]
+            The highest score each query term can add to a document.
+        score_document : callable
+            Returns the exact score of a document given its ordinal.
+        k : int
+            The number of documents to return.
+        blocks : List[tuple], optional
+            The blocks of each posting list as a tuple of (the last document ordinal of each block,
+            the highest score the term can add to a document of each block). If given, the search
+            is Block-Max WAND and skips whole blocks that can't beat the current top k.
+        """
+        self.posting_lists = posting_lists
+        self.upper_bounds = upper_bounds
+        self.score_document = score_document
+        self.k = k
+        self.blocks = blocks
+        self.postings_visited = 0
+        self.documents_scored = 0
+        self.blocks_skipped = 0
+
+    def search(self):
+        """
+        Finds the k documents with the highest scores.
+        A document is only scored when the upper bounds of the terms it may contain add up to more than
+        the lowest score in the current top k, and the cursors jump over the documents in between.
+
+        Returns
+        -------
+        list
+            A list of tuples containing the document ordinals and their scores sorted by their scores.
+        """
+        # each cursor is [posting list, position, upper bound, block last documents, block upper bounds]
+        cursors = []
+        for i, (posting_list, upper_bound) in enumerate(zip(self.posting_lists, self.upper_bounds)):
+            if len(posting_list) > 0:
+                block_last_docs, block_upper_bounds = self.blocks[i] if self.blocks is not None else (None, None)
+                cursors.append([posting_list, 0, upper_bound, block_last_docs, block_upper_bounds])
+                self.postings_visited += 1
+
+        heap = []
+        while cursors and self.k > 0:
+            cursors.sort(key=lambda cursor: cursor[0][cursor[1]])
+
+            pivot = None
+            bound = 0.0
+            for i, cursor in enumerate(cursors):
+                bound += cursor[2]
+                if len(heap) < self.k or bound > heap[0][0]:
+                    pivot = i
+                    break
+            if pivot is None:
+                break
+            pivot_doc = cursors[pivot][0][cursors[pivot][1]]
+            while pivot + 1 < len(cursors) and cursors[pivot + 1][0][cursors[pivot + 1][1]] == pivot_doc:
+                pivot += 1
+
+            if self.blocks is not None and len(heap) == self.k and not self.check_blocks(cursors, pivot, pivot_doc, heap[0][0]):
+                self.skip_blocks(cursors, pivot, pivot_doc)
+            elif cursors[0][0][cursors[0][1]] == pivot_doc:
+                score = self.score_document(pivot_doc)
+                self.documents_scored += 1
+                # among equal scores the largest ordinal is evicted first, so ties keep the smallest ordinals
+                if len(heap) < self.k:
+                    heapq.heappush(heap, (score, -pivot_doc))
+                elif score > heap[0][0]:
+                    heapq.heapreplace(heap, (score, -pivot_doc))
+                for cursor in cursors[:pivot + 1]:
+                    self.advance(cursor, cursor[1] + 1)
+            else:
+                for cursor in cursors:
+                    if cursor[0][cursor[1]] >= pivot_doc:
+                        break
+                    self.advance(cursor, cursor[0].searchsorted(pivot_doc))
+
+            cursors = [cursor for cursor in cursors if cursor[1] < len(cursor[0])]
+
+        return sorted([(-int(document), score) for score, document in heap], key=lambda x: (-x[1], x[0]))
+
+    def check_blocks(self, cursors, pivot, pivot_doc, threshold):
+        """
+        Checks if the blocks holding the pivot document can beat the threshold.
+
+        Parameters
+        ----------
+        cursors : list
+            The cursors sorted by their current document.
+        pivot : int
+            The index of the last cursor that may hold the pivot document.
+        pivot_doc : int
+            The pivot document.
+        threshold : float
+            The lowest score in the current top k.
+
+        Returns
+        -------
+        bool
+            False if no document of these blocks can make it to the top k.
+        """
+        bound = 0.0
+        for cursor in cursors[:pivot + 1]:
+            block = cursor[3].searchsorted(pivot_doc)
+            if block < len(cursor[3]):
+                bound += min(cursor[2], cursor[4][block])
+        return bound > threshold
+
+    def skip_blocks(self, cursors, pivot, pivot_doc):
+        """
+        Moves the cursors up to the pivot past the end of the first of their current blocks that ends,
+        or to the document of the next cursor if it comes first. No document in between can make it
+        to the top k.
+
+        Parameters
+        ----------
+        cursors : list
+            The cursors sorted by their current document.
+        pivot : int
+            The index of the last cursor that may hold the pivot document.
+        pivot_doc : int
+            The pivot document.
+        """
+        block_end = min(
+            cursor[3][block] for cursor in cursors[:pivot + 1]
+            for block in [cursor[3].searchsorted(pivot_doc)] if block < len(cursor[3])
+        )
+        next_doc = cursors[pivot + 1][0][cursors[pivot + 1][1]] if pivot + 1 < len(cursors) else None
+        self.blocks_skipped += 1
+        for cursor in cursors[:pivot + 1]:
+            if next_doc is not None and next_doc <= block_end:
+                self.advance(cursor, cursor[0].searchsorted(next_doc))
+            else:
+                self.advance(cursor, cursor[0].searchsorted(block_end, side='right'))
+
+    def advance(self, cursor, position):
+        """
+        Moves a cursor to a position of its posting list.
+
+        Parameters
+        ----------
+        cursor : list
+            The cursor to move.
+        position : int
+            The new position of the cursor.
+        """
+        if position != cursor[1] and position < len(cursor[0]):
+            self.postings_visited += 1
+        cursor[1] = position
@@ -0,0 +1,220 @@
+import io
+import os
+import sys
+import json
+import random
+import contextlib
+import numpy as np
+import pytest
+
+LOGIC_PATH = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# the search engine is imported from the core package, and Builder imports the modules of core as top level modules
+sys.path[:0] = [LOGIC_PATH, os.path.join(LOGIC_PATH, 'core')]
+
+from index_builder import Builder
+from core.search import SearchEngine
+from core.indexer.indexes_enum import Indexes, Index_types
+from core.indexer.index_reader import Index_reader
+
+WORDS = [
+    'love', 'war', 'family', 'murder', 'detective', 'city', 'secret', 'journey', 'prison', 'escape',
+    'king', 'queen', 'dragon', 'ship', 'ocean', 'space', 'planet', 'robot', 'doctor', 'soldier',
+    'friend', 'revenge', 'money', 'heist', 'school', 'teacher', 'village', 'forest', 'ghost', 'house',
+    'father', 'mother', 'brother', 'sister', 'hero', 'villain', 'train', 'island', 'music', 'dance',
+]
+NAMES = ['tom hanks', 'morgan freeman', 'tim robbins', 'meryl streep', 'al pacino', 'robert de niro',
+         'kate winslet', 'brad pitt', 'emma stone', 'denzel washington', 'cate blanchett', 'jodie foster']
+GENRES = ['Drama', 'Crime', 'Comedy', 'Action', 'Horror', 'Romance', 'Science Fiction']
+LANGUAGES = ['English', 'French', 'Spanish', 'Japanese']
+
+WEIGHTS = [
+    {Indexes.STARS: 1, Indexes.GENRES: 1, Indexes.SUMMARIES: 1},
+    {Indexes.STARS: 0.3, Indexes.GENRES: 0.3, Indexes.SUMMARIES: 0.4},
+    {Indexes.SUMMARIES: 1},
+]
+QUERIES = ['love war', 'detective murder city', 'tom hanks', 'space robot planet hero', 'drama', 'family secret house ghost', 'morgan']
+
+
+def make_text(rng, length):
+    # a few words are much more frequent than the others, so the term frequencies and the tiers vary
+    return ' '.join(rng.choices(WORDS, weights=[1 / (rank + 1) for rank in range(len(WORDS))], k=length))
+
+
+def make_crawl(count=150, seed=0):
+    """
+    Returns synthetic crawled movies with the fields of the crawler, deterministic for a seed.
+    """
+    rng = random.Random(seed)
+    movies = []
+    for i in range(count):
+        year = rng.randint(1950, 2023)
+        movies.append({
+            'id': f'tt{i:07d}',
+            'title': make_text(rng, 3).title(),
+            'first_page_summary': make_text(rng, 20),
+            'release_year': str(year),
+            'mpaa': rng.choice(['PG', 'R', 'PG-13']),
+            'budget': f'${rng.randint(1, 200) * 1000000:,} (estimated)' if i % 4 else 'N/A',
+            'gross_worldwide': f'${rng.randint(1, 900) * 1000000:,}',
+            'rating': str(round(rng.uniform(2, 9.5), 1)) if i % 9 else None,
+            'directors': rng.sample(NAMES, 1),
+            'writers': rng.sample(NAMES, rng.randint(1, 2)),
+            'stars': rng.sample(NAMES, rng.randint(1, 4)),
+            'related_links': [],
+            'genres': rng.sample(GENRES, rng.randint(1, 3)),
+            'languages': rng.sample(LANGUAGES, rng.randint(1, 2)),
+            'countries_of_origin': ['United States'],
+            'summaries': [make_text(rng, rng.randint(5, 60)) + ' Visit http://www.example.com now!' for _ in range(rng.randint(1, 3))],
+            'synopsis': [make_text(rng, rng.randint(50, 200))] if i % 5 else None,
+            'reviews': [[make_text(rng, rng.randint(20, 80)), f'{rng.randint(1, 10)}/10'] for _ in range(rng.randint(0, 4))] if i % 7 else None,
+        })
+    if count > 3:
+        # a movie crawled twice, as crawls sometimes have
+        movies.append(dict(movies[3], summaries=['a second crawl of the same movie about love']))
+    return movies
+
+
+def build_index(crawled_path, index_path, data_amount=-1, **options):
+    """
+    Builds the indexes of a crawl with Builder, in the Logic directory like the other paths of core expect.
+    """
+    with pytest.MonkeyPatch.context() as monkeypatch, contextlib.redirect_stdout(io.StringIO()):
+        monkeypatch.chdir(LOGIC_PATH)
+        Builder(crawled_path, data_amount, index_path=index_path, **options)
+
+
+def exhaustive_scores(search_engine, query, method, weights):
+    """
+    Scores every document that has a term of the preprocessed query, without any pruning.
+
+    Returns
+    -------
+    dict
+        The score of each matching document ID.
+    """
+    scores = {}
+    search_engine.find_scores_with_safe_ranking(query, method, weights, scores)
+    final_scores = (np.zeros(len(search_engine.document_ids)), np.zeros(len(search_engine.document_ids), dtype=bool))
+    search_engine.aggregate_scores(weights, scores, final_scores)
+    return {search_engine.document_ids[document]: float(final_scores[0][document]) for document in np.flatnonzero(final_scores[1])}
+
+
+def naive_scores(index_path, query, method, weights):
+    """
+    Scores every document like the first Scorer did, with the {term: {document ID: tf}} dicts of the
+    JSON indexes, the document vectors over the whole vocabulary and okapi bm25 with k1 = 1.5 and
+    b = 0.75, as a reference that doesn't share any code with the fast paths. BM25F is scored by
+    naive_bm25f_scores.
+
+    Returns
+    -------
+    dict
+        The score of each matching document ID.
+    """
+    metadata = Index_reader(index_path, Indexes.DOCUMENTS, Index_types.METADATA).index
+    number_of_documents = metadata['document_count']
+    if method == 'BM25F':
+        return naive_bm25f_scores(index_path, query, weights, metadata)
+    scores = {}
+    for field, field_weight in weights.items():
+        index = Index_reader(index_path, field).index
+        terms = [term for term in query if term in index]
+
+        def idf(term):
+            return np.log(number_of_documents / len(index[term]))
+
+        def weight(tf, scheme, term):
+            return (tf if scheme[0] == 'n' else np.log(tf) + 1) * (idf(term) if scheme[1] == 't' else 1)
+
+        if method == 'OkapiBM25':
+            lengths = Index_reader(index_path, field, Index_types.DOCUMENT_LENGTH).index
+            average_length = metadata['averge_document_length'][field.value]
+            field_scores = {}
+            for term in terms:
+                for document_id, tf in index[term].items():
+                    dl_avgdl = lengths[document_id] / average_length
+                    score = 2.5 * tf / (tf + 1.5 * (0.25 + 0.75 * dl_avgdl)) * idf(term)
+                    field_scores[document_id] = field_scores.get(document_id, 0) + score
+        else:
+            document_method, query_method = method[:3], method[4:]
+            query_weights = {term: weight(query.count(term), query_method, term) for term in set(terms)}
+            if query_method[2] == 'c' and sum(query_weights.values()) > 0:
+                query_norm = np.sqrt(sum(value ** 2 for value in query_weights.values()))
+                query_weights = {term: value / query_norm for term, value in query_weights.items()}
+            norms = {}
+            if document_method[2] == 'c':
+                for term, postings in index.items():
+                    for document_id, tf in postings.items():
+                        norms[document_id] = norms.get(document_id, 0) + weight(tf, document_method, term) ** 2
+            field_scores = {}
+            for term, query_weight in query_weights.items():
+                for document_id, tf in index[term].items():
+                    score = query_weight * weight(tf, document_method, term) / np.sqrt(norms.get(document_id, 1))
+                    field_scores[document_id] = field_scores.get(document_id, 0) + score
+        for document_id, score in field_scores.items():
+            scores[document_id] = scores.get(document_id, 0) + field_weight * score
+    return scores
+
+
+def naive_bm25f_scores(index_path, query, weights, metadata):
+    """
+    Scores every document with bm25f, the weighted and length normalized tfs of the fields summed
+    before the saturation, and the idf of the documents that have the term in any field.
+    """
+    indexes = {field: Index_reader(index_path, field).index for field in [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]}
+    lengths = {field: Index_reader(index_path, field, Index_types.DOCUMENT_LENGTH).index for field in weights}
+    scores = {}
+    for term in set(query):
+        documents = set().union(*(index.get(term, {}) for index in indexes.values()))
+        if not documents:
+            continue
+        idf = np.log(metadata['document_count'] / len(documents))
+        pseudo_tfs = {}
+        for field, field_weight in weights.items():
+            average_length = metadata['averge_document_length'][field.value]
+            for document_id, tf in indexes[field].get(term, {}).items():
+                normalized_tf = field_weight * tf / (0.25 + 0.75 * lengths[field][document_id] / average_length)
+                pseudo_tfs[document_id] = pseudo_tfs.get(document_id, 0) + normalized_tf
+        for document_id, pseudo_tf in pseudo_tfs.items():
+            scores[document_id] = scores.get(document_id, 0) + query.count(term) * idf * 2.5 * pseudo_tf / (1.5 + pseudo_tf)
+    return scores
+
+
+def assert_top_k(result, scores, max_results):
+    """
+    Checks that a result has the max_results highest of the exhaustive scores, with their scores.
+    Equal scores may be in any order, and only the last of them may be cut off.
+    """
+    expected = sorted(scores.values(), reverse=True)[:max_results]
+    assert [score for _, score in result] == pytest.approx(expected)
+    for document_id, score in result:
+        assert score == pytest.approx(scores[document_id])
+    assert len(set(document_id for document_id, _ in result)) == len(result)
+
+
+@pytest.fixture(autouse=True)
+def logic_directory(monkeypatch):
+    # the preprocessor reads the stopwords from a path relative to the Logic directory
+    monkeypatch.chdir(LOGIC_PATH)
+
+
+@pytest.fixture(scope='session')
+def crawled_path(tmp_path_factory):
+    path = tmp_path_factory.mktemp('crawl') / 'crawled.json'
+    with open(path, 'w') as file:
+        json.dump(make_crawl(), file)
+    return str(path)
+
+
+@pytest.fixture(scope='session')
+def index_path(crawled_path, tmp_path_factory):
+    path = str(tmp_path_factory.mktemp('index')) + '/'
+    build_index(crawled_path, path)
+    return path
+
+
+@pytest.fixture(scope='session')
+def search_engine(index_path):
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        monkeypatch.chdir(LOGIC_PATH)
+        return SearchEngine(index_path, cache_size=0)
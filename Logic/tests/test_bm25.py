@@ -0,0 +1,32 @@
+import pytest
+from conftest import exhaustive_scores
+from core.indexer.indexes_enum import Indexes
+
+FIELDS = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+
+
+@pytest.mark.parametrize('field', FIELDS)
+def test_stored_scores_are_the_ones_of_the_scorer(search_engine, field):
+    # WAND, Block-Max WAND, the impacts and the champion lists are only right if they are
+    impact_index = search_engine.impact_index[field]
+    for term, upper_bound in search_engine.scoring_index[field]['bm25_upper_bound'].items():
+        scores = exhaustive_scores(search_engine, [term], 'OkapiBM25', {field: 1})
+        assert upper_bound == pytest.approx(max(scores.values()))
+
+        ordinal_scores = sorted((search_engine.ordinals[document_id], score) for document_id, score in scores.items())
+        first = 0
+        for last_document, _, _, max_score in search_engine.block_max_index[field]['blocks'][term]:
+            block = [score for ordinal, score in ordinal_scores if first <= ordinal <= last_document]
+            assert max_score == pytest.approx(max(block))
+            first = last_document + 1
+
+        impacts, documents = impact_index['impacts'][term]
+        for impact, impact_documents in zip(impacts, documents):
+            for ordinal in impact_documents:
+                assert abs(impact * impact_index['scale'] - scores[search_engine.document_ids[ordinal]]) <= impact_index['scale'] / 2 + 1e-9
+
+        champions = set(search_engine.champion_index[field].get_postings(term)[0].tolist())
+        champion_scores = [score for ordinal, score in ordinal_scores if ordinal in champions]
+        other_scores = [score for ordinal, score in ordinal_scores if ordinal not in champions]
+        assert champion_scores
+        assert min(champion_scores) >= max(other_scores, default=0) - 1e-9
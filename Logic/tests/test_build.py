@@ -0,0 +1,277 @@
+import io
+import os
+import json
+import numpy as np
+import pytest
+from conftest import WEIGHTS, QUERIES, make_crawl, build_index
+from index_builder import Builder, preprocess_texts
+from indexer.fields import Field, DEFAULT_FIELDS
+from core.search import SearchEngine
+from core.preprocess import Preprocessor
+from core.index_writer import IndexWriter
+from core.indexer.index_reader import Index_reader
+from core.indexer.indexes_enum import Indexes, Index_types
+from core.indexer.binary_index import Binary_index, write_binary_index, encode_varints, decode_varints
+from core.indexer.lazy_index import Lazy_index
+from core.indexer.segment_index import read_segments
+
+FIELDS = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+SEARCHES = [('OkapiBM25', True), ('OkapiBM25', False), ('OkapiBM25', 'impact'), ('OkapiBM25', 'champions'), ('ltn.lnn', True), ('lnc.ltc', False),
+            ('BM25F', True)]
+
+
+def build(crawled_path, tmp_path_factory, **options):
+    path = str(tmp_path_factory.mktemp('build')) + '/'
+    build_index(crawled_path, path, **options)
+    return path
+
+
+def read_files(path):
+    files = {}
+    for name in os.listdir(path):
+        with open(path + name, 'rb') as file:
+            files[name] = file.read()
+    return files
+
+
+def assert_same_searches(search_engine, other_engine):
+    for method, safe_ranking in SEARCHES:
+        for query in QUERIES:
+            for max_results in [5, None]:
+                result = other_engine.search(query, method, WEIGHTS[1], safe_ranking, max_results)
+                expected = search_engine.search(query, method, WEIGHTS[1], safe_ranking, max_results)
+                assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected]
+                assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+
+
+def test_varints_round_trip():
+    values = np.array([0, 1, 127, 128, 300, 2 ** 14, 2 ** 21 - 1, 2 ** 35], dtype=np.int64)
+    assert decode_varints(np.frombuffer(encode_varints(values), dtype=np.uint8)).tolist() == values.tolist()
+    assert decode_varints(np.frombuffer(encode_varints([]), dtype=np.uint8)).tolist() == []
+
+
+@pytest.fixture(scope='module')
+def binary_index_path(crawled_path, tmp_path_factory):
+    return build(crawled_path, tmp_path_factory, binary=True)
+
+
+def test_binary_indexes_are_the_json_ones(binary_index_path, index_path, search_engine):
+    path = binary_index_path
+    files, binary_files = read_files(index_path), read_files(path)
+    for field in FIELDS:
+        index = Index_reader(path, field).index
+        assert isinstance(index, Binary_index)
+        expected = json.loads(files.pop(field.value + '_index.json'))
+        assert list(index) == list(expected)
+        assert {term: index[term] for term in index} == expected
+        assert 'unseenword' not in index
+        binary_files.pop(field.value + '_index.bin')
+    # the indexes built from the binary ones are the same
+    assert binary_files == files
+    assert_same_searches(search_engine, SearchEngine(path, cache_size=0))
+
+
+def test_binary_index_keeps_the_order_of_the_terms(tmp_path):
+    index = {'zebra': {'b': 2, 'a': 1}, 'apple': {'c': 300}, 'empty': {}, 'éclair': {'a': 1, 'c': 1}}
+    write_binary_index(str(tmp_path / 'index.bin'), index)
+    binary_index = Binary_index(str(tmp_path / 'index.bin'))
+    assert list(binary_index) == ['zebra', 'apple', 'éclair']
+    assert {term: binary_index[term] for term in binary_index} == {'zebra': {'a': 1, 'b': 2}, 'apple': {'c': 300}, 'éclair': {'a': 1, 'c': 1}}
+    assert 'empty' not in binary_index and 'b' not in binary_index
+
+
+def test_builds_in_the_other_format_replace_the_indexes(crawled_path, binary_index_path, index_path, tmp_path):
+    def read_index_files(path):
+        # the generation in the segments file counts the builds
+        files = read_files(path)
+        del files['segments.json']
+        return files
+
+    (tmp_path / 'index').mkdir()
+    path = str(tmp_path / 'index') + '/'
+    build_index(crawled_path, path, binary=True)
+    build_index(crawled_path, path)
+    assert read_index_files(path) == read_index_files(index_path)
+    build_index(crawled_path, path, binary=True)
+    assert read_index_files(path) == read_index_files(binary_index_path)
+
+    (tmp_path / 'expected').mkdir()
+    expected_path = str(tmp_path / 'expected') + '/'
+    build_index(crawled_path, expected_path)
+    IndexWriter(expected_path, background=False).force_merge()
+    IndexWriter(path, background=False).force_merge(binary=False)
+    assert read_index_files(path) == read_index_files(expected_path)
+
+
+@pytest.mark.parametrize('lazy_cache_size', [0, 2, 1024])
+@pytest.mark.parametrize('binary', [False, True])
+def test_lazy_engines_search_like_the_others(index_path, binary_index_path, search_engine, lazy_cache_size, binary):
+    lazy_engine = SearchEngine(binary_index_path if binary else index_path, cache_size=0, lazy=True, lazy_cache_size=lazy_cache_size)
+    assert 'tiered_index' not in lazy_engine.__dict__
+    assert_same_searches(search_engine, lazy_engine)
+    assert search_engine.search('tom hanks', 'OkapiBM25', WEIGHTS[0], phrase_slop=0) == lazy_engine.search('tom hanks', 'OkapiBM25', WEIGHTS[0], phrase_slop=0)
+
+
+def test_lazy_index_reads_the_json_postings(tmp_path):
+    index = {'plain': {'a': 1, 'b': 2}, 'quote"and\\slash': {'a': 3}, 'éclair': {'c': 1}, '{brace}': {'b': 1}, 'empty': {}}
+    with open(tmp_path / 'index.json', 'w') as file:
+        json.dump(index, file)
+    lazy_index = Lazy_index(str(tmp_path / 'index.json'), cache_size=1)
+    assert list(lazy_index) == list(index)
+    for _ in range(2):
+        assert {term: lazy_index[term] for term in lazy_index} == index
+    assert lazy_index.get_document_frequency('plain') == 2 and lazy_index.get_document_frequency('unseenword') == 0
+    assert 'unseenword' not in lazy_index
+
+
+def assert_same_scores(search_engine, other_engine):
+    # the documents have other ordinals in the other engine, so only the scores are compared
+    for method in ['OkapiBM25', 'ltn.lnn', 'lnc.ltc', 'BM25F']:
+        for query in QUERIES:
+            result = dict(other_engine.search(query, method, WEIGHTS[1], max_results=None))
+            expected = dict(search_engine.search(query, method, WEIGHTS[1], max_results=None))
+            assert sorted(result) == sorted(expected)
+            assert result == pytest.approx(expected)
+            top = other_engine.search(query, method, WEIGHTS[1], max_results=5)
+            assert [score for _, score in top] == pytest.approx(sorted(expected.values(), reverse=True)[:5])
+
+
+def test_segments_search_like_a_new_build(tmp_path):
+    crawl = make_crawl()[:150]
+    with open(tmp_path / 'base.json', 'w') as file:
+        json.dump(crawl[:100], file)
+    (tmp_path / 'index').mkdir()
+    path = str(tmp_path / 'index') + '/'
+    build_index(str(tmp_path / 'base.json'), path)
+
+    documents = {document['id']: document for document in crawl[:100]}
+    writer = IndexWriter(path, merge_factor=2, background=False)
+    search_engine = SearchEngine(path, cache_size=0)
+    for start in range(100, 150, 10):
+        writer.add_documents(crawl[start:start + 10])
+        documents.update((document['id'], document) for document in crawl[start:start + 10])
+    for document in [dict(crawl[7], summaries=['robot robot love']), dict(crawl[120], stars=['tom hanks'])]:
+        writer.add_documents([document])
+        documents[document['id']] = document
+    assert writer.delete_documents(['tt0000005', 'tt0000121', 'tt0000142', 'tt9999999']) == 3
+    for document_id in ['tt0000005', 'tt0000121', 'tt0000142']:
+        del documents[document_id]
+    assert read_segments(path)['segments']
+
+    with open(tmp_path / 'live.json', 'w') as file:
+        json.dump(list(documents.values()), file)
+    (tmp_path / 'expected').mkdir()
+    expected_path = str(tmp_path / 'expected') + '/'
+    build_index(str(tmp_path / 'live.json'), expected_path)
+    expected_engine = SearchEngine(expected_path, cache_size=0)
+    assert_same_scores(expected_engine, search_engine)
+
+    writer.force_merge()
+    assert read_segments(path)['segments'] == [] and read_segments(path)['deletions'] == {}
+    assert_same_scores(expected_engine, search_engine)
+    # the merged index has all the indexes again, so the impacts and the champion lists are searched too
+    assert_same_searches(SearchEngine(path, cache_size=0), search_engine)
+
+
+@pytest.mark.parametrize('workers, shard_size', [(2, 256), (3, 16)])
+def test_parallel_builds_are_the_serial_one(crawled_path, tmp_path_factory, index_path, monkeypatch, workers, shard_size):
+    monkeypatch.setattr(Builder, 'shard_size', shard_size)
+    path = build(crawled_path, tmp_path_factory, workers=workers)
+    assert read_files(path) == read_files(index_path)
+
+
+@pytest.mark.parametrize('chunk_size', [1, 7, 1 << 20])
+def test_crawled_documents_are_read_in_chunks(chunk_size):
+    documents = make_crawl(20)
+    texts = [json.dumps(documents), ''.join(json.dumps(document) + '\n' for document in documents), json.dumps(documents, indent=4), '[]', '  ']
+    for text, expected in zip(texts, [documents, documents, documents, [], []]):
+        assert list(Builder.read_json_documents(io.StringIO(text), chunk_size)) == expected
+    for text in ['[{"id": 1}', '{"id": 1}\n{"id"']:
+        with pytest.raises(json.JSONDecodeError):
+            list(Builder.read_json_documents(io.StringIO(text), chunk_size))
+
+
+def test_builds_from_json_lines_are_the_same(crawled_path, tmp_path_factory, index_path):
+    with open(crawled_path) as file:
+        documents = json.load(file)
+    lines_path = str(tmp_path_factory.mktemp('crawl') / 'crawled.jsonl')
+    with open(lines_path, 'w') as file:
+        for document in documents:
+            file.write(json.dumps(document) + '\n')
+    path = build(lines_path, tmp_path_factory)
+    assert read_files(path) == read_files(index_path)
+
+    # only the first data_amount documents are indexed
+    path = build(lines_path, tmp_path_factory, data_amount=30)
+    assert Index_reader(path, Indexes.DOCUMENTS, Index_types.DOCID).index == [document['id'] for document in documents[:30]]
+
+
+@pytest.mark.parametrize('memory_limit, workers', [(2000, 1), (2000, 2), (256 * 2 ** 20, 1)])
+def test_spimi_builds_are_the_text_postings(crawled_path, tmp_path_factory, index_path, memory_limit, workers):
+    text_fields = ['reviews', 'synopsis']
+    path = build(crawled_path, tmp_path_factory, text_fields=text_fields, memory_limit=memory_limit, workers=workers)
+    with open(crawled_path) as file:
+        documents = json.load(file)
+    files = read_files(path)
+    for field in text_fields:
+        expected = {}
+        for document in documents:
+            for text in preprocess_texts(document, [field])[field]:
+                for term in text.split():
+                    postings = expected.setdefault(term, {})
+                    postings[document['id']] = postings.get(document['id'], 0) + 1
+        index = json.loads(files.pop(field + '_index.json'))
+        assert index == expected
+        assert list(index) == sorted(expected)
+    assert files == read_files(index_path)
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_failed_builds_leave_no_temporary_files(tmp_path, workers):
+    # a crawl cut off in the middle of a document, read after some runs were written
+    with open(tmp_path / 'crawled.jsonl', 'w') as file:
+        for document in make_crawl(40):
+            file.write(json.dumps(document) + '\n')
+        file.write('{"id"')
+    (tmp_path / 'index').mkdir()
+    with pytest.raises(json.JSONDecodeError):
+        build_index(str(tmp_path / 'crawled.jsonl'), str(tmp_path / 'index') + '/', text_fields=['reviews', 'synopsis'], memory_limit=2000, workers=workers)
+    assert os.listdir(tmp_path / 'index') == []
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_registered_fields_are_indexed_in_the_same_pass(crawled_path, tmp_path_factory, index_path, workers):
+    fields = DEFAULT_FIELDS + [Field('directors', Field.KEYWORD), Field('mpaa', Field.KEYWORD), Field('release_year', Field.NUMERIC),
+                               Field('title', Field.TEXT, tiers=(2, 1))]
+    path = build(crawled_path, tmp_path_factory, fields=fields, workers=workers)
+    with open(crawled_path) as file:
+        documents = json.load(file)
+    files, default_files = read_files(path), read_files(index_path)
+
+    for name, get_terms in [('directors', lambda document: document['directors']), ('mpaa', lambda document: [document['mpaa']]),
+                            ('title', lambda document: Preprocessor([document['title']]).preprocess()[0].split())]:
+        expected, lengths = {}, {}
+        for document in documents:
+            terms = get_terms(document)
+            # the postings of a document crawled twice count the terms of both crawls, like the default fields
+            for term in terms:
+                postings = expected.setdefault(term, {})
+                postings[document['id']] = postings.get(document['id'], 0) + 1
+            lengths[document['id']] = sum(len(term.split()) for term in terms)
+        assert json.loads(files.pop(name + '_index.json')) == expected
+        assert json.loads(files.pop(name + '_document_length_index.json')) == lengths
+    tiers = json.loads(files.pop('title_tiered_index.json'))
+    for term, postings in json.loads(read_files(path)['title_index.json']).items():
+        for document_id, tf in postings.items():
+            tier = 'first_tier' if tf >= 2 else 'second_tier'
+            assert tiers[tier][term][document_id] == tf
+    assert json.loads(files.pop('release_year_index.json')) == {document['id']: int(document['release_year']) for document in documents}
+
+    metadata, default_metadata = json.loads(files.pop('documents_metadata_index.json')), json.loads(default_files.pop('documents_metadata_index.json'))
+    assert {field: length for field, length in metadata['averge_document_length'].items() if field in default_metadata['averge_document_length']} \
+        == default_metadata['averge_document_length']
+    preprocessed, default_preprocessed = json.loads(files.pop('documents_index.json')), json.loads(default_files.pop('documents_index.json'))
+    assert {document_id: dict(document, title=None) for document_id, document in preprocessed.items()} \
+        == {document_id: dict(document, title=None) for document_id, document in default_preprocessed.items()}
+    # the files of the default fields are the same
+    assert files == default_files
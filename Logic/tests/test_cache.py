@@ -0,0 +1,102 @@
+import os
+import shutil
+import pytest
+from conftest import WEIGHTS, QUERIES, make_crawl, build_index
+from core.search import SearchEngine
+from core.index_writer import IndexWriter
+from core.indexer.index import Index
+
+
+@pytest.fixture
+def copied_index_path(index_path, tmp_path):
+    path = str(tmp_path / 'index') + '/'
+    shutil.copytree(index_path, path)
+    return path
+
+
+def test_hits_do_not_list_the_index_files(index_path, monkeypatch):
+    search_engine = SearchEngine(index_path)
+    result = search_engine.search('love war', 'OkapiBM25', WEIGHTS[0])
+    calls = []
+    scandir = os.scandir
+    monkeypatch.setattr(os, 'scandir', lambda path: calls.append(path) or scandir(path))
+    for _ in range(3):
+        assert search_engine.search('love war', 'OkapiBM25', WEIGHTS[0]) == result
+    assert search_engine.cache_statistics['hits'] == 3
+    assert calls == []
+
+
+def test_only_watched_indexes_clear_the_cache(index_path):
+    search_engine = SearchEngine(index_path)
+    watched, other = Index([]), Index([])
+    search_engine.watch_index(watched)
+    search_engine.search('love war', 'OkapiBM25', WEIGHTS[0])
+
+    other.add_document_to_index({'id': 'new', 'stars': ['tom hanks'], 'genres': ['drama'], 'summaries': ['love']})
+    search_engine.search('love war', 'OkapiBM25', WEIGHTS[0])
+    assert search_engine.cache_statistics == {'hits': 1, 'misses': 1, 'evictions': 0, 'invalidations': 0}
+
+    watched.add_document_to_index({'id': 'new', 'stars': ['tom hanks'], 'genres': ['drama'], 'summaries': ['love']})
+    search_engine.search('love war', 'OkapiBM25', WEIGHTS[0])
+    assert search_engine.cache_statistics['invalidations'] == 1
+    assert search_engine.cache_statistics['misses'] == 2
+
+
+def test_new_files_clear_the_cache(copied_index_path, crawled_path, tmp_path):
+    search_engine = SearchEngine(copied_index_path)
+    before = search_engine.search('robot', 'OkapiBM25', WEIGHTS[0], max_results=None)
+
+    document = dict(make_crawl(1, seed=1)[0], id='tt9999999', summaries=['robot robot robot robot'])
+    IndexWriter(copied_index_path, background=False).add_documents([document])
+    after = search_engine.search('robot', 'OkapiBM25', WEIGHTS[0], max_results=None)
+    assert search_engine.cache_statistics['invalidations'] == 1
+    assert 'tt9999999' in dict(after) and len(after) == len(before) + 1
+
+    # a new build removes the segment again
+    build_index(crawled_path, copied_index_path)
+    assert search_engine.search('robot', 'OkapiBM25', WEIGHTS[0], max_results=None) == before
+    assert search_engine.cache_statistics['invalidations'] == 2
+
+
+def test_batches_search_the_new_files(copied_index_path):
+    search_engine = SearchEngine(copied_index_path)
+    before = search_engine.search_batch(['robot', 'love war'], 'OkapiBM25', WEIGHTS[0], max_results=None)
+    search_engine.search('robot', 'OkapiBM25', WEIGHTS[0], max_results=None)
+
+    document = dict(make_crawl(1, seed=1)[0], id='tt9999999', summaries=['robot robot robot robot'])
+    IndexWriter(copied_index_path, background=False).add_documents([document])
+    after = search_engine.search_batch(['robot', 'love war'], 'OkapiBM25', WEIGHTS[0], max_results=None)
+    assert search_engine.cache_statistics['invalidations'] == 1
+    assert 'tt9999999' in dict(after[0]) and len(after[0]) == len(before[0]) + 1
+    assert after[0] == search_engine.search('robot', 'OkapiBM25', WEIGHTS[0], max_results=None)
+
+
+def test_cached_results_are_the_searched_ones(index_path, search_engine):
+    cached_engine = SearchEngine(index_path, cache_size=2)
+    searches = [('love war', {}), ('love war', {'max_results': 3}), ('tom hanks', {'safe_ranking': False}), ('drama', {'facets': ['genres']})]
+    for _ in range(2):
+        for query, options in searches:
+            expected = search_engine.search(query, 'OkapiBM25', WEIGHTS[0], **options)
+            result = cached_engine.search(query, 'OkapiBM25', WEIGHTS[0], **options)
+            assert result == expected
+            # the result is a copy, so changing it doesn't change the cache
+            (result[0] if 'facets' in options else result).clear()
+            assert cached_engine.search(query, 'OkapiBM25', WEIGHTS[0], **options) == expected
+    assert cached_engine.cache_statistics == {'hits': 8, 'misses': 8, 'evictions': 6, 'invalidations': 0}
+
+
+@pytest.mark.parametrize('budget', [2 ** 20, 2000])
+@pytest.mark.parametrize('method', ['OkapiBM25', 'lnc.ltc'])
+def test_cached_postings_score_the_same(index_path, budget, method):
+    uncached_engine = SearchEngine(index_path, cache_size=0, posting_cache_budget=0)
+    cached_engine = SearchEngine(index_path, cache_size=0, posting_cache_budget=budget)
+    for _ in range(3):
+        for query in QUERIES:
+            for safe_ranking in [True, False]:
+                expected = uncached_engine.search(query, method, WEIGHTS[1], safe_ranking, max_results=None)
+                result = cached_engine.search(query, method, WEIGHTS[1], safe_ranking, max_results=None)
+                assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected]
+                assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+    statistics = cached_engine.posting_cache.get_statistics()
+    assert statistics['hits'] > 0 and statistics['bytes'] <= budget
+    assert uncached_engine.posting_cache.get_statistics()['entries'] == 0
@@ -0,0 +1,29 @@
+import io
+import json
+from conftest import make_crawl
+from core.indexer.document_store import Document_store
+
+
+def test_the_store_is_a_dict(tmp_path):
+    documents = {}
+    with Document_store(str(tmp_path)) as store:
+        for document in make_crawl(20):
+            store[document['id']] = documents[document['id']] = document
+        store['tt0000001'] = documents['tt0000001'] = {'id': 'tt0000001', 'title': 'set again'}
+        del store['tt0000002'], documents['tt0000002']
+
+        assert dict(store) == documents
+        assert list(store) == list(documents)
+        file = io.StringIO()
+        store.dump(file)
+        assert file.getvalue() == json.dumps(documents)
+    # the temporary file is removed with the store
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_the_build_stores_the_crawled_documents(index_path):
+    documents = {}
+    for document in make_crawl():
+        documents[document['id']] = document
+    with open(index_path + 'raw_documents_index.json') as file:
+        assert json.load(file) == documents
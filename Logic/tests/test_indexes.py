@@ -0,0 +1,80 @@
+import io
+import os
+import random
+import contextlib
+import pytest
+from core.indexer.index_reader import Index_reader
+from core.indexer.indexes_enum import Indexes, Index_types
+from core.indexer.index import Index
+from core.indexer.tiered_index import Tiered_index
+
+FIELDS = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+
+
+def read_files(path):
+    files = {}
+    for name in os.listdir(path):
+        with open(path + name, 'rb') as file:
+            files[name] = file.read()
+    return files
+
+
+@pytest.mark.parametrize('field', FIELDS)
+def test_ordinal_postings_are_the_index(search_engine, index_path, field):
+    index = Index_reader(index_path, field).index
+    ordinal_index = search_engine.document_indexes[field]
+    assert sorted(ordinal_index) == sorted(index)
+    for term, postings in index.items():
+        documents, tfs = ordinal_index.get_postings(term)
+        assert documents.tolist() == sorted(documents.tolist())
+        assert {search_engine.document_ids[document]: tf for document, tf in zip(documents.tolist(), tfs.tolist())} == postings
+        assert ordinal_index.get_document_frequency(term) == len(postings)
+        skips, interval = ordinal_index.get_skip_pointers(term)
+        assert skips.tolist() == documents[::interval].tolist()
+
+    lengths = Index_reader(index_path, field, Index_types.DOCUMENT_LENGTH).index
+    assert {document_id: search_engine.document_lengths_index[field][search_engine.ordinals[document_id]] for document_id in lengths} == lengths
+
+
+def test_ordinals_are_the_docid_index(search_engine, index_path):
+    document_ids = Index_reader(index_path, Indexes.DOCUMENTS, Index_types.DOCID).index
+    assert list(search_engine.document_ids) == document_ids
+    assert sorted(document_ids) == sorted(Index_reader(index_path, Indexes.DOCUMENTS).index)
+    assert all(search_engine.ordinals[document_id] == ordinal for ordinal, document_id in enumerate(document_ids))
+
+
+def test_auxiliary_indexes_follow_adds_and_removes(tmp_path):
+    rng = random.Random(1)
+    words = ['a', 'b', 'c', 'd', 'e']
+    documents = [{
+        'id': str(i),
+        'stars': [' '.join(rng.choices(words, k=rng.randint(0, 6)))],
+        'genres': rng.sample(words, rng.randint(0, 3)),
+        'summaries': [' '.join(rng.choices(words, k=rng.randint(0, 30))) for _ in range(rng.randint(0, 3))],
+    } for i in range(100)]
+    index = Index(documents[:50], positional=True)
+    for step in range(600):
+        if rng.random() < 0.5:
+            index.add_document_to_index(rng.choice(documents))
+        else:
+            index.remove_document_from_index(str(rng.randrange(100)))
+        if step % 100 == 0:
+            with contextlib.redirect_stdout(io.StringIO()) as output:
+                assert index.check_auxiliary_indexes_are_consistent(), output.getvalue()
+
+    rebuilt = Index(list(index.index[Indexes.DOCUMENTS.value].values()), positional=True)
+    assert rebuilt.index == index.index
+    assert rebuilt.positional_index == index.positional_index
+    assert rebuilt.document_lengths == index.document_lengths
+    assert rebuilt.get_metadata_index() == index.get_metadata_index()
+    assert rebuilt.tiered_index == index.tiered_index
+
+    # the stored tiers are the ones Tiered_index builds from the stored indexes
+    path = str(tmp_path) + '/'
+    with contextlib.redirect_stdout(io.StringIO()):
+        for field in FIELDS:
+            index.store_index(path + field.value + '_index.json', field.value)
+            index.store_tiered_index(path, field.value)
+        stored = read_files(path)
+        Tiered_index(path)
+    assert read_files(path) == stored
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+from conftest import WEIGHTS, QUERIES, exhaustive_scores, naive_scores
+from core.preprocess import Preprocessor
+from core.scorer import Scorer
+from core.indexer.index_reader import Index_reader
+from core.indexer.indexes_enum import Indexes, Index_types
+
+FIELDS = [Indexes.STARS, Indexes.GENRES, Indexes.SUMMARIES]
+
+METHODS = ['OkapiBM25', 'lnc.ltc', 'ltn.lnn', 'nnc.ntc', 'ntn.nnc', 'lnn.ltn']
+
+
+@pytest.mark.parametrize('method', METHODS)
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_postings_scores_are_the_whole_vocabulary_scores(search_engine, index_path, method, weights):
+    # a repeated term and a term that is in no document too
+    for query in QUERIES + ['love love war', 'love unseenword']:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, method, weights)
+        expected = naive_scores(index_path, terms, method, weights)
+        assert sorted(scores) == sorted(expected)
+        for document_id, score in scores.items():
+            assert score == pytest.approx(expected[document_id])
+
+
+@pytest.mark.parametrize('field', FIELDS)
+def test_scoring_tables_are_the_ones_of_the_index(index_path, field):
+    index = Index_reader(index_path, field).index
+    number_of_documents = Index_reader(index_path, Indexes.DOCUMENTS, Index_types.METADATA).index['document_count']
+    tables = Index_reader(index_path, field, Index_types.SCORING).index
+
+    assert tables['document_frequency'] == {term: len(postings) for term, postings in index.items()}
+    assert tables['idf'] == pytest.approx({term: np.log(number_of_documents / len(postings)) for term, postings in index.items()})
+    for scheme, norms in tables['document_norms'].items():
+        squares = {}
+        for term, postings in index.items():
+            for document_id, tf in postings.items():
+                weight = (tf if scheme[0] == 'n' else np.log(tf) + 1) * (tables['idf'][term] if scheme[1] == 't' else 1)
+                squares[document_id] = squares.get(document_id, 0) + weight ** 2
+        assert norms == pytest.approx({document_id: np.sqrt(square) for document_id, square in squares.items()})
+
+
+@pytest.mark.parametrize('method', METHODS)
+def test_scores_without_the_tables_are_the_same(search_engine, method):
+    # a Scorer computes the tables it isn't given, like for an index built before the tables
+    for field in FIELDS:
+        stored = Scorer(search_engine.document_indexes[field], search_engine.metadata_index['document_count'], search_engine.scoring_index[field])
+        computed = Scorer(search_engine.document_indexes[field], search_engine.metadata_index['document_count'])
+        for query in QUERIES:
+            terms = Preprocessor([query]).preprocess()[0].split()
+            if method == 'OkapiBM25':
+                arguments = (terms, search_engine.metadata_index['averge_document_length'][field.value], search_engine.document_lengths_index[field])
+                expected, result = stored.compute_scores_with_okapi_bm25(*arguments), computed.compute_scores_with_okapi_bm25(*arguments)
+            else:
+                expected, result = stored.compute_scores_with_vector_space_model(terms, method), computed.compute_scores_with_vector_space_model(terms, method)
+            assert result[0].tolist() == expected[0].tolist()
+            assert result[1] == pytest.approx(expected[1])
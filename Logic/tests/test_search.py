@@ -0,0 +1,319 @@
+import json
+import re
+import itertools
+import collections
+import numpy as np
+import pytest
+from conftest import WEIGHTS, QUERIES, exhaustive_scores, naive_scores, assert_top_k
+from core.preprocess import Preprocessor
+from core.boolean_query import BooleanQuery, PostingList, intersect, difference
+from core.indexer.index_reader import Index_reader
+from core.indexer.indexes_enum import Indexes
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltn.lnn', 'lnc.ltc'])
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_all_results_for_minus_one(search_engine, method, weights):
+    found = 0
+    for query in QUERIES:
+        scores = exhaustive_scores(search_engine, Preprocessor([query]).preprocess()[0].split(), method, weights)
+        result = search_engine.search(query, method, weights, max_results=-1)
+        assert sorted(document_id for document_id, _ in result) == sorted(scores)
+        assert result == search_engine.search(query, method, weights, max_results=None)
+        found += len(result)
+    assert found > 0
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltn.lnn', 'BM25F'])
+@pytest.mark.parametrize('safe_ranking', [True, False])
+def test_pages_are_slices_of_all_results(search_engine, method, safe_ranking):
+    weights = WEIGHTS[0]
+    for query in QUERIES:
+        everything = search_engine.search(query, method, weights, True, max_results=None)
+        pages = [search_engine.search(query, method, weights, True, max_results=5, offset=offset) for offset in range(0, 20, 5)]
+        assert sum(pages, []) == everything[:20]
+        # the tiers score with the statistics of each tier, so only their own results are compared
+        everything = search_engine.search(query, method, weights, safe_ranking, max_results=None)
+        assert search_engine.search(query, method, weights, safe_ranking, max_results=-1, offset=7) == everything[7:]
+
+
+def test_negative_offset_is_rejected(search_engine):
+    with pytest.raises(ValueError):
+        search_engine.search('love', 'OkapiBM25', WEIGHTS[0], offset=-1)
+    with pytest.raises(ValueError):
+        search_engine.search_batch(['love'], 'OkapiBM25', WEIGHTS[0], offset=-1)
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltn.lnn', 'BM25F'])
+def test_batch_search_is_search(search_engine, method):
+    for max_results, offset in [(10, 0), (5, 3), (-1, 0), (None, 4)]:
+        results = search_engine.search_batch(QUERIES, method, WEIGHTS[1], max_results, offset)
+        for query, result in zip(QUERIES, results):
+            expected = search_engine.search(query, method, WEIGHTS[1], True, max_results, offset)
+            assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected]
+            assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+
+
+@pytest.mark.parametrize('weights', WEIGHTS + [{Indexes.STARS: 0, Indexes.SUMMARIES: 1}])
+def test_wand_is_the_safe_ranking(search_engine, weights):
+    for query in QUERIES + ['love love war']:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, 'OkapiBM25', weights)
+        for max_results in [1, 3, 10, 50]:
+            result = search_engine.find_top_k_with_wand(terms, weights, max_results, block_max=False)
+            assert_top_k([(search_engine.document_ids[document], score) for document, score in result], scores, max_results)
+            assert_top_k(search_engine.search(query, 'OkapiBM25', weights, max_results=max_results), scores, max_results)
+
+
+@pytest.mark.parametrize('method, safe_ranking', [('OkapiBM25', True), ('OkapiBM25', False), ('OkapiBM25', 'impact'), ('OkapiBM25', 'champions'),
+                                                  ('ltn.lnn', True), ('BM25F', True)])
+def test_no_weights_find_nothing(search_engine, method, safe_ranking):
+    for max_results in [10, None]:
+        assert search_engine.search('love war', method, {}, safe_ranking, max_results) == []
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_block_max_wand_is_the_safe_ranking(search_engine, weights):
+    skipped = 0
+    for query in QUERIES + ['love love war']:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, 'OkapiBM25', weights)
+        for max_results in [1, 3, 10, 50]:
+            result = search_engine.find_top_k_with_wand(terms, weights, max_results, block_max=True)
+            assert_top_k([(search_engine.document_ids[document], score) for document, score in result], scores, max_results)
+            assert search_engine.pruning_statistics['documents_scored'] <= len(scores)
+            skipped += search_engine.pruning_statistics['blocks_skipped']
+    assert skipped > 0
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'lnc.ltc', 'ltn.lnn'])
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_batch_search_is_exhaustive(search_engine, method, weights):
+    results = search_engine.search_batch(QUERIES + ['love love war'], method, weights, max_results=-1)
+    for query, result in zip(QUERIES + ['love love war'], results):
+        scores = exhaustive_scores(search_engine, Preprocessor([query]).preprocess()[0].split(), method, weights)
+        assert len(result) == len(scores)
+        assert_top_k(result, scores, len(scores))
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_impacts_are_the_quantized_safe_ranking(search_engine, weights):
+    stopped_early = False
+    for query in QUERIES + ['love love war']:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, 'OkapiBM25', weights)
+        # each (field, term) pair rounds its score by at most half the scale of the field
+        error = sum(weight * terms.count(term) * search_engine.impact_index[field]['scale'] / 2
+                    for field, weight in weights.items() for term in set(terms) if term in search_engine.impact_index[field]['impacts'])
+        everything = search_engine.search(query, 'OkapiBM25', weights, 'impact', max_results=-1)
+        assert sorted(document_id for document_id, _ in everything) == sorted(scores)
+        for document_id, score in everything:
+            assert abs(score - scores[document_id]) <= error + 1e-9
+        for max_results in [1, 3, 10]:
+            result = search_engine.search(query, 'OkapiBM25', weights, 'impact', max_results=max_results)
+            assert [document_id for document_id, _ in result] == [document_id for document_id, _ in everything[:max_results]]
+            assert [score for _, score in result] == pytest.approx([score for _, score in everything[:max_results]])
+            stopped_early |= search_engine.pruning_statistics['segments_processed'] < search_engine.pruning_statistics['segments']
+    assert stopped_early
+
+
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_bm25f_is_exhaustive(search_engine, index_path, weights):
+    for query in QUERIES + ['love love war']:
+        scores = naive_scores(index_path, Preprocessor([query]).preprocess()[0].split(), 'BM25F', weights)
+        everything = search_engine.search(query, 'BM25F', weights, max_results=-1)
+        assert len(everything) == len(scores)
+        assert_top_k(everything, scores, len(scores))
+        assert_top_k(search_engine.search(query, 'BM25F', weights, max_results=5), scores, 5)
+
+
+def test_top_k_selection_is_a_full_sort(search_engine):
+    rng = np.random.default_rng(0)
+    for size in [0, 1, 7, 100]:
+        documents = np.sort(rng.choice(1000, size, replace=False))
+        # few distinct scores, so many of them are tied at the kth one
+        scores = rng.integers(0, 5, size).astype(float)
+        order = np.lexsort((documents, -scores))
+        for max_results in [None, 0, 1, 3, size, size + 5]:
+            selected, selected_scores = search_engine.select_top_k(documents, scores, max_results)
+            assert selected.tolist() == documents[order][:max_results].tolist()
+            assert selected_scores.tolist() == scores[order][:max_results].tolist()
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltn.lnn'])
+@pytest.mark.parametrize('weights', WEIGHTS)
+def test_champions_are_a_part_of_the_safe_ranking(search_engine, method, weights):
+    for query in QUERIES:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, method, weights)
+        champions = set()
+        for field in weights:
+            for term in terms:
+                champions.update(search_engine.document_ids[document] for document in search_engine.champion_index[field].get_postings(term)[0])
+        for max_results in [1, 3, 10, None]:
+            result = search_engine.search(query, method, weights, 'champions', max_results=max_results)
+            if max_results is None or len(champions) < max_results:
+                # the whole index is searched when the champions are not enough
+                assert_top_k(result, scores, max_results)
+            else:
+                assert len(result) == max_results and set(document_id for document_id, _ in result) <= champions
+                # a document is only scored for the terms it is a champion of
+                assert all(score <= scores[document_id] + 1e-9 for document_id, score in result)
+
+
+def test_champions_are_searched_for_okapi_bm25(search_engine, monkeypatch):
+    calls = collections.Counter()
+    for name in ['find_scores_with_champions', 'find_top_k_with_wand']:
+        method = getattr(search_engine, name)
+        monkeypatch.setattr(search_engine, name, lambda *arguments, name=name, method=method: calls.update([name]) or method(*arguments))
+    for query in QUERIES:
+        search_engine.search(query, 'OkapiBM25', WEIGHTS[0], 'champions', max_results=10)
+    assert calls == {'find_scores_with_champions': len(QUERIES)}
+    search_engine.search(QUERIES[0], 'OkapiBM25', WEIGHTS[0], True, max_results=10)
+    assert calls['find_top_k_with_wand'] == 1
+
+
+def has_phrase(texts, terms, slop):
+    for text in texts:
+        words = text.split()
+        positions = [[position for position, word in enumerate(words) if word == term] for term in terms]
+        if any(all(a < b for a, b in zip(chosen, chosen[1:])) and chosen[-1] - chosen[0] - (len(terms) - 1) <= slop
+               for chosen in itertools.product(*positions)):
+            return True
+    return False
+
+
+@pytest.mark.parametrize('slop', [0, 1, 4])
+@pytest.mark.parametrize('weights', [WEIGHTS[0], {Indexes.SUMMARIES: 1}])
+def test_phrases_are_found_in_the_documents(search_engine, index_path, slop, weights):
+    documents = Index_reader(index_path, Indexes.DOCUMENTS).index
+    # the postings of the movie crawled twice have the terms of both crawls, and the document only the last one
+    twice = 'tt0000003'
+    found = 0
+    for query in ['tom hanks', 'love war', 'family secret', 'love love', 'city love war', 'morgan freeman tim']:
+        terms = Preprocessor([query]).preprocess()[0].split()
+        scores = exhaustive_scores(search_engine, terms, 'OkapiBM25', weights)
+        expected = [document_id for document_id, document in documents.items()
+                    if any(has_phrase(document[field.value], terms, slop) for field in weights if field in search_engine.positional_index)]
+        result = [(document_id, score) for document_id, score in search_engine.search(query, 'OkapiBM25', weights, phrase_slop=slop, max_results=None)
+                  if document_id != twice]
+        expected = [document_id for document_id in expected if document_id != twice]
+        assert sorted(document_id for document_id, _ in result) == sorted(expected)
+        assert_top_k(result, {document_id: scores[document_id] for document_id in expected}, None)
+        found += len(result)
+    assert found > 0
+
+
+def test_posting_list_intersections_are_set_operations():
+    rng = np.random.default_rng(0)
+    for first_size, second_size in [(0, 10), (5, 500), (50, 60), (300, 3)]:
+        first = np.unique(rng.integers(0, 1000, first_size)).astype(np.int32)
+        second = np.unique(rng.integers(0, 1000, second_size)).astype(np.int32)
+        for second_list in [PostingList(second), PostingList(second, second[::4], 4)]:
+            assert intersect(PostingList(first), second_list).documents.tolist() == np.intersect1d(first, second).tolist()
+            assert difference(PostingList(first), second_list).documents.tolist() == np.setdiff1d(first, second).tolist()
+
+
+@pytest.mark.parametrize('weights', [WEIGHTS[0], {Indexes.SUMMARIES: 1}])
+def test_boolean_queries_are_set_operations(search_engine, index_path, weights):
+    indexes = [Index_reader(index_path, field).index for field in weights]
+
+    def documents(word):
+        term = Preprocessor([word]).preprocess()[0]
+        return set().union(*(index.get(term, {}) for index in indexes))
+
+    queries = {
+        'love AND war': documents('love') & documents('war'),
+        '+love -war': documents('love') - documents('war'),
+        'love OR war': documents('love') | documents('war'),
+        'detective murder': documents('detective') | documents('murder'),
+        '(family OR ghost) AND NOT house': (documents('family') | documents('ghost')) - documents('house'),
+        '+tom +hanks -(love war)': (documents('tom') & documents('hanks')) - documents('love') - documents('war'),
+    }
+    for query, expected in queries.items():
+        scores = exhaustive_scores(search_engine, BooleanQuery(query).terms, 'OkapiBM25', weights)
+        result = search_engine.search(query, 'OkapiBM25', weights, boolean=True, max_results=None)
+        assert sorted(document_id for document_id, _ in result) == sorted(expected)
+        assert_top_k(result, {document_id: scores[document_id] for document_id in expected}, None)
+
+
+@pytest.mark.parametrize('method, safe_ranking', [('OkapiBM25', True), ('ltn.lnn', True), ('BM25F', True), ('OkapiBM25', 'impact'), ('OkapiBM25', 'champions')])
+def test_genre_filters_are_filtered_results(search_engine, index_path, method, safe_ranking):
+    with open(index_path + 'raw_documents_index.json') as file:
+        genres = {document_id: set(document['genres']) for document_id, document in json.load(file).items()}
+    filters = {
+        'Drama': lambda found: 'Drama' in found,
+        'Drama AND NOT Horror': lambda found: 'Drama' in found and 'Horror' not in found,
+        'Comedy OR Action': lambda found: bool(found & {'Comedy', 'Action'}),
+        'Western': lambda found: False,
+        # a genre of more than one word, as a whole or quoted in a boolean query
+        'Science Fiction': lambda found: 'Science Fiction' in found,
+        'Drama AND NOT "Science Fiction"': lambda found: 'Drama' in found and 'Science Fiction' not in found,
+        '"science fiction" OR Comedy': lambda found: bool(found & {'Science Fiction', 'Comedy'}),
+    }
+    for query in QUERIES:
+        everything = search_engine.search(query, method, WEIGHTS[0], True if safe_ranking == 'champions' else safe_ranking, max_results=None)
+        for genre_filter, matches in filters.items():
+            expected = [(document_id, score) for document_id, score in everything if matches(genres[document_id])]
+            result = search_engine.search(query, method, WEIGHTS[0], safe_ranking, max_results=None, genre_filter=genre_filter)
+            assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected]
+            assert [score for _, score in result] == pytest.approx([score for _, score in expected])
+            top = search_engine.search(query, method, WEIGHTS[0], safe_ranking, max_results=5, genre_filter=genre_filter)
+            assert [document_id for document_id, _ in top] == [document_id for document_id, _ in expected[:5]]
+
+
+def crawled_value(document, field):
+    value = document.get(field)
+    if value is None:
+        return None
+    digits = re.sub(r'[^\d.]', '', value.split('(')[0])
+    return float(digits) if digits else None
+
+
+@pytest.mark.parametrize('method', ['OkapiBM25', 'ltn.lnn', 'BM25F'])
+def test_ranges_and_sorts_are_on_the_crawled_values(search_engine, index_path, method):
+    with open(index_path + 'raw_documents_index.json') as file:
+        documents = json.load(file)
+    fields = ['release_year', 'rating', 'budget', 'gross_worldwide']
+    values = {document_id: {field: crawled_value(document, field) for field in fields} for document_id, document in documents.items()}
+    ranges = [{'release_year': (1990, 2000)}, {'rating': (8, None)}, {'budget': (None, 50000000), 'release_year': (1980, None)}]
+    for query in QUERIES:
+        everything = search_engine.search(query, method, WEIGHTS[0], max_results=None)
+        for range_filter in ranges:
+            expected = [(document_id, score) for document_id, score in everything
+                        if all(values[document_id][field] is not None
+                               and (low is None or values[document_id][field] >= low) and (high is None or values[document_id][field] <= high)
+                               for field, (low, high) in range_filter.items())]
+            result = search_engine.search(query, method, WEIGHTS[0], max_results=None, ranges=range_filter)
+            assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected]
+        for sort_by in ['rating', '-budget', '-release_year']:
+            field = sort_by.lstrip('-')
+            sign = -1 if sort_by.startswith('-') else 1
+            # documents without a value come last, and equal values are sorted by score and then like the scores
+            expected = sorted(everything, key=lambda item: (values[item[0]][field] is None, sign * (values[item[0]][field] or 0), -item[1],
+                                                            search_engine.ordinals[item[0]]))
+            result = search_engine.search(query, method, WEIGHTS[0], max_results=7, offset=2, sort_by=sort_by)
+            assert [document_id for document_id, _ in result] == [document_id for document_id, _ in expected[2:9]]
+
+
+@pytest.mark.parametrize('safe_ranking', [True, False, 'impact'])
+def test_facets_count_all_the_matches(search_engine, index_path, safe_ranking):
+    with open(index_path + 'raw_documents_index.json') as file:
+        documents = json.load(file)
+    facets = {
+        'genres': lambda document: document['genres'],
+        'directors': lambda document: document['directors'],
+        'languages': lambda document: document['languages'],
+        'decade': lambda document: [document['release_year'][:3] + '0s'],
+    }
+    for query in QUERIES:
+        for genre_filter in [None, 'Drama']:
+            matches = search_engine.search(query, 'OkapiBM25', WEIGHTS[0], True, max_results=None, genre_filter=genre_filter)
+            result, counts = search_engine.search(query, 'OkapiBM25', WEIGHTS[0], safe_ranking, max_results=3, genre_filter=genre_filter,
+                                                  facets=list(facets), facet_limit=None)
+            assert result == search_engine.search(query, 'OkapiBM25', WEIGHTS[0], safe_ranking, max_results=3, genre_filter=genre_filter)
+            for facet, get_values in facets.items():
+                expected = collections.Counter(value for document_id, _ in matches for value in set(get_values(documents[document_id])))
+                assert counts[facet] == sorted(expected.items(), key=lambda item: (-item[1], item[0]))
+            limited = search_engine.search(query, 'OkapiBM25', WEIGHTS[0], safe_ranking, genre_filter=genre_filter, facets=['genres'], facet_limit=2)[1]
+            assert limited == {'genres': counts['genres'][:2]}
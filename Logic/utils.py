@@ -64,7 +64,8 @@ def search(
 
     method: 'ltn.lnn' or 'ltc.lnc' or 'OkapiBM25'
 
-    preferred_genre: A list containing preference rates for each genre. If None, the preference rates are equal.
+    preferred_genre: The genres to search in, as a boolean query over the genres, e.g. 'Drama' or
+                     'Drama AND NOT Horror'. If None, all genres are searched.
 
     Returns
     ----------------------------------------------------------------------------------------------------
@@ -78,7 +79,7 @@ def search(
     }
     print(query)
     return search_engine.search(
-        query, method, weights, max_results=max_result_count, safe_ranking=True
+        query, method, weights, max_results=max_result_count, safe_ranking=True, genre_filter=preferred_genre
     )
 
 